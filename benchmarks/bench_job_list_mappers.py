@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of the mapping stage of "sharedcloud job list".
+
+It builds a synthetic payload of jobs, like the one sent by the Backend, and measures how many rows per second are
+mapped by the original mappers (two "strptime" and linear scans per cell), by the current mappers row by row, and
+column by column (the batch stage used by "_list_resource").
+
+>>> pip install -e . && python benchmarks/bench_job_list_mappers.py
+>>> python benchmarks/bench_job_list_mappers.py --rows 100000 --repeat 5
+"""
+import argparse
+import datetime
+import random
+import time
+import uuid
+
+import timeago
+
+from sharedcloud_cli.constants import DATETIME_FORMAT, JOB_STATUSES
+from sharedcloud_cli.mappers import _map_non_formatted_money_to_version_with_currency, _map_duration_to_human_readable, \
+    _map_job_status_to_human_representation, _map_datetime_obj_to_human_representation, _map_rows
+
+KEYS = ['uuid', 'incremental_id', 'status', 'cost', 'duration', 'created_at', 'run', 'function_name']
+MAPPERS = {
+    'cost': _map_non_formatted_money_to_version_with_currency,
+    'duration': _map_duration_to_human_readable,
+    'status': _map_job_status_to_human_representation,
+    'created_at': _map_datetime_obj_to_human_representation
+}
+
+
+def _generate_jobs(num_rows):
+    now = datetime.datetime(2018, 5, 21, 10, 0, 0)
+    run_uuid = str(uuid.uuid4())
+    return [{
+        'uuid': str(uuid.uuid4()),
+        'incremental_id': i,
+        'status': random.choice(list(JOB_STATUSES.values())),
+        'cost': random.random(),
+        'duration': random.randint(1, 1800),
+        'created_at': (now - datetime.timedelta(seconds=random.randint(0, 30 * 24 * 3600))).strftime(DATETIME_FORMAT),
+        'current_server_time': now.strftime(DATETIME_FORMAT),
+        'run': run_uuid,
+        'function_name': 'handler'
+    } for i in range(num_rows)]
+
+
+def _original_map_datetime(datetime_obj, resource, token):
+    now = datetime.datetime.strptime(resource.get('current_server_time'), DATETIME_FORMAT)
+    if datetime_obj:
+        return timeago.format(datetime.datetime.strptime(datetime_obj, DATETIME_FORMAT), now)
+
+
+def _original_map_job_status(status, resource, token):
+    for status_name, id in JOB_STATUSES.items():
+        if id == status:
+            return status_name
+
+
+ORIGINAL_MAPPERS = dict(MAPPERS, created_at=_original_map_datetime, status=_original_map_job_status)
+
+
+def _map_rows_original(resources, keys, mappers, token):
+    return _map_rows_cell_by_cell(resources, keys, ORIGINAL_MAPPERS, token)
+
+
+def _map_rows_cell_by_cell(resources, keys, mappers, token):
+    return [[mappers[key](resource.get(key), resource, token) if key in mappers else resource.get(key)
+             for key in keys] for resource in resources]
+
+
+def _benchmark(name, function, resources, repeat):
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function(resources, KEYS, MAPPERS, None)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    print('{:<16} {:>12,.0f} rows/s ({:.3f}s for {:,} rows)'.format(name, len(resources) / best, best, len(resources)))
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    jobs = _generate_jobs(args.rows)
+    assert _map_rows(jobs[:1000], KEYS, MAPPERS, None) == _map_rows_original(jobs[:1000], KEYS, MAPPERS, None)
+
+    original = _benchmark('original', _map_rows_original, jobs, args.repeat)
+    _benchmark('cell by cell', _map_rows_cell_by_cell, jobs, args.repeat)
+    column_by_column = _benchmark('column by column', _map_rows, jobs, args.repeat)
+    print('speedup: {:.1f}x'.format(original / column_by_column))
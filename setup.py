@@ -4,15 +4,15 @@ from setuptools import find_packages, setup
 from setuptools.command.test import test as TestCommand
 
 
-class NoseTest(TestCommand):
+class PyTest(TestCommand):
     def finalize_options(self):
         TestCommand.finalize_options(self)
         self.test_args = []
         self.test_suite = True
 
     def run_tests(self):
-        import nose
-        errcode = nose.main(self.test_args)
+        import pytest
+        errcode = pytest.main(self.test_args)
         sys.exit(errcode)
 
 
@@ -62,6 +62,6 @@ setup(name='sharedcloud-cli',
           'Intended Audience :: Science/Research',
           'Topic :: Scientific/Engineering :: Artificial Intelligence'
       ],
-      tests_require=['nose'],
-      cmdclass={'test': NoseTest}
+      tests_require=['pytest'],
+      cmdclass={'test': PyTest}
       )
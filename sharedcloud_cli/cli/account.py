@@ -31,11 +31,11 @@ def create(config, email, username):
     """
     password = click.prompt('Please enter a password', type=str)
 
-    _create_resource('{}/api/v1/users/'.format(SHAREDCLOUD_CLI_URL), None, {
+    _create_resource('{}/api/v1/users/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'email': email,
         'username': username,
         'password': password
-    })
+    }, auth=False)
 
     click.echo('Account Created')
 
@@ -56,7 +56,7 @@ def update(config, email, username):
     """
     _exit_if_user_is_logged_out(config.token)
 
-    _update_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.token, {
+    _update_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'email': email,
         'username': username
     })
@@ -79,7 +79,7 @@ def change_password(config):
 
     password = click.prompt('Please enter a new password', type=str)
 
-    _update_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.token, {
+    _update_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'password': password,
     })
 
@@ -102,7 +102,7 @@ def delete(config):
 
     click.confirm('Are you sure?', abort=True)
 
-    _delete_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.token, {})
+    _delete_resource('{}/api/v1/users/account/'.format(SHAREDCLOUD_CLI_URL), config.client, {})
 
     click.echo('Account Deleted')
 
@@ -122,11 +122,13 @@ def list(config):
     _exit_if_user_is_logged_out(config.token)
 
     _list_resource('{}/api/v1/users/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['UUID', 'EMAIL', 'USERNAME', 'BALANCE', 'DATE_JOINED', 'LAST_LOGIN'],
                    ['uuid', 'email', 'username', 'balance', 'date_joined', 'last_login'],
                    mappers={
                        'balance': _map_non_formatted_money_to_version_with_currency,
                        'date_joined': _map_datetime_obj_to_human_representation,
                        'last_login': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   output=config.output,
+                   columns=config.columns)
@@ -0,0 +1,18 @@
+import click
+
+from sharedcloud_cli.response_cache import ResponseCache
+
+
+@click.group(help='Manage the local cache of responses')
+def cache():
+    pass
+
+
+@cache.command(help='Remove all the cached responses')
+def clear():
+    """
+    It removes the responses cached locally (e.g., the GPU and image catalogs).
+
+    >>> sharedcloud cache clear
+    """
+    click.echo('{} cached responses removed'.format(ResponseCache().clear()))
@@ -3,6 +3,8 @@ from click import pass_obj
 
 from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL
 from sharedcloud_cli.mappers import _map_datetime_obj_to_human_representation
+from sharedcloud_cli.uploads import CodeUpload, FunctionCodeIndex, _code_sha256
+from sharedcloud_cli.options import pagination_options, field_range_options
 from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _create_resource, _update_resource, _delete_resource, \
     _show_field_value, _list_resource
 from sharedcloud_cli.validators import _validate_file, _validate_code
@@ -15,17 +17,70 @@ def function(config):
     _exit_if_user_is_logged_out(config.token)
 
 
+def _get_remote_function(config, uuid):
+    """
+    The function as the Backend has it, or None if it doesn't exist anymore or it can't be fetched.
+
+    :param config: context object
+    :param uuid: uuid of the function
+    """
+    r = config.client.get('{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid))
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+
+def _get_remote_code_sha256(config, uuid):
+    """
+    SHA-256 of the code that the Backend has for a function, or None if it can't be fetched.
+
+    :param config: context object
+    :param uuid: uuid of the function
+    """
+    function = _get_remote_function(config, uuid)
+    if function is None:
+        return None
+    return _code_sha256(code=function.get('code') or '')
+
+
+def _is_reusable(config, uuid, sha256, name, image_uuid):
+    """
+    Whether a function still exists in the Backend with this code, name and image, so it can be returned instead of
+    creating an identical one.
+
+    :param config: context object
+    :param uuid: uuid of the function
+    :param sha256: SHA-256 of the code
+    :param name: name of the function
+    :param image_uuid: uuid of the image of the function
+    """
+    function = _get_remote_function(config, uuid)
+    return function is not None and \
+        _code_sha256(code=function.get('code') or '') == sha256 and \
+        function.get('name') == name and \
+        str(function.get('image')) == str(image_uuid)
+
+
 @function.command(help='Create a new function')
 @click.option('--name', required=True)
 @click.option('--image-uuid', required=True, type=click.UUID)
-@click.option('--file', required=False, callback=_validate_file, type=click.File())
+@click.option('--file', required=False, callback=_validate_file, type=click.Path(exists=True, dir_okay=False))
 @click.option('--code', required=False, callback=_validate_code)
+@click.option('--reuse', is_flag=True)
+@click.option('--verify', is_flag=True)
+@click.option('--force', is_flag=True)
 @pass_obj
-def create(config, name, image_uuid, file, code):
+def create(config, name, image_uuid, file, code, reuse, verify, force):
     """
     It creates a new function by providing a set of data.
 
     It's possible to specify either the "code" or "file" parameter. But there should be at least one.
+    Files are memory-mapped and uploaded as a gzip compressed stream, with a summary of the upload at the end.
+
+    The SHA-256 of the code is remembered locally. If another function already has identical code, a warning is
+    displayed. With the flag "--reuse", a function with identical code, name and image is returned instead of
+    creating a new one, once the Backend confirms that it still exists as it is. The flag "--verify" checks the code
+    of the functions in the warning against the Backend, and "--force" skips the check.
 
     >>> sharedcloud function create --name helloWorld --image-uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --code "def handler(event): print('Hello World!')"
     >>> sharedcloud function create --name helloWorld --image-uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --file helloworld.py
@@ -35,33 +90,54 @@ def create(config, name, image_uuid, file, code):
     :param image_uuid: uuid of the image that this function will use
     :param file: file containing the code of the function
     :param code: code of the function
+    :param reuse: flag to return the function with identical code, name and image instead of creating a new one
+    :param verify: flag to check the code of the functions with identical code against the Backend
+    :param force: flag to skip the check for functions with identical code
     """
-    if file:
-        code = ''
-        while True:
-            chunk = file.read(1024)
-            if not chunk:
-                break
-            code += chunk
-
-    r = _create_resource('{}/api/v1/functions/'.format(SHAREDCLOUD_CLI_URL), config.token, {
+    upload = CodeUpload(file) if file else None
+    sha256 = _code_sha256(code, upload)
+    index = FunctionCodeIndex()
+
+    duplicates = []
+    if not force:
+        duplicates = [function_uuid for function_uuid in index.find(sha256)
+                      if not verify or _get_remote_code_sha256(config, function_uuid) == sha256]
+        if reuse:
+            # The index could be stale (e.g., the function was deleted elsewhere), so the Backend has the last word
+            for function_uuid in index.find(sha256, image_uuid=image_uuid, name=name):
+                if _is_reusable(config, function_uuid, sha256, name, image_uuid):
+                    click.echo(function_uuid)
+                    return
+
+    # Files are streamed compressed, instead of being sent as a form field
+    r = _create_resource('{}/api/v1/functions/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'name': name,
         'image': image_uuid,
         'code': code
-    })
+    }, upload=upload)
+    index.set(r.json().get('uuid'), sha256, image_uuid=image_uuid, name=name)
+
+    if duplicates:
+        click.echo('[WARNING] Function/s {} already have identical code. Use "--reuse" to avoid duplicates'.format(
+            ', '.join(duplicates)), err=True)
 
 
 @function.command(help='Update a function')
 @click.option('--uuid', required=True, type=click.UUID)
 @click.option('--name', required=False)
 @click.option('--image-uuid', required=False, type=click.UUID)
-@click.option('--file', required=False, type=click.File())
+@click.option('--file', required=False, type=click.Path(exists=True, dir_okay=False))
 @click.option('--code', required=False)
+@click.option('--verify', is_flag=True)
+@click.option('--force', is_flag=True)
 @pass_obj
-def update(config, uuid, name, image_uuid, file, code):
+def update(config, uuid, name, image_uuid, file, code, verify, force):
     """
     It updates a function totally or partially by providing a set of data.
 
+    The code isn't uploaded again if it's identical to the last code uploaded for this function, according to a local
+    index. The flag "--verify" compares it with the code in the Backend instead, and "--force" always uploads it.
+
     >>> sharedcloud function create --uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --name helloWorld --image-uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --code "def handler(event): print('Hello World!')"
     >>> sharedcloud function create --uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --name helloWorld --image-uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --file helloworld.py
 
@@ -71,41 +147,58 @@ def update(config, uuid, name, image_uuid, file, code):
     :param image_uuid: uuid of the image that this function will use
     :param file: file containing the code of the function
     :param code: code of the function
+    :param verify: flag to compare the code with the one in the Backend
+    :param force: flag to upload the code even if it hasn't changed
     """
-    if file:
-        code = ''
-        while True:
-            chunk = file.read(1024)
-            if not chunk:
-                break
-            code += chunk
-
-    _update_resource('{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, {
+    upload = CodeUpload(file) if file else None
+    sha256 = _code_sha256(code, upload)
+    index = FunctionCodeIndex()
+
+    if sha256 and not force:
+        last_sha256 = _get_remote_code_sha256(config, uuid) if verify else index.get(uuid)
+        if last_sha256 == sha256:
+            code, upload = None, None
+            if not name and not image_uuid:
+                click.echo(uuid)
+                click.echo('[INFO] The code has not changed, so the function was not updated', err=True)
+                return
+
+    _update_resource('{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, {
         'uuid': uuid,
         'name': name,
         'image': image_uuid,
         'code': code
-    })
+    }, upload=upload)
+    index.set(uuid, sha256, image_uuid=image_uuid, name=name)
 
 
 @function.command(help='List all your functions')
+@pagination_options
 @pass_obj
-def list(config):
+def list(config, pagination):
     """
     It lists all the user's functions.
 
+    Functions are fetched and displayed page by page. By default only the first page is displayed, use "--limit" to
+    display up to a number of functions or "--all" to display all of them.
+
     >>> sharedcloud function list
+    >>> sharedcloud function list --all
 
     :param config: context object
+    :param pagination: dict with the "limit", "page_size", "all_pages" and "column_widths" options
     """
     # sharedcloud function list"
     _list_resource('{}/api/v1/functions/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['UUID', 'NAME', 'IMAGE', 'NUM_RUNS', 'WHEN'],
                    ['uuid', 'name', 'registry_path', 'num_runs', 'created_at'],
                    mappers={
                        'created_at': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   pagination=pagination,
+                   output=config.output,
+                   columns=config.columns)
 
 
 @function.command(help='Delete a function')
@@ -120,22 +213,27 @@ def delete(config, uuid):
     :param config: context object
     :param uuid: uuid of the function
     """
-    _delete_resource('{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, {
+    _delete_resource('{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, {
         'uuid': uuid
     })
+    FunctionCodeIndex().remove(uuid)
 
 
 @function.command(help='Display the code of a function')
 @click.option('--uuid', required=True, type=click.UUID)
+@field_range_options
 @pass_obj
-def code(config, uuid):
+def code(config, uuid, head, tail):
     """
     It prints the code of a function into stdout by providing an identifier (UUID).
 
     >>> sharedcloud function code --uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138
+    >>> sharedcloud function code --uuid 6ea7e5ce-afcc-4027-82a7-e01eeea6b138 --head 1024
 
     :param config: context object
     :param uuid: uuid of the function
+    :param head: only print the first bytes
+    :param tail: only print the last bytes
     """
     _show_field_value(
-        '{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, 'code')
+        '{}/api/v1/functions/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, 'code', head=head, tail=tail)
@@ -1,7 +1,7 @@
 import click
 from click import pass_obj
 
-from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, GPU_CATALOG_CACHE_TTL
 from sharedcloud_cli.mappers import _map_boolean_to_human_readable
 from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _list_resource
 
@@ -30,9 +30,12 @@ def list(config):
     url = '{}/api/v1/gpus/'.format(SHAREDCLOUD_CLI_URL)
 
     _list_resource(url,
-                   config.token,
+                   config.client,
                    ['UUID', 'NAME', 'CODENAME', 'CUDA_CORES', 'IS_AVAILABLE'],
                    ['uuid', 'name', 'codename', 'cuda_cores', 'is_available'],
                    mappers={
                        'is_available': _map_boolean_to_human_readable
-                   })
\ No newline at end of file
+                   },
+                   output=config.output,
+                   columns=config.columns,
+                   cache_ttl=GPU_CATALOG_CACHE_TTL)
\ No newline at end of file
@@ -1,10 +1,14 @@
-import subprocess
+import datetime
 
 import click
+import timeago
 from click import pass_obj
+from tabulate import tabulate
 
-from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL
-from sharedcloud_cli.mappers import _map_datetime_obj_to_human_representation
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, IMAGE_CATALOG_CACHE_TTL
+from sharedcloud_cli.images import ImageCacheManager, ImageFreshnessCache
+from sharedcloud_cli.mappers import _map_datetime_obj_to_human_representation, _map_bytes_to_human_readable, \
+    _map_boolean_to_human_readable
 from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _get_instance_token_or_exit_if_there_is_none, \
     _list_resource, _perform_instance_action, _update_all_images
 
@@ -38,12 +42,15 @@ def list(config, only_downloaded):
         url += '?instance={}'.format(instance_uuid)
 
     _list_resource(url,
-                   config.token,
+                   config.client,
                    ['UUID', 'REGISTRY_PATH', 'DESCRIPTION', 'REQUIRES_GPU', 'WHEN'],
                    ['uuid', 'registry_path', 'description', 'requires_gpu', 'created_at'],
                    mappers={
                        'created_at': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   output=config.output,
+                   columns=config.columns,
+                   cache_ttl=IMAGE_CATALOG_CACHE_TTL)
 
 
 @image.command(help='Clean an image from the system')
@@ -60,16 +67,16 @@ def clean(config, registry_path):
     """
     instance_uuid = _get_instance_token_or_exit_if_there_is_none()
 
-    p = subprocess.Popen(
-        ['docker', 'rmi', '-f', registry_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output, error = p.communicate()
+    output, error = config.runtime.remove_image(registry_path)
 
     if error:
         for line in error.splitlines():
             click.echo(line + b'\n')
             exit(2)
     else:
-        _perform_instance_action('delete-image', instance_uuid, config.token, data={
+        ImageCacheManager(config.runtime).forget(registry_path)
+        ImageFreshnessCache(config.runtime).forget(registry_path)
+        _perform_instance_action('delete-image', instance_uuid, config.client, data={
             'image_registry_path': registry_path
         })
         for line in output.splitlines():
@@ -90,15 +97,14 @@ def download(config, registry_path):
     """
     instance_uuid = _get_instance_token_or_exit_if_there_is_none()
 
-    p = subprocess.Popen(
-        ['docker', 'pull', registry_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output, error = p.communicate()
+    output, error = config.runtime.pull(registry_path)
 
     if error:
         for line in error.splitlines():
             click.echo(line + b'\n')
     else:
-        _perform_instance_action('add-image', instance_uuid, config.token, data={
+        ImageCacheManager(config.runtime).touch(registry_path)
+        _perform_instance_action('add-image', instance_uuid, config.client, data={
             'image_registry_path': registry_path
         })
         for line in output.splitlines():
@@ -106,13 +112,78 @@ def download(config, registry_path):
 
 
 @image.command(help='Update all the images in your system')
+@click.option('--concurrency', required=False, default=4, type=click.IntRange(1, None))
 @pass_obj
-def update_all(config):
+def update_all(config, concurrency):
     """
     It updates all the images downloaded by pulling from the registry.
 
+    The argument "concurrency" limits the number of images that are pulled at the same time.
+
     >>> sharedcloud image update_all
+    >>> sharedcloud image update_all --concurrency 2
 
     :param config: context object
+    :param concurrency: max number of images pulled at the same time
+    """
+    _update_all_images(config, concurrency=concurrency)
+
+
+@image.group(help='Inspect and pin the images kept under the disk budget')
+def cache():
+    """Inspect and pin the images kept under the disk budget"""
+
+
+@cache.command(help='Show the size and last use of the downloaded images')
+@pass_obj
+def stats(config):
+    """
+    It shows the downloaded images, from the most to the least recently used, and the total size that they take.
+
+    >>> sharedcloud image cache stats
+
+    :param config: context object
+    """
+    manager = ImageCacheManager(config.runtime)
+    entries, total = manager.stats()
+
+    now = datetime.datetime.now()
+    click.echo(tabulate(
+        [[entry['registry_path'],
+          _map_bytes_to_human_readable(entry.get('size'), entry, config.token),
+          timeago.format(datetime.datetime.fromtimestamp(entry['last_used']), now) if entry.get('last_used') else None,
+          _map_boolean_to_human_readable(entry.get('pinned'), entry, config.token)] for entry in entries],
+        headers=['REGISTRY_PATH', 'SIZE', 'LAST_USED', 'PINNED']))
+    click.echo('\nTotal: {} / Budget: {}'.format(
+        _map_bytes_to_human_readable(total, None, config.token),
+        _map_bytes_to_human_readable(manager.budget, None, config.token) or 'unlimited'))
+
+
+@cache.command(help='Pin an image, so it is never evicted')
+@click.option('--registry-path', required=True)
+@pass_obj
+def pin(config, registry_path):
+    """
+    It pins an image, so it's never evicted to stay under the disk budget.
+
+    >>> sharedcloud image cache pin --registry-path sharedcloud/web-crawling-python36:latest
+
+    :param config: context object
+    :param registry_path: the path to the DockerHub registry
+    """
+    ImageCacheManager(config.runtime).pin(registry_path)
+
+
+@cache.command(help='Unpin an image, so it can be evicted again')
+@click.option('--registry-path', required=True)
+@pass_obj
+def unpin(config, registry_path):
+    """
+    It unpins an image, so it can be evicted again to stay under the disk budget.
+
+    >>> sharedcloud image cache unpin --registry-path sharedcloud/web-crawling-python36:latest
+
+    :param config: context object
+    :param registry_path: the path to the DockerHub registry
     """
-    _update_all_images(config)
\ No newline at end of file
+    ImageCacheManager(config.runtime).pin(registry_path, pinned=False)
@@ -1,19 +1,26 @@
-import multiprocessing
 import os
-import subprocess
-import time
+import threading
 
 import click
-import requests
 from click import pass_obj
 
 from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, INSTANCE_TYPES, SHAREDCLOUD_CLI_INSTANCE_CONFIG_FILENAME, \
-    JOB_STATUSES
+    JOB_STATUSES, IMAGE_FRESHNESS_TTL, IMAGE_DISK_BUDGET, JOB_DEFAULT_CPUS, JOB_DEFAULT_MEMORY
+from sharedcloud_cli.gpus import GpuAllocator
+from sharedcloud_cli.images import ImageFreshnessCache, ImageCacheManager
+from sharedcloud_cli.job_output import JobOutputShipper
+from sharedcloud_cli.job_sources import JOB_SOURCES, _get_job_source
+from sharedcloud_cli.job_updates import JobUpdateCoalescer
 from sharedcloud_cli.mappers import _map_instance_status_to_human_representation, _map_instance_type_to_human_readable, \
     _map_datetime_obj_to_human_representation
+from sharedcloud_cli.placement import CpuPlacement, PLACEMENT_POLICIES
+from sharedcloud_cli.resources import AdmissionController
+from sharedcloud_cli.runtime import ContainerRuntimeError
+from sharedcloud_cli.scheduler import JobScheduler
 from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _create_resource, _list_resource, _update_resource, \
     _delete_resource, _update_image, _get_instance_token_or_exit_if_there_is_none, _perform_instance_action, \
-    _update_all_images, _get_jobs
+    _update_all_images, _get_resource
+from sharedcloud_cli.warm_pool import WarmContainerPool
 
 
 @click.group(help='List, create and modify your instances')
@@ -44,7 +51,7 @@ def create(config, name, type, ask_price, max_num_parallel_jobs, gpu_uuid):
     :param ask_price: min price for which the instance would be willing to process jobs
     :param max_num_parallel_jobs: max number of jobs that the instance is allowed to process in parallel
     """
-    r = _create_resource('{}/api/v1/instances/'.format(SHAREDCLOUD_CLI_URL), config.token, {
+    r = _create_resource('{}/api/v1/instances/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'name': name,
         'type': INSTANCE_TYPES[type.upper()],
         'ask_price': ask_price,
@@ -69,7 +76,7 @@ def list(config):
     :param config: context object
     """
     _list_resource('{}/api/v1/instances/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['UUID', 'NAME', 'STATUS', 'ASK_PRICE', 'TYPE', 'GPU', 'RUNNING_JOBS', 'MAX_NUM_PARALLEL_JOBS',
                     'LAST_CONNECTION'],
                    ['uuid', 'name', 'status', 'ask_price', 'type', 'gpu_name', 'num_running_jobs',
@@ -79,7 +86,9 @@ def list(config):
                        'status': _map_instance_status_to_human_representation,
                        'type': _map_instance_type_to_human_readable,
                        'last_connection': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   output=config.output,
+                   columns=config.columns)
 
 
 @instance.command(help='Update an instance')
@@ -104,7 +113,7 @@ def update(config, uuid, type, name, ask_price, max_num_parallel_jobs, gpu_uuid)
     :param max_num_parallel_jobs: max number of jobs that the instance is allowed to process in parallel
     """
 
-    _update_resource('{}/api/v1/instances/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, {
+    _update_resource('{}/api/v1/instances/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, {
         'uuid': uuid,
         'name': name,
         'type': INSTANCE_TYPES[type.upper()] if type else None,
@@ -127,7 +136,7 @@ def delete(config, uuid):
     :param uuid: uuid of the instance
     """
 
-    r = _delete_resource('{}/api/v1/instances/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, {
+    r = _delete_resource('{}/api/v1/instances/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, {
         'uuid': uuid
     })
 
@@ -138,35 +147,64 @@ def delete(config, uuid):
 
 @instance.command(help='Start the active instance in your system')
 @click.option('--job-timeout', required=False, default=1800.0, type=click.FLOAT)
+@click.option('--job-source', required=False, default='fixed', type=click.Choice(sorted(JOB_SOURCES.keys())))
+@click.option('--warm-pool-size', required=False, default=0, type=click.INT)
+@click.option('--warm-pool-max-jobs', required=False, default=50, type=click.INT)
+@click.option('--warm-pool-image', 'warm_pool_images', required=False, multiple=True)
+@click.option('--image-ttl', required=False, default=IMAGE_FRESHNESS_TTL, type=click.FLOAT)
+@click.option('--image-update-concurrency', required=False, default=4, type=click.IntRange(1, None))
+@click.option('--image-disk-budget', required=False, type=click.FLOAT)
+@click.option('--cpu-placement', required=False, default='none', type=click.Choice(PLACEMENT_POLICIES))
 @pass_obj
-def start(config, job_timeout):
+def start(config, job_timeout, job_source, warm_pool_size, warm_pool_max_jobs, warm_pool_images, image_ttl,
+          image_update_concurrency, image_disk_budget, cpu_placement):
     """
     Starts the active instance in your system.
 
     It's important to notice that, by default, jobs are automatically timeout to 30 minutes. This can be changed by
     the argument "job_timeout", but it's strongly discouraged to do this.
 
+    The argument "job_source" chooses how jobs are received: "fixed" asks the Backend every 5 seconds, "adaptive"
+    backs off while the instance is idle and "long-poll" keeps the request open until jobs arrive.
+
+    The argument "warm_pool_size" keeps that many idle containers already started for the most used images, so jobs
+    are executed inside of them without a cold start. Each container is recycled after "warm_pool_max_jobs" jobs.
+    As consecutive jobs (possibly of different users) share a warm container without any isolation between them, only
+    the images given with "warm_pool_image" are kept warm. Choose images whose jobs are stateless or trusted.
+
+    Images pulled in the last "image_ttl" seconds aren't pulled again before each job. On start, the downloaded
+    images are refreshed in the background, "image_update_concurrency" at a time, while jobs are already accepted.
+
+    The argument "image_disk_budget" caps the gigabytes used by the downloaded images. When it's exceeded, the least
+    recently used images that aren't pinned nor in use are removed.
+
+    Jobs are packed onto the cpus and the memory of the host (or of its cgroup), and only as many jobs as fit are
+    asked to the Backend. The resources allocated to each job are also the limits of its container, except for GPU
+    jobs, which are only limited by the cpus and memory that the Backend asks for.
+
+    With "cpu_placement" set to "numa", each running job is pinned to its own cpus, spreading the jobs across the
+    NUMA nodes of the host, so cache-heavy jobs don't thrash each other. The placement is shown in the build logs.
+
     >>> sharedcloud instance start
+    >>> sharedcloud instance start --job-source long-poll
+    >>> sharedcloud instance start --warm-pool-size 4 --warm-pool-image sharedcloud/standard-node8:latest
+    >>> sharedcloud instance start --image-disk-budget 20
+    >>> sharedcloud instance start --cpu-placement numa
 
     :param config: context object
-    :param uuid: uuid of the instance
+    :param job_timeout: seconds after which a job is considered timed out
+    :param job_source: strategy used to receive jobs from the Backend
+    :param warm_pool_size: number of idle containers kept warm. 0 disables the warm pool
+    :param warm_pool_max_jobs: number of jobs after which a warm container is recycled
+    :param warm_pool_images: images that can be kept warm
+    :param image_ttl: seconds during which a pulled image is considered fresh
+    :param image_update_concurrency: max number of images refreshed at the same time on start
+    :param image_disk_budget: max gigabytes used by the downloaded images. None means no limit
+    :param cpu_placement: policy used to pin jobs to cpus (e.g., none, numa)
     """
 
-    def _update_job(job_uuid, data, token):
-        """
-        Updates a job in Sharedcloud. It's mostly used to send the results.
-
-        :param job_uuid: job uuid
-        :param data: dict containing the data to change
-        :param token: user token
-        """
-        r = requests.patch('{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, job_uuid),
-                           data=data, headers={'Authorization': 'Token {}'.format(token)})
-        if r.status_code != 200:
-            raise Exception(r.content)
-        return r
-
-    def _run_container(job_uuid, job_wrapped_code, job_requires_gpu, job_image_registry_path):
+    def _run_container(job_uuid, job_wrapped_code, job_requires_gpu, job_image_registry_path, job_container=None,
+                       on_chunk=None, job_resources=None):
         """
         Runs a container based on the arguments provided.
 
@@ -174,28 +212,44 @@ def start(config, job_timeout):
         :param job_wrapped_code: job wrapped code
         :param job_requires_gpu: does the job requires gpu?
         :param job_image_registry_path: image path in the DockerHub registry
+        :param job_container: warm container where the job is executed (Default value = None)
+        :param on_chunk: function called with each chunk of output while the job runs (Default value = None)
+        :param job_resources: cpus, memory and GPUs allocated to the job, which are the limits of its container
+        (Default value = the default request)
         """
         container_name = job_uuid
         has_failed = False
 
-        args = ['docker', 'run', '--rm', '--name',
-                container_name, '-e', 'CODE={}'.format(job_wrapped_code), job_image_registry_path]
-
+        limits = dict(job_resources or {'cpus': JOB_DEFAULT_CPUS, 'memory': JOB_DEFAULT_MEMORY})
+        limits.pop('gpus', None)
+        for key in limits.pop('unlimited', ()):
+            limits.pop(key, None)
+        env = {'CODE': job_wrapped_code}
         if job_requires_gpu:
-            args.insert(2, '--runtime=nvidia')
-        else:
-            args.insert(2, '--memory=1024m')
-            args.insert(2, '--cpus=1')
-
-        p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output, error = p.communicate()
-
-        if p.returncode != 0:
+            limits['gpu'] = True
+        # Without a device, the job sees every GPU of the host
+        gpu_devices = limits.pop('gpu_devices', None)
+        if gpu_devices:
+            env['NVIDIA_VISIBLE_DEVICES'] = gpu_devices
+        try:
+            if job_container:
+                # Warm containers were started before the job got its cpus, so they are pinned now
+                if limits.get('cpuset_cpus'):
+                    config.runtime.update_container(
+                        job_container['id'], cpuset_cpus=limits['cpuset_cpus'], cpuset_mems=limits.get('cpuset_mems'))
+                output, error, exit_code = config.runtime.exec_container(
+                    job_container['id'], job_container['command'], env=env, on_chunk=on_chunk)
+            else:
+                output, error, exit_code = config.runtime.run(
+                    container_name, job_image_registry_path, env=env, on_chunk=on_chunk, **limits)
+        except ContainerRuntimeError as e:
+            output, error, exit_code = b'', str(e).encode('utf-8'), 1
+            if on_chunk:
+                on_chunk('stderr', error)
+                error = b''
+
+        if exit_code != 0:
             click.echo('[ERROR] Job {} has failed :('.format(job_uuid))
-            if job_requires_gpu:
-                click.echo(
-                    '[WARNING] As your instance is type "GPU", make sure that the "--max-num-parallel-jobs" in your instance is less than 3')
-
             has_failed = True
 
         return output, error, has_failed
@@ -204,15 +258,12 @@ def start(config, job_timeout):
         """
         Exit if the docker daemon is not running in this precise moment.
         """
-        p = subprocess.Popen(
-            ['docker', 'ps'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output, error = p.communicate()
-
-        if error:
+        if not config.runtime.ping():
             exit('Is the Docker daemon running in your machine?')
 
     def _job_loop(
-            config, job_uuid, job_requires_gpu, job_image_registry_path, job_wrapped_code):
+            config, job_uuid, job_requires_gpu, job_image_registry_path, job_wrapped_code, job_container=None,
+            job_resources=None):
         """
         Performs the job of executing a job and extract his results. It's executed inside a different process.
         :param config: context object
@@ -220,85 +271,240 @@ def start(config, job_timeout):
         :param job_requires_gpu: does the job requires gpu?
         :param job_image_registry_path: image path to the DockerHub registry
         :param job_wrapped_code: job wrapped code
+        :param job_container: warm container where the job is executed (Default value = None)
+        :param job_resources: cpus and memory allocated to the job (Default value = None)
 
         """
-        # We update the job in the remote, so it doesn't get assigned to other instances
-        _update_job(
+        build_logs = _update_image(job_image_registry_path, config.runtime, cache=image_cache)
+        image_manager.touch(job_image_registry_path)
+        if job_resources and job_resources.get('cpuset_cpus'):
+            build_logs += 'Pinned to cpus {} (NUMA nodes {})\n'.format(
+                job_resources['cpuset_cpus'], job_resources['cpuset_mems']).encode('utf-8')
+        if job_resources and job_resources.get('gpu_devices'):
+            build_logs += 'Assigned GPU/s {}\n'.format(job_resources['gpu_devices']).encode('utf-8')
+
+        # After the image has been generated, we run our container and calculate our result. The output is sent
+        # to the remote while the job runs, so it can be followed
+        shipper = JobOutputShipper(config.client, job_uuid).start()
+        try:
+            _, _, has_failed = _run_container(
+                job_uuid, job_wrapped_code, job_requires_gpu, job_image_registry_path, job_container,
+                on_chunk=shipper.write, job_resources=job_resources)
+        finally:
+            remaining_output = shipper.close()
+
+        # The results are persisted in the outbox before anything is sent, so they survive a crash of the worker.
+        # The output that couldn't be appended is copied to files, and streamed from them in a request of its own
+        try:
+            if remaining_output:
+                job_updates.put_outputs(job_uuid, remaining_output)
+        finally:
+            shipper.discard()
+        job_updates.put(
             job_uuid, {
-                "status": JOB_STATUSES['IN_PROGRESS']
-            }, config.token)
+                "build_logs": build_logs,
+                "status": JOB_STATUSES['FAILED'] if has_failed else JOB_STATUSES['SUCCEEDED']
+            })
 
-        build_logs = _update_image(job_image_registry_path)
+        # The exit code lets the main process know whether the (warm) container is still healthy
+        if has_failed:
+            exit(1)
 
-        # After the image has been generated, we run our container and calculate our result
-        output, error, has_failed = _run_container(
-            job_uuid, job_wrapped_code, job_requires_gpu, job_image_registry_path)
+    def _on_job_timeout(job_uuid):
+        """
+        Let the remote know that a job took longer than "job_timeout".
 
-        _update_job(
+        :param job_uuid: job uuid
+        """
+        click.echo('[WARNING] Job {} has timed out'.format(job_uuid))
+        # Warm containers aren't named after the job, so they are removed by their id
+        if warm_pool and job_uuid in warm_pool.busy:
+            warm_pool.kill(job_uuid)
+        else:
+            try:
+                config.runtime.remove_container(job_uuid)
+            except ContainerRuntimeError:
+                pass
+        job_updates.put(
             job_uuid, {
-                "build_logs": build_logs,
-                "output": output,
-                "error": error,
-                "status": JOB_STATUSES['FAILED'] if has_failed else JOB_STATUSES['SUCCEEDED']
-            }, config.token)
+                "status": JOB_STATUSES['TIMEOUT']
+            })
+
+    def _refresh_images():
+        """
+        Update all the downloaded images. It runs in a thread, so its errors (even "exit") are only logged, as
+        nobody else would see them.
+        """
+        try:
+            _update_all_images(config, cache=image_cache, concurrency=image_update_concurrency)
+        except (Exception, SystemExit) as e:
+            click.echo('[WARNING] Downloaded images could not be updated: {!r}'.format(e))
+
+    def _on_image_evicted(registry_path):
+        """
+        Let the remote know that an image has been evicted from the instance.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        click.echo('[INFO] Image {} has been evicted to stay under the disk budget'.format(registry_path))
+        image_cache.forget(registry_path)
+        _perform_instance_action('delete-image', instance_uuid, config.client, data={
+            'image_registry_path': registry_path
+        })
+
+    def _evict_images():
+        """
+        Evict images whenever a job finishes and the disk budget is exceeded. It runs in a thread, so a slow removal
+        of an image doesn't delay starting and reaping jobs.
+        """
+        while True:
+            eviction_requested.wait()
+            eviction_requested.clear()
+            # The images in use are read right before evicting, so the jobs started meanwhile keep theirs
+            in_use = set(dict(running_images).values())
+            if warm_pool:
+                in_use.update(image for image, _ in list(warm_pool.idle.keys()))
+            try:
+                image_manager.evict(on_evict=_on_image_evicted, in_use=in_use)
+            except (Exception, SystemExit) as e:
+                click.echo('[WARNING] Images could not be evicted: {!r}'.format(e))
+
+    def _on_job_finish(job_uuid, exit_code):
+        """
+        Give back the warm container of a finished job, and evict images if the disk budget is exceeded.
+
+        :param job_uuid: job uuid
+        :param exit_code: exit code of the job process
+        """
+        running_images.pop(job_uuid, None)
+        if warm_pool:
+            warm_pool.release(job_uuid, has_failed=exit_code != 0)
+        eviction_requested.set()
 
     instance_uuid = _get_instance_token_or_exit_if_there_is_none()
 
     _exit_if_docker_daemon_is_not_running()
 
+    image_cache = ImageFreshnessCache(config.runtime, ttl=image_ttl)
+    image_manager = ImageCacheManager(
+        config.runtime, budget=image_disk_budget * 1024 ** 3 if image_disk_budget is not None else IMAGE_DISK_BUDGET)
+    warm_pool = None
+    if warm_pool_size > 0 and not warm_pool_images:
+        click.echo('[WARNING] The warm pool is disabled, as no image was given with "--warm-pool-image"')
+    elif warm_pool_size > 0:
+        warm_pool = WarmContainerPool(config.runtime, warm_pool_size, warm_pool_max_jobs, images=warm_pool_images)
+    running_images = {}
+    eviction_requested = threading.Event()
+    # Status transitions and results of all the jobs are persisted in the outbox, and sent together from this process.
+    # The ones that a previous run couldn't deliver are replayed
+    job_updates = JobUpdateCoalescer(config.client)
+
     try:
         # First, we let our remote know that we are starting the instance
-        _perform_instance_action('start', instance_uuid, config.token)
-        click.echo('[INFO] Updating all downloaded images...')
-        _update_all_images(config)
+        _perform_instance_action('start', instance_uuid, config.client)
+        job_updates.start()
+        # Jobs whose image is still being refreshed wait for that pull, thanks to the freshness cache
+        click.echo('[INFO] Updating all downloaded images in the background...')
+        refresh = threading.Thread(target=_refresh_images)
+        refresh.daemon = True
+        refresh.start()
+        evictor = threading.Thread(target=_evict_images)
+        evictor.daemon = True
+        evictor.start()
 
         click.echo('[INFO] Ready to take Jobs...')
 
-        # Second, we are going to ask the remote, each x seconds, if they have new jobs for us
+        # Jobs run in as many slots as parallel jobs the instance accepts, as long as their resources are free
+        instance_data = _get_resource(
+            '{}/api/v1/instances/{}/'.format(SHAREDCLOUD_CLI_URL, instance_uuid), config.client).json()
+        admission = AdmissionController.from_host()
+        click.echo('[INFO] Jobs can use {:g} cpus{}'.format(
+            admission.cpus, ' and {}MB of memory'.format(admission.memory) if admission.memory is not None else ''))
+        placement = CpuPlacement.from_host() if cpu_placement == 'numa' else None
+        if placement:
+            click.echo('[INFO] Jobs are pinned to their own cpus across {} NUMA node/s'.format(len(placement.nodes)))
+        # Each job of a GPU instance gets its own GPUs
+        gpus = GpuAllocator.from_probe() if instance_data.get('type') == INSTANCE_TYPES['GPU'] else None
+        if gpus is not None:
+            if gpus.devices:
+                click.echo('[INFO] Jobs are given their own GPUs out of {}: {}'.format(
+                    len(gpus.devices), ', '.join('{} ({})'.format(index, device['name'] or 'unknown')
+                                                 for index, device in gpus.devices.items())))
+            else:
+                click.echo('[WARNING] No GPUs were found, so every job will see all of them')
+                gpus = None
+        scheduler = JobScheduler(instance_data.get('max_num_parallel_jobs') or 1, job_timeout,  # 30 minutes as default
+                                 on_timeout=_on_job_timeout, on_finish=_on_job_finish, admission=admission,
+                                 placement=placement, gpus=gpus)
+
+        # Second, we are going to ask the remote if they have new jobs for us, as long as we have free slots
+        source = _get_job_source(job_source, instance_uuid, config.client)
         while True:
-            r = _get_jobs(instance_uuid, config.token)
-
-            # If they do have new jobs, we process them...
-            jobs = r.json()
-            num_jobs = len(jobs)
-            if num_jobs > 0:
-                click.echo('[INFO] {} job/s arrived, please be patient...'.format(num_jobs))
-
-            processes = {}
-            for job in jobs:
-                # We extract some useful data about the job/instance that we are going to need
-                job_uuid = job.get('job_uuid')
-                click.echo('[INFO] Starting Job {}...'.format(job_uuid))
-
-                job_requires_gpu = job.get('requires_gpu')
-                job_image_registry_path = job.get('image_registry_path')
-                job_wrapped_code = job.get('wrapped_code')
-
-                processes[job_uuid] = multiprocessing.Process(target=_job_loop, name="_job_loop", args=(
-                    config, job_uuid, job_requires_gpu, job_image_registry_path, job_wrapped_code))
-
-            for job_uuid, process in processes.items():
-                process.start()
-
-            for job_uuid, process in processes.items():
-                process.join(job_timeout)  # 30 minutes as default timeout
-
-                if process.is_alive():
-                    _update_job(
-                        job_uuid, {
-                            "status": JOB_STATUSES['TIMEOUT']
-                        }, config.token
-                    )
-                    process.terminate()
-
-            if num_jobs > 0:
+            interval = None
+            free_slots = scheduler.free_slots
+            if free_slots > 0:
+                # If they do have new jobs, we process them. We only ask for as many jobs as fit in the host. Jobs
+                # that we already have can be received again until the remote knows that we took them
+                jobs = [job for job in source.get_jobs(limit=free_slots)
+                        if not scheduler.is_scheduled(job.get('job_uuid'))]
+                num_jobs = len(jobs)
+                if num_jobs > 0:
+                    click.echo('[INFO] {} job/s arrived, please be patient...'.format(num_jobs))
+
+                # We claim the jobs in the remote before starting them, so they don't get assigned again to us or to
+                # other instances. Only the accepted ones are started: the ones whose claim wasn't delivered arrive
+                # again in the next check
+                claims = job_updates.send_now(
+                    [(job.get('job_uuid'), {"status": JOB_STATUSES['IN_PROGRESS']}) for job in jobs])
+
+                for job in jobs:
+                    # We extract some useful data about the job/instance that we are going to need
+                    job_uuid = job.get('job_uuid')
+                    if claims.get(job_uuid) != job_updates.ACCEPTED:
+                        if claims.get(job_uuid) == job_updates.REJECTED:
+                            click.echo('[WARNING] Job {} couldn\'t be claimed, so it\'s skipped'.format(job_uuid))
+                        continue
+                    click.echo('[INFO] Starting Job {}...'.format(job_uuid))
+
+                    job_requires_gpu = job.get('requires_gpu')
+                    job_image_registry_path = job.get('image_registry_path')
+                    job_wrapped_code = job.get('wrapped_code')
+                    job_resources = admission.request_for(job)
+                    if job_requires_gpu:
+                        # The default cpus and memory are far too small for GPU jobs, so their containers are only
+                        # limited by what the remote asks for. They are still counted to pack the jobs in the host
+                        job_resources['unlimited'] = [key for key in ('cpus', 'memory') if not job.get(key)]
+                    if gpus:
+                        job_resources['gpus'] = int(job.get('num_gpus') or 1) if job_requires_gpu else 0
+                    # Warm containers are started with the default limits and see every GPU, so jobs with their own
+                    # GPUs don't use them. CPU jobs of GPU instances ask for no GPUs, and do use them
+                    is_default_request = all(
+                        job_resources[key] == value for key, value in admission.default_request.items())
+                    job_container = warm_pool.acquire(
+                        job_uuid, job_image_registry_path, job_requires_gpu
+                    ) if warm_pool and is_default_request and not job_resources.get('gpus') else None
+
+                    running_images[job_uuid] = job_image_registry_path
+                    scheduler.submit(job_uuid, _job_loop, (
+                        config, job_uuid, job_requires_gpu, job_image_registry_path, job_wrapped_code, job_container,
+                        job_resources), resources=job_resources)
+
+                interval = source.next_interval(num_jobs)
+
+            # We wait until the next check, or until a slot gets free
+            was_idle = scheduler.is_idle
+            scheduler.wait(interval)
+            if not was_idle and scheduler.is_idle:
                 click.echo('[INFO] All jobs were completed.')
 
-            # We wait 5 seconds until the next check
-            time.sleep(5)
+            if warm_pool:
+                warm_pool.replenish()
 
     except (Exception, KeyboardInterrupt) as e:
         click.echo(e)
+        if warm_pool:
+            warm_pool.close()
+        job_updates.close()
         click.echo('Instance {} has just stopped!'.format(instance_uuid))
-        _perform_instance_action('stop', instance_uuid, config.token)
+        _perform_instance_action('stop', instance_uuid, config.client)
         exit(1)
@@ -1,10 +1,20 @@
+import datetime
+
 import click
 from click import pass_obj
 
-from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, JOB_STATUSES, DATETIME_FORMAT, DOWNLOAD_CONCURRENCY, \
+    LIST_PAGE_SIZE
 from sharedcloud_cli.mappers import _map_non_formatted_money_to_version_with_currency, _map_duration_to_human_readable, \
-    _map_job_status_to_human_representation, _map_datetime_obj_to_human_representation
-from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _list_resource, _show_field_value
+    _map_job_status_to_human_representation, _map_datetime_obj_to_human_representation, _parse_datetime
+from sharedcloud_cli.options import pagination_options, TimeBoundary, field_range_options
+from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _list_resource, _show_field_value, ResourceFilter, \
+    _iter_pages
+
+JOB_SORT_FIELDS = ['created_at', 'cost', 'duration', 'status', 'incremental_id']
+
+# Fields of "job download", and the attributes where the Backend sends them
+JOB_DOWNLOAD_FIELDS = {'result': 'result', 'stdout': 'stdout', 'stderr': 'stderr', 'logs': 'build_logs'}
 
 
 @click.group(help='List all your jobs')
@@ -14,18 +24,147 @@ def job(config):
     _exit_if_user_is_logged_out(config.token)
 
 
+def _resolve_time(boundary, resource=None):
+    """
+    Turn a time boundary into a datetime. Relative times are resolved against the server time of the resource.
+
+    :param boundary: datetime or timedelta
+    :param resource: resource sent by the Backend (Default value = None)
+    """
+    if not isinstance(boundary, datetime.timedelta):
+        return boundary
+    server_time = (resource or {}).get('current_server_time')
+    now = _parse_datetime(server_time) if server_time else datetime.datetime.utcnow()
+    return now - boundary
+
+
+def _time_filter(param, boundary, is_lower_bound):
+    """
+    Filter of the jobs created after (or before) a point in time.
+
+    :param param: query param understood by the Backend
+    :param boundary: datetime or timedelta
+    :param is_lower_bound: whether jobs need to be created after the boundary
+    """
+
+    def _predicate(created_at, resource):
+        if not created_at:
+            return False
+        created_at = _parse_datetime(created_at)
+        limit = _resolve_time(boundary, resource)
+        return created_at >= limit if is_lower_bound else created_at <= limit
+
+    return ResourceFilter('created_at', {param: _resolve_time(boundary).strftime(DATETIME_FORMAT)}, _predicate)
+
+
+def _cost_filter(param, cost, is_lower_bound):
+    """
+    Filter of the jobs that cost more (or less) than an amount.
+
+    :param param: query param understood by the Backend
+    :param cost: amount of money
+    :param is_lower_bound: whether jobs need to cost more than the amount
+    """
+
+    def _predicate(value, resource):
+        if value is None:
+            return False
+        return float(value) >= cost if is_lower_bound else float(value) <= cost
+
+    return ResourceFilter('cost', {param: cost}, _predicate)
+
+
+def _job_filters(status, run, function, since, until, min_cost, max_cost):
+    """
+    Translate the options of "job list" into filters.
+
+    :param status: tuple of job status names
+    :param run: uuid of the run
+    :param function: name of the function
+    :param since: lower time boundary
+    :param until: upper time boundary
+    :param min_cost: min cost
+    :param max_cost: max cost
+    """
+    filters = []
+    if status:
+        codes = [JOB_STATUSES[name.upper()] for name in status]
+        filters.append(ResourceFilter('status', {'status': codes}, lambda value, resource: value in codes))
+    if run:
+        filters.append(ResourceFilter('run', {'run': str(run)}, lambda value, resource: value == str(run)))
+    if function:
+        filters.append(ResourceFilter('function_name', {'function_name': function},
+                                      lambda value, resource: value == function))
+    if since is not None:
+        filters.append(_time_filter('created_at__gte', since, is_lower_bound=True))
+    if until is not None:
+        filters.append(_time_filter('created_at__lte', until, is_lower_bound=False))
+    if min_cost is not None:
+        filters.append(_cost_filter('cost__gte', min_cost, is_lower_bound=True))
+    if max_cost is not None:
+        filters.append(_cost_filter('cost__lte', max_cost, is_lower_bound=False))
+    return filters
+
+
+def _parse_download_fields(ctx, param, value):
+    """
+    Parse a comma separated list of job fields (e.g., "result,stdout") into the attributes sent by the Backend.
+
+    :param ctx: cmd context
+    :param param: cmd parameter
+    :param value: comma separated list of fields
+    """
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in JOB_DOWNLOAD_FIELDS]
+    if not fields or unknown:
+        raise click.BadParameter('Fields need to be a comma separated list of: {}'.format(
+            ', '.join(sorted(JOB_DOWNLOAD_FIELDS.keys()))))
+    return [JOB_DOWNLOAD_FIELDS[field] for field in fields]
+
+
 @job.command(help='List all your jobs')
+@click.option('--status', required=False, multiple=True,
+              type=click.Choice(sorted(JOB_STATUSES.keys()) + sorted(name.lower() for name in JOB_STATUSES.keys())))
+@click.option('--run', required=False, type=click.UUID)
+@click.option('--function', required=False)
+@click.option('--since', required=False, type=TimeBoundary())
+@click.option('--until', required=False, type=TimeBoundary())
+@click.option('--min-cost', required=False, type=click.FLOAT)
+@click.option('--max-cost', required=False, type=click.FLOAT)
+@click.option('--sort', required=False,
+              type=click.Choice(JOB_SORT_FIELDS + ['-{}'.format(field) for field in JOB_SORT_FIELDS]))
+@pagination_options
 @pass_obj
-def list(config):
+def list(config, status, run, function, since, until, min_cost, max_cost, sort, pagination):
     """
     It lists all your jobs.
 
+    Jobs are fetched and displayed page by page. By default only the first page is displayed, use "--limit" to
+    display up to a number of jobs or "--all" to display all of them.
+
+    Jobs can be filtered by status (the flag can be repeated), run, function, creation time and cost. The filters
+    are applied by the server, and again as each page arrives in case the server can't apply some of them.
+    The times are either dates or relative to now (e.g., "12h", "7d"). The order ("--sort", with a "-" prefix for
+    descending order) is only applied by the server.
+
     >>> sharedcloud job list
+    >>> sharedcloud job list --limit 500 --page-size 250
+    >>> sharedcloud job list --all --column-widths 36,6,10
+    >>> sharedcloud job list --status FAILED --run 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --since 7d --sort -cost
 
     :param config: context object
+    :param status: tuple of job status names
+    :param run: uuid of the run
+    :param function: name of the function
+    :param since: only jobs created after this time
+    :param until: only jobs created before this time
+    :param min_cost: only jobs that cost at least this amount
+    :param max_cost: only jobs that cost at most this amount
+    :param sort: field used to sort the jobs
+    :param pagination: dict with the "limit", "page_size", "all_pages" and "column_widths" options
     """
     _list_resource('{}/api/v1/jobs/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['UUID', 'ID', 'STATUS', 'COST', 'DURATION', 'WHEN', 'RUN_UUID', 'FUNCTION'],
                    ['uuid', 'incremental_id', 'status', 'cost', 'duration', 'created_at', 'run', 'function_name'],
                    mappers={
@@ -33,64 +172,140 @@ def list(config):
                        'duration': _map_duration_to_human_readable,
                        'status': _map_job_status_to_human_representation,
                        'created_at': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   pagination=pagination,
+                   output=config.output,
+                   columns=config.columns,
+                   filters=_job_filters(status, run, function, since, until, min_cost, max_cost),
+                   params={'ordering': sort} if sort else None)
 
 
 @job.command(help='Display the build logs of a job')
 @click.option('--uuid', required=True, type=click.UUID)
+@field_range_options
 @pass_obj
-def logs(config, uuid):
+def logs(config, uuid, head, tail):
     """
     It prints the logs of a job into stdout by providing an identifier (UUID).
 
     >>> sharedcloud job logs --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647
+    >>> sharedcloud job logs --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --tail 4096
 
     :param config: context object
+    :param head: only print the first bytes
+    :param tail: only print the last bytes
     """
     _show_field_value(
-        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, 'build_logs')
+        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, 'build_logs', head=head, tail=tail)
 
 
 @job.command(help='Display the result of a job')
 @click.option('--uuid', required=True, type=click.UUID)
+@field_range_options
 @pass_obj
-def result(config, uuid):
+def result(config, uuid, head, tail):
     """
     It prints the result of a job into stdout by providing an identifier (UUID).
 
     >>> sharedcloud job result --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647
+    >>> sharedcloud job result --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --head 1024
 
     :param config: context object
+    :param head: only print the first bytes
+    :param tail: only print the last bytes
     """
     _show_field_value(
-        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, 'result')
+        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, 'result', head=head, tail=tail)
 
 
 @job.command(help='Display the stdout of a job')
 @click.option('--uuid', required=True, type=click.UUID)
+@click.option('--follow', is_flag=True, help='Keep printing the new stdout until the job finishes')
+@field_range_options
 @pass_obj
-def stdout(config, uuid):
+def stdout(config, uuid, follow, head, tail):
     """
     It prints the output of a job into stdout by providing an identifier (UUID).
 
+    With "--follow", the output of a running job is printed as it's produced, until the job finishes.
+
     >>> sharedcloud job stdout --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647
+    >>> sharedcloud job stdout --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --tail 4096
+    >>> sharedcloud job stdout --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --follow
 
     :param config: context object
+    :param follow: flag to keep printing the new stdout until the job finishes
+    :param head: only print the first bytes
+    :param tail: only print the last bytes
     """
+    if follow and head is not None:
+        raise click.UsageError('"--head" can\'t be used with "--follow"')
     _show_field_value(
-        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, 'stdout')
+        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, 'stdout', head=head, tail=tail,
+        follow=follow)
 
 
 @job.command(help='Display the stderr of a job')
 @click.option('--uuid', required=True, type=click.UUID)
+@click.option('--follow', is_flag=True, help='Keep printing the new stderr until the job finishes')
+@field_range_options
 @pass_obj
-def stderr(config, uuid):
+def stderr(config, uuid, follow, head, tail):
     """
     It prints the stderr of a job into stdout by providing an identifier (UUID).
 
+    With "--follow", the stderr of a running job is printed as it's produced, until the job finishes.
+
     >>> sharedcloud job stderr --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647
+    >>> sharedcloud job stderr --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --tail 4096
+    >>> sharedcloud job stderr --uuid 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --follow
 
     :param config: context object
+    :param follow: flag to keep printing the new stderr until the job finishes
+    :param head: only print the first bytes
+    :param tail: only print the last bytes
     """
+    if follow and head is not None:
+        raise click.UsageError('"--head" can\'t be used with "--follow"')
     _show_field_value(
-        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, 'stderr')
+        '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, 'stderr', head=head, tail=tail,
+        follow=follow)
+
+
+@job.command(help='Download the results of all the jobs of a run')
+@click.option('--run', required=True, type=click.UUID)
+@click.option('--fields', required=False, default='result', callback=_parse_download_fields)
+@click.option('--dest', required=False, default='.', type=click.Path(file_okay=False))
+@click.option('--concurrency', required=False, default=DOWNLOAD_CONCURRENCY, type=click.IntRange(1, None))
+@pass_obj
+def download(config, run, fields, dest, concurrency):
+    """
+    It downloads some fields (result, stdout, stderr or logs) of all the finished jobs of a run, writing one JSON
+    file per job (named after its UUID) into a folder.
+
+    Jobs are fetched concurrently. Downloads can be resumed, as the jobs that were already downloaded are skipped.
+
+    >>> sharedcloud job download --run 8b8b6cc2-ebde-418a-88ba-84e0d6f76647 --fields result,stdout --dest results/
+
+    :param config: context object
+    :param run: uuid of the run
+    :param fields: list of fields of the jobs
+    :param dest: folder where the files are written
+    :param concurrency: max number of jobs fetched at the same time
+    """
+    from sharedcloud_cli.client import Client
+    from sharedcloud_cli.downloads import JobDownloader
+
+    # A client of its own, with a connection per concurrent download
+    client = Client(token=config.token, pool_maxsize=concurrency)
+    try:
+        pages = _iter_pages('{}/api/v1/jobs/'.format(SHAREDCLOUD_CLI_URL), client, page_size=LIST_PAGE_SIZE,
+                            all_pages=True, filters=_job_filters(None, run, None, None, None, None, None))
+        counts = JobDownloader(client, dest, fields, concurrency=concurrency).download(pages)
+    finally:
+        client.close()
+
+    click.echo('{downloaded} downloaded, {skipped} already downloaded, {unfinished} not finished yet, '
+               '{failed} failed'.format(**counts))
+    if counts['failed']:
+        exit(1)
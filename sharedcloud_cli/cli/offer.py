@@ -26,12 +26,14 @@ def list(config):
     :param config: context object
     """
     _list_resource('{}/api/v1/offers/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['INSTANCE_NAME', 'TYPE', 'GPU', 'CUDA_CORES', 'ASK_PRICE', 'WHEN'],
                    ['name', 'type', 'gpu_name', 'cuda_cores', 'ask_price', 'last_connection'],
                    mappers={
                        'ask_price': _map_non_formatted_money_to_version_with_currency,
                        'type': _map_instance_type_to_human_readable,
                        'last_connection': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   output=config.output,
+                   columns=config.columns)
 
@@ -4,6 +4,7 @@ from click import pass_obj
 from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL
 from sharedcloud_cli.mappers import _map_non_formatted_money_to_version_with_currency, \
     _map_datetime_obj_to_human_representation
+from sharedcloud_cli.options import pagination_options
 from sharedcloud_cli.utils import _exit_if_user_is_logged_out, _create_resource, _delete_resource, _list_resource
 
 
@@ -35,7 +36,7 @@ def create(config, function_uuid, parameters, bid_price, base_gpu_uuid):
     :param bid_price: max price that the user is willing to pay
     :param base_gpu_uuid: uuid of the gpu that it's the "minimum requirement" to run the batch of jobs created by this run
     """
-    _create_resource('{}/api/v1/runs/'.format(SHAREDCLOUD_CLI_URL), config.token, {
+    _create_resource('{}/api/v1/runs/'.format(SHAREDCLOUD_CLI_URL), config.client, {
         'function': function_uuid,
         'parameters': parameters,
         'bid_price': bid_price,
@@ -55,27 +56,36 @@ def delete(config, uuid):
     :param config: context object
     :param uuid: uuid of the function
     """
-    _delete_resource('{}/api/v1/runs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.token, {
+    _delete_resource('{}/api/v1/runs/{}/'.format(SHAREDCLOUD_CLI_URL, uuid), config.client, {
         'uuid': uuid
     })
 
 
 @run.command(help='List all your runs')
+@pagination_options
 @pass_obj
-def list(config):
+def list(config, pagination):
     """
     Run list sub-command. It lists all the user's runs.
 
+    Runs are fetched and displayed page by page. By default only the first page is displayed, use "--limit" to
+    display up to a number of runs or "--all" to display all of them.
+
     >>> sharedcloud run list
+    >>> sharedcloud run list --all
 
     :param config: context object
+    :param pagination: dict with the "limit", "page_size", "all_pages" and "column_widths" options
     """
     _list_resource('{}/api/v1/runs/'.format(SHAREDCLOUD_CLI_URL),
-                   config.token,
+                   config.client,
                    ['UUID', 'PARAMETERS', 'BID_PRICE', 'BASE_GPU', 'FUNCTION', 'WHEN'],
                    ['uuid', 'parameters', 'bid_price', 'base_gpu_name', 'function_name', 'created_at'],
                    mappers={
                        'bid_price': _map_non_formatted_money_to_version_with_currency,
                        'created_at': _map_datetime_obj_to_human_representation
-                   })
+                   },
+                   pagination=pagination,
+                   output=config.output,
+                   columns=config.columns)
 
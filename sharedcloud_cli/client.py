@@ -0,0 +1,117 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_POOL_CONNECTIONS, SHAREDCLOUD_CLI_POOL_MAXSIZE, \
+    SHAREDCLOUD_CLI_MAX_RETRIES
+
+
+class Client(object):
+    """
+    HTTP client used for all the requests to the Backend.
+
+    It keeps a pool of keep-alive connections per host, so the TCP+TLS handshake is only paid once per connection
+    instead of once per request. The authorization header is applied once to the underlying session.
+
+    The session is rebuilt lazily after a fork (e.g., inside the job processes of "instance start"), as pooled
+    sockets can't be shared between processes.
+    """
+
+    def __init__(self, token=None, pool_connections=SHAREDCLOUD_CLI_POOL_CONNECTIONS,
+                 pool_maxsize=SHAREDCLOUD_CLI_POOL_MAXSIZE, max_retries=SHAREDCLOUD_CLI_MAX_RETRIES, cache=None):
+        self.token = token
+        self.cache = cache
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self._session = None
+        self._pid = None
+
+    def _create_session(self):
+        """
+        Create a new session with the connection pools mounted and the auth headers applied.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              max_retries=self.max_retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if self.token:
+            session.headers['Authorization'] = 'Token {}'.format(self.token)
+        return session
+
+    @property
+    def session(self):
+        """
+        Session bound to the current process.
+        """
+        if self._session is None or self._pid != os.getpid():
+            self._session = self._create_session()
+            self._pid = os.getpid()
+        return self._session
+
+    def request(self, method, url, auth=True, **kwargs):
+        """
+        Perform a request reusing the pooled connections.
+
+        :param method: http method (e.g., GET, POST)
+        :param url: url of the request
+        :param auth: whether to send the authorization header (Default value = True)
+        :param kwargs: extra arguments accepted by "requests"
+        """
+        if not auth:
+            # "requests" drops the session headers that are explicitly set to None
+            headers = kwargs.pop('headers', None) or {}
+            headers['Authorization'] = None
+            kwargs['headers'] = headers
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def get_cached(self, url, ttl, params=None):
+        """
+        Perform a GET request through the response cache, if there is one.
+
+        :param url: url of the request
+        :param ttl: seconds during which a cached response is served without revalidating it
+        :param params: query params (Default value = None)
+        """
+        if self.cache is None or not ttl:
+            return self.get(url, params=params)
+        return self.cache.get(self, url, ttl, params=params)
+
+    def invalidate_cache(self, url_prefix):
+        """
+        Drop the cached responses of the urls that start with a prefix.
+
+        :param url_prefix: prefix of the urls
+        """
+        if self.cache is not None:
+            self.cache.invalidate(url_prefix)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """
+        Close all the pooled connections.
+        """
+        if self._session is not None and self._pid == os.getpid():
+            self._session.close()
+        self._session = None
+
+    def __getstate__(self):
+        # Sessions hold sockets, so they are never sent to other processes
+        state = self.__dict__.copy()
+        state['_session'] = None
+        state['_pid'] = None
+        return state
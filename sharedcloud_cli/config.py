@@ -3,12 +3,40 @@ import click
 
 class Config(object):
     """
-    Context object that will contain the user token.
+    Context object that will contain the user token, and the HTTP client and container runtime shared by all
+    the commands.
     """
 
     def __init__(self):
         self.token = None
+        self.output = 'table'
+        self.columns = None
+        self.use_cache = True
+        self._client = None
+        self._runtime = None
 
+    @property
+    def client(self):
+        """
+        HTTP client that lives for the whole process. It's created on first use with the user token.
+        """
+        if self._client is None:
+            from sharedcloud_cli.client import Client  # "requests" is only imported by the commands that need it
+            from sharedcloud_cli.response_cache import ResponseCache
 
-pass_config = click.make_pass_decorator(Config, ensure=True)
+            self._client = Client(token=self.token, cache=ResponseCache() if self.use_cache else None)
+        return self._client
+
+    @property
+    def runtime(self):
+        """
+        Container runtime used to talk to Docker. It's created on first use.
+        """
+        if self._runtime is None:
+            from sharedcloud_cli.runtime import _get_container_runtime
+
+            self._runtime = _get_container_runtime()
+        return self._runtime
 
+
+pass_config = click.make_pass_decorator(Config, ensure=True)
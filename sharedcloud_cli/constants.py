@@ -11,6 +11,86 @@ SHAREDCLOUD_CLI_CLIENT_CONFIG_FILENAME = '{}/{}'.format(DATA_FOLDER, os.environ.
     'SHAREDCLOUD_CLI_CLIENT_CONFIG_FILENAME', 'client_config'))
 SHAREDCLOUD_CLI_INSTANCE_CONFIG_FILENAME = '{}/{}'.format(DATA_FOLDER, os.environ.get(
     'SHAREDCLOUD_CLI_INSTANCE_CONFIG_FILENAME', 'instance_config'))
+SHAREDCLOUD_CLI_FUNCTION_CODE_INDEX_FILENAME = '{}/{}'.format(DATA_FOLDER, os.environ.get(
+    'SHAREDCLOUD_CLI_FUNCTION_CODE_INDEX_FILENAME', 'function_code_index'))
+SHAREDCLOUD_CLI_JOB_OUTBOX_FILENAME = '{}/{}'.format(DATA_FOLDER, os.environ.get(
+    'SHAREDCLOUD_CLI_JOB_OUTBOX_FILENAME', 'job_outbox.sqlite3'))
+
+# Connection pooling for the requests sent to the Backend
+SHAREDCLOUD_CLI_POOL_CONNECTIONS = int(os.environ.get('SHAREDCLOUD_CLI_POOL_CONNECTIONS', 4))
+SHAREDCLOUD_CLI_POOL_MAXSIZE = int(os.environ.get('SHAREDCLOUD_CLI_POOL_MAXSIZE', 10))
+SHAREDCLOUD_CLI_MAX_RETRIES = int(os.environ.get('SHAREDCLOUD_CLI_MAX_RETRIES', 0))
+
+# Bytes of a file read and compressed at a time while uploading it
+UPLOAD_CHUNK_SIZE = int(os.environ.get('SHAREDCLOUD_CLI_UPLOAD_CHUNK_SIZE', 256 * 1024))
+
+# Bytes of a field (e.g., the stdout of a job) read and printed at a time
+FIELD_CHUNK_SIZE = int(os.environ.get('SHAREDCLOUD_CLI_FIELD_CHUNK_SIZE', 64 * 1024))
+
+# Seconds between checks for new output of a job with "--follow"
+FOLLOW_POLL_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_FOLLOW_POLL_INTERVAL', 2))
+
+# The output of a running job is sent to the Backend every N seconds, or as soon as N bytes are waiting
+OUTPUT_FLUSH_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_OUTPUT_FLUSH_INTERVAL', 5))
+OUTPUT_FLUSH_SIZE = int(os.environ.get('SHAREDCLOUD_CLI_OUTPUT_FLUSH_SIZE', 64 * 1024))
+
+# Max bytes of stdout (and of stderr) kept per job. Past it, only the first and the last halves are kept
+OUTPUT_CAP = int(os.environ.get('SHAREDCLOUD_CLI_OUTPUT_CAP', 64 * 1024 * 1024))
+# Bytes of captured output kept in memory before it's spooled to a temporary file
+OUTPUT_SPOOL_MEMORY = int(os.environ.get('SHAREDCLOUD_CLI_OUTPUT_SPOOL_MEMORY', 1024 * 1024))
+
+# Updates of jobs (e.g., status, results) are sent together every N seconds, up to N jobs per request
+UPDATE_BATCH_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_UPDATE_BATCH_INTERVAL', 0.2))
+UPDATE_BATCH_SIZE = int(os.environ.get('SHAREDCLOUD_CLI_UPDATE_BATCH_SIZE', 100))
+# Max seconds between retries of the updates that couldn't be sent
+UPDATE_MAX_BACKOFF = float(os.environ.get('SHAREDCLOUD_CLI_UPDATE_MAX_BACKOFF', 30))
+# Outputs of jobs waiting in the outbox are kept in files, as they are too big to be kept in the outbox itself
+JOB_OUTPUT_FOLDER = '{}/job_outputs'.format(DATA_FOLDER)
+
+# Resources requested by the jobs that don't say it: cpus and megabytes of memory. They are also the container limits
+JOB_DEFAULT_CPUS = float(os.environ.get('SHAREDCLOUD_CLI_JOB_DEFAULT_CPUS', 1))
+JOB_DEFAULT_MEMORY = int(os.environ.get('SHAREDCLOUD_CLI_JOB_DEFAULT_MEMORY', 1024))
+# Megabytes of memory of the host that are never given to jobs
+HOST_RESERVED_MEMORY = int(os.environ.get('SHAREDCLOUD_CLI_HOST_RESERVED_MEMORY', 512))
+
+# Number of resources fetched per page by the list commands
+LIST_PAGE_SIZE = int(os.environ.get('SHAREDCLOUD_CLI_LIST_PAGE_SIZE', 100))
+
+# Number of jobs fetched at the same time by "job download"
+DOWNLOAD_CONCURRENCY = int(os.environ.get('SHAREDCLOUD_CLI_DOWNLOAD_CONCURRENCY', 8))
+
+# Responses of the catalogs, that rarely change, are cached for a while (seconds) and revalidated afterwards
+RESPONSE_CACHE_FOLDER = '{}/responses'.format(DATA_FOLDER)
+GPU_CATALOG_CACHE_TTL = float(os.environ.get('SHAREDCLOUD_CLI_GPU_CATALOG_CACHE_TTL', 3600))
+IMAGE_CATALOG_CACHE_TTL = float(os.environ.get('SHAREDCLOUD_CLI_IMAGE_CATALOG_CACHE_TTL', 300))
+
+# Formats in which the list commands can display their results
+OUTPUT_FORMATS = ['table', 'json', 'ndjson', 'csv']
+
+# How "instance start" asks the Backend for new jobs (seconds)
+JOB_SOURCE_POLL_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_JOB_SOURCE_POLL_INTERVAL', 5))
+JOB_SOURCE_MIN_POLL_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_JOB_SOURCE_MIN_POLL_INTERVAL', 1))
+JOB_SOURCE_MAX_POLL_INTERVAL = float(os.environ.get('SHAREDCLOUD_CLI_JOB_SOURCE_MAX_POLL_INTERVAL', 60))
+JOB_SOURCE_LONG_POLL_WAIT = float(os.environ.get('SHAREDCLOUD_CLI_JOB_SOURCE_LONG_POLL_WAIT', 30))
+
+# Docker. The runtime can be "engine" (HTTP API over the unix socket), "cli" (the "docker" binary) or "auto"
+SHAREDCLOUD_CLI_CONTAINER_RUNTIME = os.environ.get('SHAREDCLOUD_CLI_CONTAINER_RUNTIME', 'auto')
+DOCKER_HOST = os.environ.get('DOCKER_HOST', 'unix:///var/run/docker.sock')
+DOCKER_SOCKET_PATH = DOCKER_HOST[len('unix://'):] if DOCKER_HOST.startswith('unix://') else None
+DOCKER_API_VERSION = 'v1.25'
+# Credentials of the registries, as stored by "docker login"
+DOCKER_CONFIG_FILENAME = os.path.join(
+    os.environ.get('DOCKER_CONFIG', os.path.join(os.path.expanduser('~'), '.docker')), 'config.json')
+# GPUs that jobs can use, as comma separated indexes (e.g., "0,1"). If empty, they are found with "nvidia-smi"
+SHAREDCLOUD_CLI_GPU_DEVICES = os.environ.get('SHAREDCLOUD_CLI_GPU_DEVICES', '')
+
+# Images pulled in the last IMAGE_FRESHNESS_TTL seconds aren't pulled again by the jobs
+IMAGE_CACHE_FOLDER = '{}/images'.format(DATA_FOLDER)
+IMAGE_FRESHNESS_TTL = float(os.environ.get('SHAREDCLOUD_CLI_IMAGE_FRESHNESS_TTL', 60))
+
+# Max gigabytes used by the downloaded images before the least recently used ones are evicted
+IMAGE_DISK_BUDGET = float(os.environ['SHAREDCLOUD_CLI_IMAGE_DISK_BUDGET']) * 1024 ** 3 \
+    if os.environ.get('SHAREDCLOUD_CLI_IMAGE_DISK_BUDGET') else None
 
 JOB_STATUSES = {
     'CREATED': 1,
@@ -20,6 +100,9 @@ JOB_STATUSES = {
     'TIMEOUT': 5
 }
 
+# Jobs whose fields won't change anymore
+FINISHED_JOB_STATUSES = [JOB_STATUSES['SUCCEEDED'], JOB_STATUSES['FAILED'], JOB_STATUSES['TIMEOUT']]
+
 INSTANCE_STATUSES = {
     'NOT_AVAILABLE': 1,
     'AVAILABLE': 2
@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, FINISHED_JOB_STATUSES, DOWNLOAD_CONCURRENCY
+from sharedcloud_cli.files import _atomic_write_json
+
+
+class JobDownloader(object):
+    """
+    Download some fields of many jobs concurrently, writing one JSON file per job into a folder.
+
+    Files are written atomically, so a file is either complete or missing. This lets a download be resumed: jobs
+    whose file already contains all the fields are skipped. Jobs that haven't finished yet are skipped too, as their
+    fields may still change.
+    """
+
+    def __init__(self, client, dest, fields, concurrency=DOWNLOAD_CONCURRENCY):
+        """
+        :param client: http client, with a pool big enough for the concurrency
+        :param dest: folder where the files are written
+        :param fields: list of fields of the jobs (e.g., result, stdout)
+        :param concurrency: max number of jobs fetched at the same time (Default value = DOWNLOAD_CONCURRENCY)
+        """
+        self.client = client
+        self.dest = dest
+        self.fields = fields
+        self.concurrency = max(1, concurrency)
+        self.counts = {'downloaded': 0, 'skipped': 0, 'unfinished': 0, 'failed': 0}
+        self._lock = threading.Lock()
+        if not os.path.exists(dest):
+            os.makedirs(dest)
+
+    def path(self, job_uuid):
+        return os.path.join(self.dest, '{}.json'.format(job_uuid))
+
+    def is_downloaded(self, job_uuid):
+        """
+        Returns True if the file of a job already contains all the fields.
+
+        :param job_uuid: uuid of the job
+        """
+        try:
+            with open(self.path(job_uuid), 'r') as f:
+                return all(field in json.load(f) for field in self.fields)
+        except (IOError, ValueError):
+            return False
+
+    def _write(self, job):
+        path = self.path(job['uuid'])
+        content = {'uuid': job['uuid'], 'status': job.get('status')}
+        content.update((field, job.get(field)) for field in self.fields)
+        _atomic_write_json(path, content)
+
+    def _count(self, outcome):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _download(self, job):
+        """
+        Fetch a job (unless its page already had all the fields) and write its file.
+
+        :param job: job as listed by the Backend
+        """
+        if job.get('status') not in FINISHED_JOB_STATUSES:
+            return self._count('unfinished')
+        if self.is_downloaded(job['uuid']):
+            return self._count('skipped')
+
+        if not all(field in job for field in self.fields):
+            r = self.client.get('{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, job['uuid']))
+            if r.status_code != 200:
+                return self._count('failed')
+            job = r.json()
+
+        self._write(job)
+        self._count('downloaded')
+
+    def download(self, pages):
+        """
+        Download the jobs page by page, so only one page of jobs is kept in memory. Returns the counts of jobs
+        downloaded, skipped (already downloaded), unfinished and failed.
+
+        :param pages: iterable with the list of jobs of each page
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for jobs in pages:
+                for _ in executor.map(self._download, jobs):
+                    pass
+        return self.counts
@@ -0,0 +1,182 @@
+import csv
+import io
+import json
+
+import click
+
+
+class _StreamingTable(object):
+    """
+    Fixed-width table printed row by row, with the same layout as the "simple" format of "tabulate".
+
+    The column widths are taken from the first rows written, unless they are set explicitly. Values are never cut:
+    a longer value widens its column from that row on.
+    """
+
+    def __init__(self, headers, widths=None):
+        """
+        :param headers: titles of the columns
+        :param widths: width of each column (Default value = None)
+        """
+        self.headers = headers
+        self.widths = widths
+        self.numeric = None
+
+    @staticmethod
+    def _is_number(value):
+        if isinstance(value, bool):
+            return False
+        if isinstance(value, (int, float)):
+            return True
+        try:
+            float(value)
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _format(value):
+        return '' if value is None else str(value)
+
+    def _fit(self, value, width, numeric):
+        return value.rjust(width) if numeric else value.ljust(width)
+
+    def _format_row(self, values, numeric):
+        # The rows that follow a longer value are aligned with it
+        self.widths = [max(width, len(value)) for value, width in zip(values, self.widths)] + self.widths[len(values):]
+        return '  '.join(self._fit(value, width, is_numeric)
+                         for value, width, is_numeric in zip(values, self.widths, numeric)).rstrip()
+
+    def _write_headers(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in self.headers]
+        self.numeric = [bool(column) and all(self._is_number(value) for value in column if value is not None)
+                        and any(value is not None for value in column) for column in columns]
+        widths = [max([len(header) + 2] + [len(self._format(value)) for value in column])
+                  for header, column in zip(self.headers, columns)]
+        # Columns without an explicit width take it from the first rows
+        self.widths = list(self.widths or [])[:len(widths)] + widths[len(self.widths or []):]
+
+        click.echo(self._format_row(self.headers, self.numeric))
+        click.echo('  '.join('-' * width for width in self.widths))
+
+    def write(self, rows):
+        """
+        Print a batch of rows. The headers are printed before the first batch.
+
+        :param rows: list of rows, each one a list of values
+        """
+        if self.numeric is None:
+            self._write_headers(rows)
+        for row in rows:
+            click.echo(self._format_row([self._format(value) for value in row], self.numeric))
+
+    def close(self):
+        """
+        Print the headers if no rows were written.
+        """
+        if self.numeric is None:
+            self._write_headers([])
+
+
+class _JSONWriter(object):
+    """
+    JSON array printed resource by resource, so it's never built in memory.
+    """
+
+    def __init__(self, keys):
+        """
+        :param keys: attributes of the resources that are printed
+        """
+        self.keys = keys
+        self.num_resources = 0
+
+    def _project(self, resource):
+        return {key: resource.get(key) for key in self.keys}
+
+    def write(self, resources):
+        """
+        Print a batch of resources.
+
+        :param resources: list of resources sent by the Backend
+        """
+        if not resources:
+            return
+        prefix = '[' if not self.num_resources else ',\n'
+        click.echo(prefix + ',\n'.join(json.dumps(self._project(resource)) for resource in resources), nl=False)
+        self.num_resources += len(resources)
+
+    def close(self):
+        """
+        Close the array.
+        """
+        click.echo(']' if self.num_resources else '[]')
+
+
+class _NDJSONWriter(_JSONWriter):
+    """
+    One JSON object per line (newline delimited JSON), handy to be piped into tools like "jq".
+    """
+
+    def write(self, resources):
+        if resources:
+            click.echo('\n'.join(json.dumps(self._project(resource)) for resource in resources))
+        self.num_resources += len(resources)
+
+    def close(self):
+        pass
+
+
+class _CSVWriter(_JSONWriter):
+    """
+    CSV with a header row. Nested values (lists, dicts) are written as JSON.
+    """
+
+    def __init__(self, keys):
+        super(_CSVWriter, self).__init__(keys)
+        self.has_header = False
+
+    def _value(self, value):
+        return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+    def write(self, resources):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if not self.has_header:
+            writer.writerow(self.keys)
+            self.has_header = True
+        writer.writerows([self._value(resource.get(key)) for key in self.keys] for resource in resources)
+        self.num_resources += len(resources)
+        click.echo(buffer.getvalue(), nl=False)
+
+    def close(self):
+        if not self.has_header:
+            self.write([])
+
+
+RAW_WRITERS = {
+    'json': _JSONWriter,
+    'ndjson': _NDJSONWriter,
+    'csv': _CSVWriter
+}
+
+
+def _project_columns(headers, keys, columns=None):
+    """
+    Keep only the columns asked by the user, in the same order. They can be given by their header or their key.
+
+    Columns that aren't displayed by default are accepted as well, using their key as header.
+
+    :param headers: titles of the columns
+    :param keys: attributes names from the response sent by the Backend
+    :param columns: list of columns to keep. None means all of them (Default value = None)
+    """
+    if not columns:
+        return headers, keys
+
+    by_name = {}
+    for header, key in zip(headers, keys):
+        by_name[header.lower()] = (header, key)
+        by_name[key.lower()] = (header, key)
+
+    projected = [by_name.get(column.lower(), (column.upper(), column)) for column in columns]
+    return [header for header, _ in projected], [key for _, key in projected]
@@ -0,0 +1,136 @@
+import collections
+import subprocess
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_GPU_DEVICES
+
+
+class GpuProbe(object):
+    """
+    Base class for the ways of finding the GPUs of the host.
+    """
+
+    def devices(self):
+        """
+        Returns a list of dicts with the "index", "uuid", "name" and megabytes of "memory" of each GPU.
+        """
+        raise NotImplementedError
+
+
+class NvidiaSmiProbe(GpuProbe):
+    """
+    Find the GPUs with the "nvidia-smi" command line tool. Hosts without it have no GPUs.
+    """
+
+    QUERY = ['nvidia-smi', '--query-gpu=index,uuid,name,memory.total', '--format=csv,noheader,nounits']
+
+    def devices(self):
+        try:
+            p = subprocess.Popen(self.QUERY, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, _ = p.communicate()
+        except OSError:
+            return []
+        if p.returncode != 0:
+            return []
+
+        devices = []
+        for line in output.decode('utf-8', 'replace').splitlines():
+            fields = [field.strip() for field in line.split(',')]
+            if len(fields) != 4:
+                continue
+            index, uuid, name, memory = fields
+            devices.append({
+                'index': index,
+                'uuid': uuid,
+                'name': name,
+                'memory': int(memory) if memory.isdigit() else None
+            })
+        return devices
+
+
+class StaticGpuProbe(GpuProbe):
+    """
+    GPUs given beforehand, e.g. with SHAREDCLOUD_CLI_GPU_DEVICES, for hosts where "nvidia-smi" can't be used.
+    """
+
+    def __init__(self, indexes):
+        """
+        :param indexes: list with the indexes of the GPUs
+        """
+        self.indexes = indexes
+
+    def devices(self):
+        return [{'index': str(index), 'uuid': None, 'name': None, 'memory': None} for index in self.indexes]
+
+
+def _get_gpu_probe(devices=SHAREDCLOUD_CLI_GPU_DEVICES):
+    """
+    Build the probe of the GPUs of this host: the GPUs in "devices" if it's given, or "nvidia-smi" otherwise.
+
+    :param devices: comma separated indexes of the GPUs (Default value = SHAREDCLOUD_CLI_GPU_DEVICES)
+    """
+    if devices:
+        return StaticGpuProbe([index.strip() for index in devices.split(',') if index.strip()])
+    return NvidiaSmiProbe()
+
+
+class GpuAllocator(object):
+    """
+    Give each GPU job its own devices, so parallel jobs never share a GPU.
+
+    Jobs see only their devices through NVIDIA_VISIBLE_DEVICES. A job waits while not enough devices are free, and
+    its devices are given back when it finishes.
+    """
+
+    def __init__(self, devices):
+        """
+        :param devices: list of dicts with the GPUs (see GpuProbe)
+        """
+        self.devices = collections.OrderedDict((device['index'], device) for device in devices)
+        self.assignments = {}
+
+    @classmethod
+    def from_probe(cls, probe=None):
+        """
+        Build an allocator for the GPUs found by a probe.
+
+        :param probe: GPU probe (Default value = the probe of this host)
+        """
+        return cls((probe or _get_gpu_probe()).devices())
+
+    @property
+    def occupancy(self):
+        """
+        Ordered dict with the uuid of the job using each GPU, or None if it's free.
+        """
+        occupancy = collections.OrderedDict((index, None) for index in self.devices)
+        for job_uuid, indexes in self.assignments.items():
+            for index in indexes:
+                occupancy[index] = job_uuid
+        return occupancy
+
+    @property
+    def num_free(self):
+        return sum(1 for job_uuid in self.occupancy.values() if job_uuid is None)
+
+    def assign(self, job_uuid, num_gpus=1):
+        """
+        Reserve GPUs for a job. Returns the NVIDIA_VISIBLE_DEVICES of the job, or None if there aren't enough free
+        GPUs. Jobs asking for more GPUs than the host has get all of them.
+
+        :param job_uuid: uuid of the job
+        :param num_gpus: number of GPUs requested by the job (Default value = 1)
+        """
+        num_gpus = min(max(1, num_gpus), len(self.devices))
+        free = [index for index, user in self.occupancy.items() if user is None]
+        if len(free) < num_gpus:
+            return None
+        self.assignments[job_uuid] = free[:num_gpus]
+        return ','.join(free[:num_gpus])
+
+    def release(self, job_uuid):
+        """
+        Give back the GPUs of a finished job.
+
+        :param job_uuid: uuid of the job
+        """
+        self.assignments.pop(job_uuid, None)
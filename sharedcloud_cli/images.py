@@ -0,0 +1,227 @@
+import hashlib
+import json
+import os
+import time
+
+from sharedcloud_cli.constants import IMAGE_CACHE_FOLDER, IMAGE_FRESHNESS_TTL, IMAGE_DISK_BUDGET
+from sharedcloud_cli.files import _FileLock, _atomic_write_json
+
+
+def _image_digest(details):
+    """
+    Extract the manifest digest of an image (or its id if it has never been pulled from a registry).
+
+    :param details: dict with the details of the image
+    """
+    if not details:
+        return None
+    repo_digests = details.get('RepoDigests') or []
+    return repo_digests[0].split('@')[-1] if repo_digests else details.get('Id')
+
+
+class ImageFreshnessCache(object):
+    """
+    Remember when each image was last pulled, so jobs don't pull the same image again and again.
+
+    The cache lives in the DATA_FOLDER, so it's shared by all the job processes. Pulls are single-flight: while a
+    process is pulling an image, the rest of processes that need it wait and reuse the result instead of pulling it
+    themselves.
+    """
+
+    def __init__(self, runtime, ttl=IMAGE_FRESHNESS_TTL, folder=IMAGE_CACHE_FOLDER):
+        """
+        :param runtime: container runtime
+        :param ttl: seconds during which a pulled image is considered fresh (Default value = IMAGE_FRESHNESS_TTL)
+        :param folder: folder where the cache is stored (Default value = IMAGE_CACHE_FOLDER)
+        """
+        self.runtime = runtime
+        self.ttl = ttl
+        self.folder = folder
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _path(self, registry_path, extension):
+        key = hashlib.sha1(registry_path.encode('utf-8')).hexdigest()
+        return os.path.join(self.folder, '{}.{}'.format(key, extension))
+
+    def get(self, registry_path):
+        """
+        Returns the cache entry of an image, or None if it has never been pulled.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        try:
+            with open(self._path(registry_path, 'json'), 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _set(self, registry_path, entry):
+        _atomic_write_json(self._path(registry_path, 'json'), entry)
+
+    def forget(self, registry_path):
+        """
+        Drop the cache entry of an image, e.g., after it has been removed.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        try:
+            os.remove(self._path(registry_path, 'json'))
+        except OSError:
+            pass
+
+    def is_fresh(self, entry, since=None):
+        """
+        Returns True if the image was checked in the last "ttl" seconds, or after "since".
+
+        :param entry: cache entry of the image
+        :param since: timestamp after which any check is valid (Default value = None)
+        """
+        if not entry:
+            return False
+        checked_at = entry.get('checked_at', 0)
+        return time.time() - checked_at < self.ttl or (since is not None and checked_at >= since)
+
+    def pull(self, registry_path, on_line=None):
+        """
+        Pull an image unless it's fresh. Returns a tuple with the output, the error and whether it was a cache hit.
+
+        :param registry_path: path to the DockerHub registry
+        :param on_line: function called with each line of progress of the pull (Default value = None)
+        """
+        requested_at = time.time()
+
+        entry = self.get(registry_path)
+        if not self.is_fresh(entry):
+            with _FileLock(self._path(registry_path, 'lock')):
+                # Somebody else could have pulled it while we were waiting for the lock
+                entry = self.get(registry_path)
+                if not self.is_fresh(entry, since=requested_at):
+                    output, error = self.runtime.pull(registry_path, on_line=on_line)
+                    if not error:
+                        self._set(registry_path, {
+                            'registry_path': registry_path,
+                            'digest': _image_digest(self.runtime.inspect_image(registry_path)),
+                            'checked_at': time.time(),
+                            'logs': output.decode('utf-8', 'replace')
+                        })
+                    return output, error, False
+
+        return entry.get('logs', '').encode('utf-8'), b'', True
+
+
+class ImageCacheManager(object):
+    """
+    Keep the downloaded images under a disk budget, evicting the least recently used ones.
+
+    The size and last time that each image was used by a job are stored in an index in the DATA_FOLDER, shared by
+    all the job processes. Pinned images are never evicted.
+    """
+
+    def __init__(self, runtime, budget=IMAGE_DISK_BUDGET, folder=IMAGE_CACHE_FOLDER):
+        """
+        :param runtime: container runtime
+        :param budget: max bytes used by the images. None means no limit (Default value = IMAGE_DISK_BUDGET)
+        :param folder: folder where the index is stored (Default value = IMAGE_CACHE_FOLDER)
+        """
+        self.runtime = runtime
+        self.budget = budget
+        self.index_path = os.path.join(folder, 'index.json')
+        self.lock_path = os.path.join(folder, 'index.lock')
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    def _read(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def _write(self, index):
+        _atomic_write_json(self.index_path, index)
+
+    def _update(self, registry_path, **values):
+        with _FileLock(self.lock_path):
+            index = self._read()
+            entry = index.setdefault(registry_path, {'size': None, 'last_used': None, 'pinned': False})
+            entry.update(values)
+            if entry['size'] is None:
+                entry['size'] = (self.runtime.inspect_image(registry_path) or {}).get('Size')
+            self._write(index)
+
+    def touch(self, registry_path):
+        """
+        Record that an image has just been used.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        self._update(registry_path, last_used=time.time())
+
+    def pin(self, registry_path, pinned=True):
+        """
+        Pin (or unpin) an image, so it's never evicted.
+
+        :param registry_path: path to the DockerHub registry
+        :param pinned: whether the image is pinned (Default value = True)
+        """
+        self._update(registry_path, pinned=pinned)
+
+    def forget(self, registry_path):
+        """
+        Remove an image from the index, e.g., after cleaning it manually.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        with _FileLock(self.lock_path):
+            index = self._read()
+            index.pop(registry_path, None)
+            self._write(index)
+
+    def stats(self):
+        """
+        Returns a list with the index entries, sorted from the most to the least recently used, and the total size.
+        """
+        entries = []
+        for registry_path, entry in self._read().items():
+            entry = dict(entry)
+            entry['registry_path'] = registry_path
+            entries.append(entry)
+        entries.sort(key=lambda entry: entry.get('last_used') or 0, reverse=True)
+        return entries, sum(entry.get('size') or 0 for entry in entries)
+
+    def evict(self, on_evict=None, in_use=()):
+        """
+        Remove the least recently used images until the total size fits in the budget.
+
+        Returns the list of evicted registry paths.
+
+        :param on_evict: function called with the registry path of each evicted image (Default value = None)
+        :param in_use: registry paths of the images used by running jobs (Default value = ())
+        """
+        if self.budget is None:
+            return []
+
+        evicted = []
+        with _FileLock(self.lock_path):
+            index = self._read()
+            total = sum(entry.get('size') or 0 for entry in index.values())
+            candidates = sorted(
+                (path for path, entry in index.items() if not entry.get('pinned') and path not in in_use),
+                key=lambda path: index[path].get('last_used') or 0)
+
+            for registry_path in candidates:
+                if total <= self.budget:
+                    break
+                output, error = self.runtime.remove_image(registry_path)
+                if error:
+                    continue
+
+                total -= index.pop(registry_path).get('size') or 0
+                evicted.append(registry_path)
+            self._write(index)
+
+        if on_evict:
+            for registry_path in evicted:
+                on_evict(registry_path)
+        return evicted
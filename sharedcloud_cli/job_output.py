@@ -0,0 +1,334 @@
+import os
+import tempfile
+import threading
+import uuid
+
+import click
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, OUTPUT_FLUSH_INTERVAL, OUTPUT_FLUSH_SIZE, OUTPUT_CAP, \
+    OUTPUT_SPOOL_MEMORY, UPLOAD_CHUNK_SIZE
+
+
+class CapturedOutput(object):
+    """
+    Output of a job, kept in spooled temporary files so a job printing gigabytes can't exhaust the memory.
+
+    Up to "cap" bytes are kept. Past it, only the first and the last halves are kept, and a marker with the number of
+    bytes dropped is placed between them.
+    """
+
+    def __init__(self, cap=OUTPUT_CAP, memory_size=OUTPUT_SPOOL_MEMORY):
+        """
+        :param cap: max bytes kept (Default value = OUTPUT_CAP)
+        :param memory_size: bytes kept in memory before spooling them to disk (Default value = OUTPUT_SPOOL_MEMORY)
+        """
+        self.head_size = cap // 2
+        self.tail_size = cap - self.head_size
+        self.size = 0
+        self._head = tempfile.SpooledTemporaryFile(max_size=memory_size)
+        self._tail = tempfile.SpooledTemporaryFile(max_size=memory_size)
+        self._tail_stored = 0
+        self._memory_size = memory_size
+
+    @property
+    def truncated(self):
+        return self.size > self.head_size + self.tail_size
+
+    def write(self, chunk):
+        """
+        Add a chunk of output. Returns the part of the chunk that was kept in the head.
+
+        :param chunk: bytes
+        """
+        room = max(0, self.head_size - self.size)
+        head, rest = chunk[:room], chunk[room:]
+        self.size += len(chunk)
+
+        if head:
+            self._head.write(head)
+        if rest:
+            self._tail.write(rest)
+            self._tail_stored += len(rest)
+            # The tail is compacted once it doubles, so each byte is copied once at most on average
+            if self._tail_stored > 2 * self.tail_size:
+                self._compact()
+        return head
+
+    def _compact(self):
+        """
+        Drop everything but the last "tail_size" bytes of the tail.
+        """
+        tail = tempfile.SpooledTemporaryFile(max_size=self._memory_size)
+        for piece in self._read(self._tail, self._tail_stored - self.tail_size, self._tail_stored):
+            tail.write(piece)
+        self._tail.close()
+        self._tail, self._tail_stored = tail, self.tail_size
+
+    @staticmethod
+    def _read(f, start, end, chunk_size=UPLOAD_CHUNK_SIZE):
+        f.seek(start)
+        while start < end:
+            piece = f.read(min(chunk_size, end - start))
+            if not piece:
+                break
+            start += len(piece)
+            yield piece
+        f.seek(0, 2)
+
+    def _marker(self):
+        if not self.truncated:
+            return b''
+        return '\n[... {} bytes truncated ...]\n'.format(self.size - self.head_size - self.tail_size).encode('utf-8')
+
+    def iter_rest(self, chunk_size=UPLOAD_CHUNK_SIZE):
+        """
+        Yields what comes after the head: the truncation marker, if any, and the tail.
+
+        :param chunk_size: bytes read at a time (Default value = UPLOAD_CHUNK_SIZE)
+        """
+        marker = self._marker()
+        if marker:
+            yield marker
+        start = max(0, self._tail_stored - self.tail_size)
+        for piece in self._read(self._tail, start, self._tail_stored, chunk_size):
+            yield piece
+
+    @property
+    def kept_size(self):
+        """
+        Number of bytes yielded by "iter_all".
+        """
+        return min(self.size, self.head_size) + len(self._marker()) + min(self._tail_stored, self.tail_size)
+
+    def iter_all(self, chunk_size=UPLOAD_CHUNK_SIZE):
+        """
+        Yields the whole output kept: the head, the truncation marker, if any, and the tail.
+
+        :param chunk_size: bytes read at a time (Default value = UPLOAD_CHUNK_SIZE)
+        """
+        for piece in self._read(self._head, 0, min(self.size, self.head_size), chunk_size):
+            yield piece
+        for piece in self.iter_rest(chunk_size):
+            yield piece
+
+    def save(self, path, chunk_size=UPLOAD_CHUNK_SIZE):
+        """
+        Copy the whole output kept to a file, a chunk at a time.
+
+        :param path: path of the file
+        :param chunk_size: bytes read at a time (Default value = UPLOAD_CHUNK_SIZE)
+        """
+        with open(path, 'wb') as f:
+            for piece in self.iter_all(chunk_size):
+                f.write(piece)
+
+    def getvalue(self):
+        return b''.join(self.iter_all())
+
+    def close(self):
+        self._head.close()
+        self._tail.close()
+
+
+class _MultipartBody(object):
+    """
+    multipart/form-data body that is generated while it's sent, so the captured outputs are streamed from their
+    spools, and the files from disk.
+
+    Its length is known beforehand, so it's sent with a Content-Length instead of chunked.
+    """
+
+    def __init__(self, fields, boundary, chunk_size=UPLOAD_CHUNK_SIZE):
+        """
+        :param fields: dict with the fields. Values are bytes, strings, numbers, CapturedOutput or files opened in
+        binary mode
+        :param boundary: boundary between the fields
+        :param chunk_size: bytes read at a time from the spools (Default value = UPLOAD_CHUNK_SIZE)
+        """
+        self.chunk_size = chunk_size
+        self._parts = []
+        for name, value in fields.items():
+            head = '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n'.format(boundary, name).encode('utf-8')
+            if not isinstance(value, CapturedOutput) and not hasattr(value, 'read'):
+                value = value if isinstance(value, bytes) else str(value).encode('utf-8')
+            self._parts.append((head, value))
+        self._end = '--{}--\r\n'.format(boundary).encode('utf-8')
+
+    @staticmethod
+    def _size(value):
+        if isinstance(value, CapturedOutput):
+            return value.kept_size
+        if hasattr(value, 'read'):
+            return os.fstat(value.fileno()).st_size
+        return len(value)
+
+    def __len__(self):
+        return sum(len(head) + self._size(value) + 2 for head, value in self._parts) + len(self._end)
+
+    def __iter__(self):
+        for head, value in self._parts:
+            yield head
+            if isinstance(value, CapturedOutput):
+                for piece in value.iter_all(self.chunk_size):
+                    yield piece
+            elif hasattr(value, 'read'):
+                value.seek(0)
+                for piece in iter(lambda: value.read(self.chunk_size), b''):
+                    yield piece
+            else:
+                yield value
+            yield b'\r\n'
+        yield self._end
+
+
+def _multipart_body(fields, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Build a multipart/form-data body that is generated while it's sent (see _MultipartBody). Returns the body and its
+    content type.
+
+    :param fields: dict with the fields. Values are bytes, strings, numbers, CapturedOutput or files opened in binary
+    mode
+    :param chunk_size: bytes read at a time from the spools (Default value = UPLOAD_CHUNK_SIZE)
+    """
+    boundary = uuid.uuid4().hex
+    return _MultipartBody(fields, boundary, chunk_size), 'multipart/form-data; boundary={}'.format(boundary)
+
+
+class JobOutputShipper(object):
+    """
+    Send the output of a running job to the Backend in batches, so it can be followed while the job runs.
+
+    Chunks of stdout and stderr are appended to the job every "interval" seconds, or as soon as "max_size" bytes are
+    waiting, so only one batch is kept in memory. Each batch carries the offsets where it starts, so the Backend can
+    ignore the batches that it already has if they are sent again.
+
+    The output is captured with a cap (see CapturedOutput): the first half is appended while the job runs, and the
+    rest (the truncation marker and the last half) when it finishes. If the Backend can't append output to jobs, or
+    the last batches can't be appended, the captured output is sent in the final update of the job, as before.
+    """
+
+    STREAMS = {'stdout': 'output', 'stderr': 'error'}
+
+    def __init__(self, client, job_uuid, interval=OUTPUT_FLUSH_INTERVAL, max_size=OUTPUT_FLUSH_SIZE, cap=OUTPUT_CAP):
+        """
+        :param client: http client
+        :param job_uuid: uuid of the job
+        :param interval: seconds between batches (Default value = OUTPUT_FLUSH_INTERVAL)
+        :param max_size: bytes waiting that trigger a batch right away (Default value = OUTPUT_FLUSH_SIZE)
+        :param cap: max bytes of stdout (and of stderr) kept (Default value = OUTPUT_CAP)
+        """
+        self.client = client
+        self.job_uuid = job_uuid
+        self.interval = interval
+        self.max_size = max_size
+        self.url = '{}/api/v1/jobs/{}/append-output/'.format(SHAREDCLOUD_CLI_URL, job_uuid)
+        self.supported = True
+        self.offsets = {stream: 0 for stream in self.STREAMS}
+        self.captured = {stream: CapturedOutput(cap) for stream in self.STREAMS}
+        self._pending = {stream: [] for stream in self.STREAMS}
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        # Batches are sent one at a time, without holding "_lock", so a slow request doesn't block the job output
+        self._send_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Send the waiting output every "interval" seconds in the background.
+        """
+        self._thread = threading.Thread(target=self._flush_periodically)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def _add(self, stream, chunk):
+        with self._lock:
+            if chunk and self.supported:
+                self._pending[stream].append(chunk)
+                self._pending_size += len(chunk)
+            return self._pending_size >= self.max_size
+
+    def write(self, stream, chunk):
+        """
+        Add a chunk of output. It's sent right away if too many bytes are waiting.
+
+        :param stream: "stdout" or "stderr"
+        :param chunk: bytes
+        """
+        with self._lock:
+            head = self.captured[stream].write(chunk)
+        if self._add(stream, head):
+            self.flush()
+
+    def flush(self):
+        """
+        Append the waiting output to the job. If the request fails, the output is kept and sent in the next batch.
+        """
+        with self._send_lock:
+            with self._lock:
+                if not self.supported or not self._pending_size:
+                    return
+                num_chunks = {stream: len(chunks) for stream, chunks in self._pending.items()}
+                batch = {stream: b''.join(chunks) for stream, chunks in self._pending.items()}
+
+            data = {}
+            for stream, field in self.STREAMS.items():
+                data[field] = batch[stream]
+                data['{}_offset'.format(field)] = self.offsets[stream]
+
+            try:
+                r = self.client.post(self.url, data=data)
+            except IOError:
+                return
+            if r.status_code in (404, 405):
+                self.supported = False
+                return
+            if r.status_code not in (200, 201, 204):
+                return
+
+            # Chunks written while the batch was being sent stay for the next one
+            with self._lock:
+                for stream in self.STREAMS:
+                    self.offsets[stream] += len(batch[stream])
+                    del self._pending[stream][:num_chunks[stream]]
+                self._pending_size -= sum(len(chunk) for chunk in batch.values())
+
+    def close(self):
+        """
+        Stop the background batches and send the rest of the output.
+
+        Returns the fields that still need to be sent in the final update of the job: none if the output was
+        appended, or the "output" and "error" captured if the Backend can't append output. If the last batches of a
+        stream couldn't be appended, its whole captured output is returned, as the final update replaces the field.
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+        # What didn't fit in the heads is appended now, in batches
+        for stream in self.STREAMS:
+            for piece in self.captured[stream].iter_rest(self.max_size):
+                if self._add(stream, piece):
+                    self.flush()
+        self.flush()
+
+        if not self.supported:
+            return {field: self.captured[stream] for stream, field in self.STREAMS.items()}
+        unsent = [stream for stream in self.STREAMS if self._pending[stream]]
+        if unsent:
+            click.echo('[WARNING] The last {} bytes of output of job {} couldn\'t be appended, so they are sent with '
+                       'the job'.format(self._pending_size, self.job_uuid))
+        return {self.STREAMS[stream]: self.captured[stream] for stream in unsent}
+
+    def discard(self):
+        """
+        Remove the captured output.
+        """
+        for captured in self.captured.values():
+            captured.close()
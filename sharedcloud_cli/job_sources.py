@@ -0,0 +1,129 @@
+import time
+
+import requests
+
+from sharedcloud_cli.constants import JOB_SOURCE_POLL_INTERVAL, JOB_SOURCE_MIN_POLL_INTERVAL, \
+    JOB_SOURCE_MAX_POLL_INTERVAL, JOB_SOURCE_LONG_POLL_WAIT
+from sharedcloud_cli.utils import _get_jobs
+
+
+class JobSource(object):
+    """
+    Base class for the strategies used by "instance start" to receive jobs from the Backend.
+
+    A job source fetches the next batch of jobs with "get_jobs" and tells the worker loop, through "next_interval",
+    how many seconds it should wait before asking again.
+    """
+
+    def __init__(self, instance_uuid, client):
+        self.instance_uuid = instance_uuid
+        self.client = client
+
+    def get_jobs(self, limit=None):
+        """
+        Fetch the jobs assigned to the instance.
+
+        :param limit: max number of jobs that the instance can take. None means no limit (Default value = None)
+        """
+        return _get_jobs(self.instance_uuid, self.client, params=self._params(limit)).json()
+
+    @staticmethod
+    def _params(limit, **params):
+        if limit is not None:
+            params['limit'] = limit
+        return params or None
+
+    def next_interval(self, num_jobs):
+        """
+        Seconds to wait until the next fetch. By default, the Backend is polled every JOB_SOURCE_POLL_INTERVAL seconds.
+
+        :param num_jobs: number of jobs received in the last fetch
+        """
+        return JOB_SOURCE_POLL_INTERVAL
+
+
+class FixedIntervalJobSource(JobSource):
+    """
+    Poll the Backend every "interval" seconds, no matter if jobs arrived or not.
+    """
+
+    def __init__(self, instance_uuid, client, interval=JOB_SOURCE_POLL_INTERVAL):
+        super(FixedIntervalJobSource, self).__init__(instance_uuid, client)
+        self.interval = interval
+
+    def next_interval(self, num_jobs):
+        return self.interval
+
+
+class AdaptiveJobSource(JobSource):
+    """
+    Poll the Backend backing off exponentially while the instance is idle.
+
+    As soon as jobs arrive, it snaps back to the fastest polling interval.
+    """
+
+    def __init__(self, instance_uuid, client, min_interval=JOB_SOURCE_MIN_POLL_INTERVAL,
+                 max_interval=JOB_SOURCE_MAX_POLL_INTERVAL, factor=2.0):
+        super(AdaptiveJobSource, self).__init__(instance_uuid, client)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+
+    def next_interval(self, num_jobs):
+        if num_jobs > 0:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.factor, self.max_interval)
+        return self.interval
+
+
+class LongPollJobSource(AdaptiveJobSource):
+    """
+    Keep the request open in the Backend until jobs arrive or "wait" seconds have passed.
+
+    Backends that don't support long polling answer right away, so in that case we fall back to the adaptive polling.
+    """
+
+    def __init__(self, instance_uuid, client, wait=JOB_SOURCE_LONG_POLL_WAIT, **kwargs):
+        super(LongPollJobSource, self).__init__(instance_uuid, client, **kwargs)
+        self.wait = wait
+        self.has_waited = False
+
+    def get_jobs(self, limit=None):
+        started_at = time.time()
+        try:
+            r = _get_jobs(self.instance_uuid, self.client, params=self._params(limit, wait=self.wait),
+                          timeout=self.wait + 10)
+        except requests.exceptions.Timeout:
+            self.has_waited = True
+            return []
+
+        jobs = r.json()
+        # An empty answer that came back way before "wait" means that the Backend ignored it
+        self.has_waited = bool(jobs) or time.time() - started_at >= self.wait / 2.0
+        return jobs
+
+    def next_interval(self, num_jobs):
+        if self.has_waited:
+            self.interval = self.min_interval
+            return 0
+        return super(LongPollJobSource, self).next_interval(num_jobs)
+
+
+JOB_SOURCES = {
+    'fixed': FixedIntervalJobSource,
+    'adaptive': AdaptiveJobSource,
+    'long-poll': LongPollJobSource
+}
+
+
+def _get_job_source(name, instance_uuid, client):
+    """
+    Build the job source registered under "name".
+
+    :param name: name of the job source (e.g., fixed, adaptive, long-poll)
+    :param instance_uuid: instance uuid
+    :param client: http client
+    """
+    return JOB_SOURCES[name](instance_uuid, client)
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import click
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_URL, UPDATE_BATCH_INTERVAL, UPDATE_BATCH_SIZE, \
+    UPDATE_MAX_BACKOFF, JOB_OUTPUT_FOLDER
+from sharedcloud_cli.job_output import _multipart_body
+from sharedcloud_cli.outbox import JobOutbox
+
+
+def _is_retryable(status_code):
+    return status_code == 429 or status_code >= 500
+
+
+class JobUpdateCoalescer(object):
+    """
+    Send the updates of many jobs (status transitions and results) together, instead of one request per update.
+
+    Updates can be put from any process (e.g., the job processes of "instance start"). They are written to the
+    outbox (see JobOutbox) before anything is sent, so they survive crashes of the worker: the ones left behind are
+    replayed when the coalescer starts again. Every "interval" seconds, a thread in the process that started the
+    coalescer merges the updates waiting for each job and sends them in bulk requests. If the Backend doesn't have
+    the bulk endpoint, each job is updated with its own PATCH, as before. Updates carrying the output of a job are
+    always sent with their own PATCH, as they are too big to be batched. Those outputs are kept in files, and only
+    their paths in the outbox, so they are streamed from disk when they are sent and never loaded in memory.
+
+    Updates that can't be sent are retried with an exponential backoff per job, so each one is delivered at least
+    once. Updates rejected by the Backend are dropped, as sending them again wouldn't help.
+    """
+
+    BIG_FIELDS = ('output', 'error')
+
+    # Outcomes of the updates sent right away
+    ACCEPTED = 'accepted'
+    REJECTED = 'rejected'
+    NOT_DELIVERED = 'not_delivered'
+
+    def __init__(self, client, interval=UPDATE_BATCH_INTERVAL, batch_size=UPDATE_BATCH_SIZE,
+                 max_backoff=UPDATE_MAX_BACKOFF, outbox=None, folder=JOB_OUTPUT_FOLDER):
+        """
+        :param client: http client
+        :param interval: seconds between batches (Default value = UPDATE_BATCH_INTERVAL)
+        :param batch_size: max number of jobs per bulk request (Default value = UPDATE_BATCH_SIZE)
+        :param max_backoff: max seconds between retries of a job (Default value = UPDATE_MAX_BACKOFF)
+        :param outbox: outbox where the updates are persisted (Default value = JobOutbox())
+        :param folder: folder where the outputs waiting to be sent are kept (Default value = JOB_OUTPUT_FOLDER)
+        """
+        self.client = client
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.outbox = outbox if outbox is not None else JobOutbox()
+        self.folder = folder
+        self.bulk_supported = True
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def put(self, job_uuid, data):
+        """
+        Persist an update of a job, to be sent in the next batch. It can be called from any process.
+
+        :param job_uuid: uuid of the job
+        :param data: dict with the fields to change
+        """
+        self.outbox.add(job_uuid, {
+            key: value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+            for key, value in data.items()
+        })
+
+    def put_outputs(self, job_uuid, outputs):
+        """
+        Persist the captured outputs of a job, to be sent in the next batch. It can be called from any process.
+
+        Each output is copied to a file in "folder", and the update only has its path. The file is removed once the
+        Backend has the output.
+
+        :param job_uuid: uuid of the job
+        :param outputs: dict with the CapturedOutput of each field (e.g., "output", "error")
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        data = {}
+        for field, captured in outputs.items():
+            path = os.path.join(self.folder, '{}-{}-{}'.format(job_uuid, field, uuid.uuid4().hex))
+            captured.save(path)
+            data[field] = {'path': path}
+        self.outbox.add(job_uuid, data)
+
+    @staticmethod
+    def _open_files(data):
+        """
+        Returns the fields of an update with the outputs kept in files opened, and the list of those files. Files
+        that don't exist anymore are sent empty.
+
+        :param data: dict with the fields of the update
+        """
+        fields, files = {}, []
+        for key, value in data.items():
+            if isinstance(value, dict) and 'path' in value:
+                try:
+                    value = open(value['path'], 'rb')
+                    files.append(value)
+                except IOError:
+                    value = b''
+            fields[key] = value
+        return fields, files
+
+    @staticmethod
+    def _remove_files(data):
+        """
+        Remove the files of the outputs of a delivered update.
+
+        :param data: dict with the fields of the update
+        """
+        for value in data.values():
+            if isinstance(value, dict) and 'path' in value:
+                try:
+                    os.remove(value['path'])
+                except OSError:
+                    pass
+
+    def send_now(self, batch):
+        """
+        Send updates of many jobs right away in a single request, without waiting for the next batch (e.g., the claims
+        of the jobs that just arrived, which need to be accepted by the Backend before the jobs start). Updates that
+        aren't delivered are not persisted in the outbox, so the caller decides whether to send them again.
+
+        Returns a dict with the outcome of each job: ACCEPTED, REJECTED or NOT_DELIVERED.
+
+        :param batch: list of (job_uuid, data)
+        """
+        if not batch:
+            return {}
+        sent = self._send_bulk(batch) if self.bulk_supported else None
+        if sent is not None:
+            return {job_uuid: self.ACCEPTED if job_uuid in sent else self.NOT_DELIVERED for job_uuid, _ in batch}
+        return self._patch_each(batch)
+
+    def start(self):
+        num_pending = len(self.outbox)
+        if num_pending:
+            click.echo('[INFO] Replaying {} job updates that were never delivered...'.format(num_pending))
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                click.echo('[WARNING] The job outbox couldn\'t be read: {}'.format(e))
+
+    def flush(self, force=False):
+        """
+        Send the updates waiting in the outbox, except the ones of jobs waiting to be retried. It stops at the first
+        batch that can't be fully sent.
+
+        :param force: send the updates of jobs waiting to be retried as well (Default value = False)
+        """
+        while True:
+            batch = self.outbox.take(self.batch_size, now=float('inf') if force else None)
+            if not batch:
+                return
+
+            big = [(job_uuid, data) for job_uuid, _, data, _ in batch if set(data) & set(self.BIG_FIELDS)]
+            small = [(job_uuid, data) for job_uuid, _, data, _ in batch if not set(data) & set(self.BIG_FIELDS)]
+            sent = self._send_bulk(small) if small and self.bulk_supported else None
+            if sent is None:
+                sent = self._send_one_by_one(small)
+            sent |= self._send_one_by_one(big)
+
+            failed = False
+            for job_uuid, ids, data, attempts in batch:
+                if job_uuid in sent:
+                    self.outbox.remove(ids)
+                    self._remove_files(data)
+                else:
+                    self.outbox.retry_later(ids, min(self.max_backoff, self.interval * 2 ** (attempts + 1)))
+                    failed = True
+            if failed:
+                return
+
+    def _send_bulk(self, batch):
+        """
+        Send a batch in a single request. Returns the uuids of the jobs updated, or None if the batch needs to be
+        sent job by job.
+
+        :param batch: list of (job_uuid, data)
+        """
+        try:
+            r = self.client.post('{}/api/v1/jobs/bulk-update/'.format(SHAREDCLOUD_CLI_URL),
+                                 json=[dict(data, uuid=job_uuid) for job_uuid, data in batch])
+        except IOError:
+            return set()
+
+        if r.status_code in (404, 405):
+            self.bulk_supported = False
+            return None
+        if _is_retryable(r.status_code):
+            return set()
+        if r.status_code >= 400:
+            # Something in the batch was rejected, so each job is sent on its own to find out which one
+            return None
+        return set(job_uuid for job_uuid, _ in batch)
+
+    def _send_one_by_one(self, batch):
+        """
+        Send a PATCH per job. Returns the uuids of the jobs updated, or rejected by the Backend.
+
+        :param batch: list of (job_uuid, data)
+        """
+        return set(job_uuid for job_uuid, outcome in self._patch_each(batch).items() if outcome != self.NOT_DELIVERED)
+
+    def _patch_each(self, batch):
+        """
+        Send a PATCH per job. Returns a dict with the outcome of each job: ACCEPTED, REJECTED or NOT_DELIVERED.
+
+        The outputs are streamed from their files in a multipart body, which doesn't need to be encoded as a form.
+
+        :param batch: list of (job_uuid, data)
+        """
+        outcomes = {}
+        for job_uuid, data in batch:
+            url = '{}/api/v1/jobs/{}/'.format(SHAREDCLOUD_CLI_URL, job_uuid)
+            try:
+                if set(data) & set(self.BIG_FIELDS):
+                    fields, files = self._open_files(data)
+                    try:
+                        body, content_type = _multipart_body(fields)
+                        r = self.client.patch(url, data=body, headers={
+                            'Content-Type': content_type,
+                            'Content-Length': str(len(body))
+                        })
+                    finally:
+                        for f in files:
+                            f.close()
+                else:
+                    r = self.client.patch(url, data=data)
+            except IOError:
+                outcomes[job_uuid] = self.NOT_DELIVERED
+                continue
+            if _is_retryable(r.status_code):
+                outcomes[job_uuid] = self.NOT_DELIVERED
+            elif r.status_code != 200:
+                click.echo('[ERROR] The update of job {} was rejected: {}'.format(job_uuid, r.content))
+                outcomes[job_uuid] = self.REJECTED
+            else:
+                outcomes[job_uuid] = self.ACCEPTED
+        return outcomes
+
+    def close(self, timeout=5):
+        """
+        Stop the background batches, and try to send the waiting updates one last time. The ones that can't be sent
+        stay in the outbox until the next start.
+
+        :param timeout: seconds trying to send the waiting updates (Default value = 5)
+        """
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+        deadline = time.time() + timeout
+        while len(self.outbox) and time.time() < deadline:
+            self.flush(force=True)
+            if len(self.outbox):
+                time.sleep(min(self.interval, max(0, deadline - time.time())))
+        num_pending = len(self.outbox)
+        if num_pending:
+            click.echo('[WARNING] {} job updates couldn\'t be sent. They will be sent on the next start'.format(
+                num_pending))
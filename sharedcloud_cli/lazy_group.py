@@ -0,0 +1,39 @@
+import importlib
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    Group whose subcommands are registered by name and only imported when they are invoked.
+
+    Each command module (and the heavy dependencies that it brings, e.g., "requests") is imported on demand, so
+    commands like "sharedcloud version" start as fast as the interpreter allows.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param lazy_subcommands: dict mapping each command name to "module.path.attribute" (Default value = None)
+        """
+        self.lazy_subcommands = kwargs.pop('lazy_subcommands', None) or {}
+        super(LazyGroup, self).__init__(*args, **kwargs)
+
+    def list_commands(self, ctx):
+        return sorted(set(super(LazyGroup, self).list_commands(ctx)) | set(self.lazy_subcommands.keys()))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands and cmd_name not in self.commands:
+            self.add_command(self._load(cmd_name), cmd_name)
+        return super(LazyGroup, self).get_command(ctx, cmd_name)
+
+    def _load(self, cmd_name):
+        """
+        Import the command registered with a name.
+
+        :param cmd_name: name of the command
+        """
+        module_path, attribute = self.lazy_subcommands[cmd_name].rsplit('.', 1)
+        command = getattr(importlib.import_module(module_path), attribute)
+        if not isinstance(command, click.BaseCommand):
+            raise ValueError('"{}" is not a click command'.format(self.lazy_subcommands[cmd_name]))
+        return command
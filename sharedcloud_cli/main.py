@@ -2,25 +2,37 @@ import os
 
 import click
 
-from sharedcloud_cli.cli.account import account
-from sharedcloud_cli.cli.function import function
-from sharedcloud_cli.cli.gpu import gpu
-from sharedcloud_cli.cli.image import image
-from sharedcloud_cli.cli.instance import instance
-from sharedcloud_cli.cli.job import job
-from sharedcloud_cli.cli.login import login
-from sharedcloud_cli.cli.logout import logout
-from sharedcloud_cli.cli.offer import offer
-from sharedcloud_cli.cli.run import run
-from sharedcloud_cli.cli.version import version
 from sharedcloud_cli.config import pass_config
-from sharedcloud_cli.constants import DATA_FOLDER
+from sharedcloud_cli.constants import DATA_FOLDER, OUTPUT_FORMATS
+from sharedcloud_cli.lazy_group import LazyGroup
+from sharedcloud_cli.options import _parse_columns
 from sharedcloud_cli.utils import _read_user_token, _get_cli_version
 
-
-@click.group()
+# Commands are only imported when they are invoked, so the CLI starts fast
+COMMANDS = {
+    'version': 'sharedcloud_cli.cli.version.version',
+    'account': 'sharedcloud_cli.cli.account.account',
+    'login': 'sharedcloud_cli.cli.login.login',
+    'logout': 'sharedcloud_cli.cli.logout.logout',
+    'function': 'sharedcloud_cli.cli.function.function',
+    'run': 'sharedcloud_cli.cli.run.run',
+    'job': 'sharedcloud_cli.cli.job.job',
+    'image': 'sharedcloud_cli.cli.image.image',
+    'offer': 'sharedcloud_cli.cli.offer.offer',
+    'gpu': 'sharedcloud_cli.cli.gpu.gpu',
+    'instance': 'sharedcloud_cli.cli.instance.instance',
+    'cache': 'sharedcloud_cli.cli.cache.cache',
+}
+
+
+@click.group(cls=LazyGroup, lazy_subcommands=COMMANDS)
+@click.option('--output', default='table', type=click.Choice(OUTPUT_FORMATS),
+              help='Format of the lists. Other than "table", they show the raw values')
+@click.option('--columns', required=False, callback=_parse_columns,
+              help='Comma separated list of the columns shown by the lists')
+@click.option('--no-cache', is_flag=True, help='Ignore the cached catalogs (e.g., GPUs, images)')
 @pass_config
-def cli(config):
+def cli(config, output, columns, no_cache):
     """
     Sharedcloud CLI tool to:
 
@@ -30,17 +42,8 @@ def cli(config):
         os.makedirs(DATA_FOLDER)
 
     config.token = _read_user_token()
+    config.output = output
+    config.columns = columns
+    config.use_cache = not no_cache
     config.version = _get_cli_version()
 
-
-cli.add_command(version)
-cli.add_command(account)
-cli.add_command(login)
-cli.add_command(logout)
-cli.add_command(function)
-cli.add_command(run)
-cli.add_command(job)
-cli.add_command(image)
-cli.add_command(offer)
-cli.add_command(gpu)
-cli.add_command(instance)
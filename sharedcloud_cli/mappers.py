@@ -5,6 +5,28 @@ import timeago
 from sharedcloud_cli.constants import DATETIME_FORMAT, JOB_STATUSES, INSTANCE_STATUSES, INSTANCE_TYPES
 
 
+# Reverse lookup tables, from the codes sent by the Backend to their names
+_JOB_STATUS_NAMES = {id: status_name for status_name, id in JOB_STATUSES.items()}
+_INSTANCE_STATUS_NAMES = {id: status_name for status_name, id in INSTANCE_STATUSES.items()}
+_INSTANCE_TYPE_NAMES = {id: type_name for type_name, id in INSTANCE_TYPES.items()}
+
+
+def _parse_datetime(value):
+    """
+    Parse a datetime sent by the Backend (e.g., "20-05-2018 16:30:00").
+
+    As the format is fixed, the fields are sliced directly, which is several times faster than "strptime".
+
+    :param value: str with the datetime in DATETIME_FORMAT
+    """
+    if not value:
+        return None
+    if len(value) == 19 and value[2] == '-' and value[5] == '-' and value[13] == ':':
+        return datetime.datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]),
+                                 int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    return datetime.datetime.strptime(value, DATETIME_FORMAT)
+
+
 def _map_datetime_obj_to_human_representation(datetime_obj, resource, token):
     """
     Map a datetime obj into a human readable representation.
@@ -13,10 +35,46 @@ def _map_datetime_obj_to_human_representation(datetime_obj, resource, token):
     :param resource: resource containing all the values and keys
     :param token: user token
     """
-    now = datetime.datetime.strptime(resource.get('current_server_time'), DATETIME_FORMAT)
+    now = _parse_datetime(resource.get('current_server_time'))
 
     if datetime_obj:  # It can be None for certain dates
-        return timeago.format(datetime.datetime.strptime(datetime_obj, DATETIME_FORMAT), now)
+        return timeago.format(_parse_datetime(datetime_obj), now)
+
+
+def _map_datetime_column_to_human_representation(datetime_objs, resources, token):
+    """
+    Map a whole column of datetime objs into human readable representations.
+
+    The server time is parsed once per response instead of once per row, and rows that are the same number of
+    seconds old share their representation.
+
+    :param datetime_objs: list with the datetime objects that we want to transform
+    :param resources: list of resources containing all the values and keys
+    :param token: user token
+    """
+    server_times = {}
+    representations = {}
+    column = []
+    for datetime_obj, resource in zip(datetime_objs, resources):
+        if not datetime_obj:  # It can be None for certain dates
+            column.append(None)
+            continue
+
+        server_time = resource.get('current_server_time')
+        if server_time not in server_times:
+            server_times[server_time] = _parse_datetime(server_time)
+        now = server_times[server_time]
+
+        date = _parse_datetime(datetime_obj)
+        if now is None:
+            column.append(timeago.format(date))
+            continue
+
+        age = now - date
+        if age not in representations:
+            representations[age] = timeago.format(date, now)
+        column.append(representations[age])
+    return column
 
 
 def _map_job_status_to_human_representation(status, resource, token):
@@ -27,9 +85,7 @@ def _map_job_status_to_human_representation(status, resource, token):
     :param resource: resource containing all the values and keys
     :param token: user token
     """
-    for status_name, id in JOB_STATUSES.items():
-        if id == status:
-            return status_name
+    return _JOB_STATUS_NAMES.get(status)
 
 
 def _map_instance_status_to_human_representation(status, resource, token):
@@ -40,9 +96,7 @@ def _map_instance_status_to_human_representation(status, resource, token):
     :param resource: resource containing all the values and keys
     :param token: user token
     """
-    for status_name, id in INSTANCE_STATUSES.items():
-        if id == status:
-            return status_name
+    return _INSTANCE_STATUS_NAMES.get(status)
 
 
 def _map_instance_type_to_human_readable(type, resource, token):
@@ -53,9 +107,7 @@ def _map_instance_type_to_human_readable(type, resource, token):
     :param resource: resource containing all the values and keys
     :param token: user token
     """
-    for type_name, id in INSTANCE_TYPES.items():
-        if id == type:
-            return type_name
+    return _INSTANCE_TYPE_NAMES.get(type)
 
 
 def _map_non_formatted_money_to_version_with_currency(cost, resource, token):
@@ -94,3 +146,64 @@ def _map_boolean_to_human_readable(boolean, resource, token):
     else:
         return 'No'
 
+
+def _map_bytes_to_human_readable(size, resource, token):
+    """
+    Map a size in bytes (e.g., 1536) into a human readable representation (e.g., 1.5 KB).
+
+    :param size: integer with the value that we want to transform
+    :param resource: resource containing all the values and keys
+    :param token: user token
+    """
+    if size is None:
+        return None
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(size) < 1024:
+            return '{:.1f} {}'.format(size, unit) if unit != 'B' else '{} B'.format(size)
+        size /= 1024.0
+    return '{:.1f} TB'.format(size)
+
+
+# Mappers that can transform a whole column at once, faster than row by row
+_COLUMN_MAPPERS = {
+    _map_datetime_obj_to_human_representation: _map_datetime_column_to_human_representation,
+    _map_job_status_to_human_representation: lambda statuses, resources, token: [
+        _JOB_STATUS_NAMES.get(status) for status in statuses],
+    _map_instance_status_to_human_representation: lambda statuses, resources, token: [
+        _INSTANCE_STATUS_NAMES.get(status) for status in statuses],
+    _map_instance_type_to_human_readable: lambda types, resources, token: [
+        _INSTANCE_TYPE_NAMES.get(type) for type in types],
+}
+
+
+def _map_column(mapper, values, resources, token):
+    """
+    Apply a mapper to a whole column, using its column version if there is one.
+
+    :param mapper: function that transforms a single value
+    :param values: list with the values of the column
+    :param resources: list of resources containing all the values and keys
+    :param token: user token
+    """
+    column_mapper = _COLUMN_MAPPERS.get(mapper)
+    if column_mapper:
+        return column_mapper(values, resources, token)
+    return [mapper(value, resource, token) for value, resource in zip(values, resources)]
+
+
+def _map_rows(resources, keys, mappers, token):
+    """
+    Extract the rows to be displayed from a page of resources, mapping their values column by column.
+
+    :param resources: list of resources sent by the Backend
+    :param keys: attributes names that are displayed
+    :param mappers: dict of functions that will transform the data that the user sees
+    :param token: user token
+    """
+    columns = []
+    for key in keys:
+        values = [resource.get(key) for resource in resources]
+        if key in mappers:
+            values = _map_column(mappers[key], values, resources, token)
+        columns.append(values)
+    return [list(row) for row in zip(*columns)]
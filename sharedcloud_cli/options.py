@@ -0,0 +1,110 @@
+import datetime
+import functools
+import re
+
+import click
+
+from sharedcloud_cli.constants import LIST_PAGE_SIZE, DATETIME_FORMAT
+
+
+def _parse_column_widths(ctx, param, value):
+    """
+    Parse a comma separated list of column widths (e.g., "36,4,10").
+
+    :param ctx: cmd context
+    :param param: cmd parameter
+    :param value: comma separated list of widths
+    """
+    if not value:
+        return None
+    try:
+        widths = [int(width) for width in value.split(',')]
+    except ValueError:
+        raise click.BadParameter('Widths need to be a comma separated list of integers (e.g., "36,4,10")')
+    if any(width < 1 for width in widths):
+        raise click.BadParameter('Widths need to be greater than 0')
+    return widths
+
+
+def _parse_columns(ctx, param, value):
+    """
+    Parse a comma separated list of columns (e.g., "uuid,status").
+
+    :param ctx: cmd context
+    :param param: cmd parameter
+    :param value: comma separated list of columns
+    """
+    if not value:
+        return None
+    return [column.strip() for column in value.split(',') if column.strip()]
+
+
+class TimeBoundary(click.ParamType):
+    """
+    Point in time given either as a date (e.g., "2018-05-20", "2018-05-20 16:30:00") or relative to now
+    (e.g., "30m", "12h", "7d", "2w"). Relative times are returned as a timedelta.
+    """
+    name = 'time'
+
+    UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks'}
+    FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', DATETIME_FORMAT]
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, (datetime.datetime, datetime.timedelta)):
+            return value
+
+        match = re.match(r'^(\d+)([smhdw])$', value.strip())
+        if match:
+            return datetime.timedelta(**{self.UNITS[match.group(2)]: int(match.group(1))})
+
+        for time_format in self.FORMATS:
+            try:
+                return datetime.datetime.strptime(value.strip(), time_format)
+            except ValueError:
+                pass
+        self.fail('"{}" is neither a date (e.g., "2018-05-20 16:30:00") nor a relative time (e.g., "12h")'.format(
+            value), param, ctx)
+
+
+def pagination_options(f):
+    """
+    Add the "--limit", "--page-size", "--all" and "--column-widths" options to a list command.
+
+    They are gathered in a single "pagination" argument, ready to be passed to "_list_resource".
+
+    :param f: command function
+    """
+
+    @click.option('--limit', required=False, type=click.IntRange(1, None))
+    @click.option('--page-size', required=False, default=LIST_PAGE_SIZE, type=click.IntRange(1, None))
+    @click.option('--all', 'all_pages', is_flag=True)
+    @click.option('--column-widths', required=False, callback=_parse_column_widths)
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        kwargs['pagination'] = {
+            'limit': kwargs.pop('limit'),
+            'page_size': kwargs.pop('page_size'),
+            'all_pages': kwargs.pop('all_pages'),
+            'column_widths': kwargs.pop('column_widths')
+        }
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+def field_range_options(f):
+    """
+    Add the "--head" and "--tail" options to a command that prints a field, so only part of it is fetched.
+
+    :param f: command function
+    """
+
+    @click.option('--head', required=False, type=click.IntRange(1, None), help='Only print the first N bytes')
+    @click.option('--tail', required=False, type=click.IntRange(1, None), help='Only print the last N bytes')
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        if kwargs.get('head') is not None and kwargs.get('tail') is not None:
+            raise click.UsageError('"--head" and "--tail" can\'t be used together')
+        return f(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from sharedcloud_cli.constants import SHAREDCLOUD_CLI_JOB_OUTBOX_FILENAME
+
+
+class JobOutbox(object):
+    """
+    Write-ahead log of the job updates that haven't been delivered to the Backend yet, stored in SQLite.
+
+    Updates are persisted before they are sent, and removed once the Backend has them, so results survive crashes of
+    the worker and are delivered on the next start. Any process can add updates at the same time.
+
+    The updates of a job are always taken together, oldest first, so a newer update is never overtaken by an older
+    one that is waiting to be retried.
+    """
+
+    def __init__(self, path=SHAREDCLOUD_CLI_JOB_OUTBOX_FILENAME):
+        """
+        :param path: file of the SQLite database (Default value = SHAREDCLOUD_CLI_JOB_OUTBOX_FILENAME)
+        """
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        """
+        Connection bound to the current thread and process, as SQLite connections can't be shared between them.
+        """
+        if getattr(self._local, 'pid', None) != os.getpid():
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS updates ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                               'job_uuid TEXT NOT NULL, '
+                               'data TEXT NOT NULL, '
+                               'attempts INTEGER NOT NULL DEFAULT 0, '
+                               'next_attempt_at REAL NOT NULL DEFAULT 0)')
+            connection.execute('CREATE INDEX IF NOT EXISTS updates_job_uuid ON updates (job_uuid)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def add(self, job_uuid, data):
+        """
+        Persist an update of a job.
+
+        :param job_uuid: uuid of the job
+        :param data: dict with the fields to change. It needs to be serializable to JSON
+        """
+        self.connection.execute('INSERT INTO updates (job_uuid, data) VALUES (?, ?)', (str(job_uuid), json.dumps(data)))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM updates').fetchone()[0]
+
+    def take(self, max_jobs, now=None):
+        """
+        Returns the updates due by now of up to "max_jobs" jobs, oldest first, as a list of
+        (job_uuid, ids, merged data, attempts).
+
+        :param max_jobs: max number of jobs
+        :param now: timestamp. None means now (Default value = None)
+        """
+        job_uuids = [row[0] for row in self.connection.execute(
+            'SELECT job_uuid FROM updates GROUP BY job_uuid HAVING MAX(next_attempt_at) <= ? ORDER BY MIN(id) LIMIT ?',
+            (time.time() if now is None else now, max_jobs))]
+        if not job_uuids:
+            return []
+
+        jobs = {}
+        rows = self.connection.execute(
+            'SELECT id, job_uuid, data, attempts FROM updates WHERE job_uuid IN ({}) ORDER BY id'.format(
+                ', '.join('?' * len(job_uuids))), job_uuids)
+        for update_id, job_uuid, data, attempts in rows:
+            ids, merged, max_attempts = jobs.setdefault(job_uuid, ([], {}, 0))
+            ids.append(update_id)
+            merged.update(json.loads(data))
+            jobs[job_uuid] = (ids, merged, max(max_attempts, attempts))
+        return [(job_uuid,) + jobs[job_uuid] for job_uuid in job_uuids]
+
+    def remove(self, ids):
+        """
+        Remove delivered updates.
+
+        :param ids: ids of the updates
+        """
+        for offset in range(0, len(ids), 500):  # SQLite limits the number of parameters
+            chunk = ids[offset:offset + 500]
+            self.connection.execute('DELETE FROM updates WHERE id IN ({})'.format(', '.join('?' * len(chunk))), chunk)
+
+    def retry_later(self, ids, delay):
+        """
+        Postpone updates that couldn't be delivered.
+
+        :param ids: ids of the updates
+        :param delay: seconds until the next attempt
+        """
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            self.connection.execute(
+                'UPDATE updates SET attempts = attempts + 1, next_attempt_at = ? WHERE id IN ({})'.format(
+                    ', '.join('?' * len(chunk))), [time.time() + delay] + chunk)
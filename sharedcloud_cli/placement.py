@@ -0,0 +1,140 @@
+import glob
+import math
+import os
+import re
+
+from sharedcloud_cli.resources import _cpu_count, _read_file
+
+
+def _parse_cpu_list(cpu_list):
+    """
+    Returns the cpus of a list in the format of the kernel, e.g. "0-3,8,10-11".
+
+    :param cpu_list: list of cpus
+    """
+    cpus = []
+    for part in (cpu_list or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _format_cpu_list(cpus):
+    """
+    Returns the cpus in the format of the kernel (and of "--cpuset-cpus"), with consecutive cpus as ranges.
+
+    :param cpus: iterable with the cpus
+    """
+    parts = []
+    for cpu in sorted(cpus):
+        if parts and parts[-1][1] == cpu - 1:
+            parts[-1][1] = cpu
+        else:
+            parts.append([cpu, cpu])
+    return ','.join(str(start) if start == end else '{}-{}'.format(start, end) for start, end in parts)
+
+
+def _numa_nodes(root='/', allowed_cpus=None):
+    """
+    Returns a dict with the cpus of each NUMA node of the host, read from /sys/devices/system/node. Hosts without
+    NUMA information are a single node.
+
+    :param root: root of the filesystem (Default value = '/')
+    :param allowed_cpus: cpus where this process is allowed to run. None means all of them (Default value = None)
+    """
+    if allowed_cpus is None and hasattr(os, 'sched_getaffinity'):
+        allowed_cpus = os.sched_getaffinity(0)
+
+    nodes = {}
+    for path in glob.glob(os.path.join(root, 'sys/devices/system/node/node*')):
+        match = re.match(r'^node(\d+)$', os.path.basename(path))
+        if not match:
+            continue
+        cpus = _parse_cpu_list(_read_file(path, 'cpulist'))
+        if allowed_cpus is not None:
+            cpus = [cpu for cpu in cpus if cpu in allowed_cpus]
+        # Nodes with memory but no cpus (e.g., persistent memory) can't take jobs
+        if cpus:
+            nodes[int(match.group(1))] = cpus
+
+    if not nodes:
+        nodes[0] = sorted(allowed_cpus) if allowed_cpus is not None else list(range(_cpu_count()))
+    return nodes
+
+
+class CpuPlacement(object):
+    """
+    Give each running job a dedicated set of cpus, so jobs don't thrash each other's caches.
+
+    Jobs are spread across the NUMA nodes: each one goes to the node with the most free cpus, and its memory is
+    taken from that node. Only jobs that don't fit in any node on their own span more than one. The cpus of a job
+    are given back when it finishes.
+    """
+
+    def __init__(self, nodes):
+        """
+        :param nodes: dict with the cpus of each NUMA node
+        """
+        self.nodes = nodes
+        self.free = {node: sorted(cpus) for node, cpus in nodes.items()}
+        self.assignments = {}
+
+    @classmethod
+    def from_host(cls, root='/'):
+        """
+        Build a placement for the NUMA nodes of this host.
+
+        :param root: root of the filesystem (Default value = '/')
+        """
+        return cls(_numa_nodes(root))
+
+    @property
+    def num_cpus(self):
+        return sum(len(cpus) for cpus in self.nodes.values())
+
+    def assign(self, job_uuid, cpus):
+        """
+        Reserve cpus for a job. Returns a dict with its "cpuset_cpus" and "cpuset_mems", or None if there aren't
+        enough free cpus.
+
+        :param job_uuid: uuid of the job
+        :param cpus: cpus requested by the job. Fractions take a whole cpu
+        """
+        num_cpus = min(max(1, int(math.ceil(cpus))), self.num_cpus)
+        if sum(len(free) for free in self.free.values()) < num_cpus:
+            return None
+
+        fitting = [node for node in sorted(self.free) if len(self.free[node]) >= num_cpus]
+        if fitting:
+            candidates = [max(fitting, key=lambda node: len(self.free[node]))]
+        else:
+            candidates = sorted(self.free, key=lambda node: len(self.free[node]), reverse=True)
+
+        assignment = {}
+        for node in candidates:
+            missing = num_cpus - sum(len(cpus) for cpus in assignment.values())
+            if missing <= 0:
+                break
+            assignment[node], self.free[node] = self.free[node][:missing], self.free[node][missing:]
+        assignment = {node: cpus for node, cpus in assignment.items() if cpus}
+
+        self.assignments[job_uuid] = assignment
+        return {
+            'cpuset_cpus': _format_cpu_list(cpu for cpus in assignment.values() for cpu in cpus),
+            'cpuset_mems': ','.join(str(node) for node in sorted(assignment))
+        }
+
+    def release(self, job_uuid):
+        """
+        Give back the cpus of a finished job.
+
+        :param job_uuid: uuid of the job
+        """
+        for node, cpus in self.assignments.pop(job_uuid, {}).items():
+            self.free[node] = sorted(self.free[node] + cpus)
+
+
+PLACEMENT_POLICIES = ['none', 'numa']
@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+
+from sharedcloud_cli.constants import JOB_DEFAULT_CPUS, JOB_DEFAULT_MEMORY, HOST_RESERVED_MEMORY
+
+# Limits of cgroups v1 that are this big actually mean "no limit"
+UNLIMITED = 2 ** 60
+
+
+def _read_file(root, path):
+    """
+    Returns the stripped content of a file, or None if it can't be read.
+
+    :param root: root of the filesystem
+    :param path: path of the file, relative to "root"
+    """
+    try:
+        with open(os.path.join(root, path)) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def _cgroup_cpu_limit(root='/'):
+    """
+    Returns the cpus that the cgroup of this process can use, or None if it has no limit.
+
+    :param root: root of the filesystem (Default value = '/')
+    """
+    # cgroups v2: "<quota> <period>", where the quota can be "max"
+    cpu_max = _read_file(root, 'sys/fs/cgroup/cpu.max')
+    if cpu_max:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / float(period)
+        return None
+
+    # cgroups v1: a quota of -1 means no limit
+    quota = _read_file(root, 'sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_file(root, 'sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return int(quota) / float(period)
+    return None
+
+
+def _cgroup_memory_limit(root='/'):
+    """
+    Returns the megabytes of memory that the cgroup of this process can use, or None if it has no limit.
+
+    :param root: root of the filesystem (Default value = '/')
+    """
+    limit = _read_file(root, 'sys/fs/cgroup/memory.max') or _read_file(
+        root, 'sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not limit or limit == 'max' or int(limit) >= UNLIMITED:
+        return None
+    return int(limit) // (1024 * 1024)
+
+
+def _total_memory(root='/'):
+    """
+    Returns the megabytes of memory of the host, read from /proc/meminfo, or None if they are unknown.
+
+    :param root: root of the filesystem (Default value = '/')
+    """
+    meminfo = _read_file(root, 'proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) // 1024
+    return None
+
+
+def _cpu_count():
+    """
+    Returns the number of cpus on which this process is allowed to run.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+
+def _host_capacity(root='/', reserved_memory=HOST_RESERVED_MEMORY):
+    """
+    Returns the cpus and the megabytes of memory that jobs can use in this host. The memory is None if it's unknown.
+
+    The cgroup limits are taken into account, so an instance running inside a container doesn't take more jobs
+    than its container can run.
+
+    :param root: root of the filesystem (Default value = '/')
+    :param reserved_memory: megabytes kept for the host and the worker itself (Default value = HOST_RESERVED_MEMORY)
+    """
+    cpus = _cpu_count()
+    cgroup_cpus = _cgroup_cpu_limit(root)
+    if cgroup_cpus is not None:
+        cpus = min(cpus, cgroup_cpus)
+
+    memory = [limit for limit in (_total_memory(root), _cgroup_memory_limit(root)) if limit is not None]
+    if not memory:
+        return cpus, None
+    memory = min(memory)
+    # Tiny hosts still run jobs, even if that means eating into the reserve
+    return cpus, max(memory - reserved_memory, memory // 2)
+
+
+class AdmissionController(object):
+    """
+    Pack jobs onto the cpus and the memory of the host.
+
+    Each job requests some cpus and megabytes of memory (the defaults, unless the Backend says otherwise), and it's
+    only admitted if they are free. Those requests are also the limits of its container, so jobs can't starve each
+    other. A job that requests more than the whole host is clamped to it, so it can still run on its own.
+    """
+
+    def __init__(self, cpus, memory=None, default_cpus=JOB_DEFAULT_CPUS, default_memory=JOB_DEFAULT_MEMORY):
+        """
+        :param cpus: cpus that jobs can use
+        :param memory: megabytes of memory that jobs can use. None means no limit (Default value = None)
+        :param default_cpus: cpus requested by the jobs that don't say it (Default value = JOB_DEFAULT_CPUS)
+        :param default_memory: megabytes requested by the jobs that don't say it (Default value = JOB_DEFAULT_MEMORY)
+        """
+        self.cpus = cpus
+        self.memory = memory
+        self.default_request = self._clamp({'cpus': default_cpus, 'memory': default_memory})
+        self.allocations = {}
+
+    @classmethod
+    def from_host(cls, root='/', **kwargs):
+        """
+        Build a controller for the capacity of this host.
+
+        :param root: root of the filesystem (Default value = '/')
+        """
+        cpus, memory = _host_capacity(root)
+        return cls(cpus, memory, **kwargs)
+
+    def _clamp(self, request):
+        return {
+            'cpus': min(request['cpus'], self.cpus),
+            'memory': min(request['memory'], self.memory) if self.memory is not None else request['memory']
+        }
+
+    def request_for(self, job):
+        """
+        Returns the resources requested by a job, as a dict with its "cpus" and megabytes of "memory".
+
+        :param job: dict with the job, as received from the Backend
+        """
+        return self._clamp({
+            'cpus': float(job.get('cpus') or self.default_request['cpus']),
+            'memory': int(job.get('memory') or self.default_request['memory'])
+        })
+
+    def _free(self, reserved=()):
+        """
+        Returns the cpus and the megabytes of memory that are free, without the "reserved" requests.
+
+        :param reserved: requests that will be admitted soon (Default value = ())
+        """
+        requests = list(self.allocations.values()) + list(reserved)
+        free_cpus = self.cpus - sum(request['cpus'] for request in requests)
+        if self.memory is None:
+            return free_cpus, float('inf')
+        return free_cpus, self.memory - sum(request['memory'] for request in requests)
+
+    def fits(self, request, reserved=()):
+        free_cpus, free_memory = self._free(reserved)
+        # A small margin, as the cpus of the requests are floats
+        return request['cpus'] <= free_cpus + 1e-9 and request['memory'] <= free_memory
+
+    def admit(self, job_uuid, request=None):
+        """
+        Allocate the resources of a job if they are free. Returns whether the job was admitted.
+
+        :param job_uuid: uuid of the job
+        :param request: resources requested by the job. None means the default ones (Default value = None)
+        """
+        request = request or self.default_request
+        if not self.fits(request):
+            return False
+        self.allocations[job_uuid] = dict(request)
+        return True
+
+    def release(self, job_uuid):
+        """
+        Free the resources of a finished job.
+
+        :param job_uuid: uuid of the job
+        """
+        self.allocations.pop(job_uuid, None)
+
+    def num_fitting(self, reserved=()):
+        """
+        Returns how many more jobs with the default request fit in the free resources.
+
+        :param reserved: requests that will be admitted soon (Default value = ())
+        """
+        free_cpus, free_memory = self._free(reserved)
+        num_jobs = int((free_cpus + 1e-9) // self.default_request['cpus'])
+        if free_memory != float('inf'):
+            num_jobs = min(num_jobs, int(free_memory // self.default_request['memory']))
+        return max(0, num_jobs)
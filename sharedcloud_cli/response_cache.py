@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+
+from sharedcloud_cli.constants import RESPONSE_CACHE_FOLDER
+from sharedcloud_cli.files import _atomic_write_json
+
+
+class CachedResponse(object):
+    """
+    Response served from the cache. It quacks like the responses of "requests" that the commands use.
+    """
+
+    def __init__(self, data, status_code=200):
+        self.status_code = status_code
+        self.data = data
+        self.headers = {}
+
+    @property
+    def content(self):
+        return json.dumps(self.data).encode('utf-8')
+
+    def json(self):
+        return self.data
+
+
+class ResponseCache(object):
+    """
+    Read-through cache of GET responses, stored in the DATA_FOLDER and keyed by url, query params and user token.
+
+    Responses younger than their ttl are served without any request. Older ones are revalidated with the
+    "If-None-Match" and "If-Modified-Since" headers, so the Backend only sends them again if they have changed.
+    """
+
+    def __init__(self, folder=RESPONSE_CACHE_FOLDER):
+        """
+        :param folder: folder where the responses are stored (Default value = RESPONSE_CACHE_FOLDER)
+        """
+        self.folder = folder
+
+    def _path(self, url, params, token):
+        token_hash = hashlib.sha256((token or '').encode('utf-8')).hexdigest()
+        key = json.dumps([url, sorted((params or {}).items()), token_hash])
+        return os.path.join(self.folder, '{}.json'.format(hashlib.sha1(key.encode('utf-8')).hexdigest()))
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def _write(self, path, entry):
+        try:
+            if not os.path.exists(self.folder):
+                os.makedirs(self.folder, 0o700, exist_ok=True)
+            _atomic_write_json(path, entry)
+        except (IOError, OSError):
+            pass  # The response is simply not cached
+
+    def get(self, client, url, ttl, params=None):
+        """
+        Returns the response of a GET request, from the cache if possible.
+
+        :param client: http client
+        :param url: url of the request
+        :param ttl: seconds during which a response is served without revalidating it
+        :param params: query params (Default value = None)
+        """
+        path = self._path(url, params, client.token)
+        entry = self._read(path)
+        if entry and time.time() - entry.get('stored_at', 0) < ttl:
+            return CachedResponse(entry['data'])
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        r = client.get(url, params=params, headers=headers)
+        if r.status_code == 304 and entry:
+            entry['stored_at'] = time.time()
+            self._write(path, entry)
+            return CachedResponse(entry['data'])
+        if r.status_code != 200:
+            return r
+
+        entry = {
+            'url': url,
+            'etag': r.headers.get('ETag'),
+            'last_modified': r.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'data': r.json()
+        }
+        self._write(path, entry)
+        return CachedResponse(entry['data'])
+
+    def _entries(self):
+        if not os.path.exists(self.folder):
+            return []
+        return [os.path.join(self.folder, name) for name in os.listdir(self.folder) if name.endswith('.json')]
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:  # Somebody else removed it first
+            pass
+
+    def invalidate(self, url_prefix):
+        """
+        Remove the responses of the urls that start with a prefix, e.g., after changing those resources.
+
+        :param url_prefix: prefix of the urls
+        """
+        for path in self._entries():
+            entry = self._read(path)
+            if not entry or entry.get('url', '').startswith(url_prefix):
+                self._remove(path)
+
+    def clear(self):
+        """
+        Remove all the responses. Returns the number of responses removed.
+        """
+        paths = self._entries()
+        for path in paths:
+            self._remove(path)
+        return len(paths)
@@ -0,0 +1,714 @@
+import base64
+import http.client
+import json
+import os
+import queue
+import select
+import socket
+import struct
+import subprocess
+import threading
+from urllib.parse import quote, urlencode
+
+from sharedcloud_cli.constants import DOCKER_SOCKET_PATH, DOCKER_API_VERSION, SHAREDCLOUD_CLI_CONTAINER_RUNTIME, \
+    SHAREDCLOUD_CLI_POOL_MAXSIZE, DOCKER_CONFIG_FILENAME
+
+DOCKER_HUB_REGISTRY = 'https://index.docker.io/v1/'
+
+
+class ContainerRuntimeError(Exception):
+    """
+    Raised when the container runtime can't perform an operation.
+    """
+
+    def __init__(self, message, status=None):
+        """
+        :param message: reason of the error
+        :param status: http status answered by the Docker Engine, if any (Default value = None)
+        """
+        super(ContainerRuntimeError, self).__init__(message)
+        self.status = status
+
+
+def _split_registry_path(registry_path):
+    """
+    Split a registry path (e.g., sharedcloud/standard-node8:latest) into the image name and its tag.
+
+    :param registry_path: path to the DockerHub registry
+    """
+    if '@' in registry_path:
+        return registry_path, None
+
+    name, _, last = registry_path.rpartition('/')
+    if ':' in last:
+        last, tag = last.split(':', 1)
+    else:
+        tag = 'latest'
+    return '{}/{}'.format(name, last) if name else last, tag
+
+
+def _collect_chunks(chunks, on_chunk=None):
+    """
+    Pass each chunk of output to "on_chunk" or, without it, join them. Returns a tuple with the output and the error.
+
+    :param chunks: iterable of ("stdout" or "stderr", bytes)
+    :param on_chunk: function called with each chunk (Default value = None)
+    """
+    output, error = [], []
+    for stream, chunk in chunks:
+        if on_chunk:
+            on_chunk(stream, chunk)
+        else:
+            (error if stream == 'stderr' else output).append(chunk)
+    return b''.join(output), b''.join(error)
+
+
+class ContainerRuntime(object):
+    """
+    Base class for the ways of talking to Docker.
+
+    Containers can be run in one go with "run", or step by step with create/start/logs/wait/remove so their
+    lifecycle and output can be followed while they are running.
+    """
+
+    def ping(self):
+        """
+        Returns True if the Docker daemon is running.
+        """
+        raise NotImplementedError
+
+    def pull(self, registry_path, on_line=None):
+        """
+        Pull an image from the registry. Returns a tuple with the output and the error (both bytes).
+
+        :param registry_path: path to the DockerHub registry
+        :param on_line: function called with each line of progress as soon as it's received (Default value = None)
+        """
+        raise NotImplementedError
+
+    def remove_image(self, registry_path):
+        """
+        Remove an image from the system. Returns a tuple with the output and the error (both bytes).
+
+        :param registry_path: path to the DockerHub registry
+        """
+        raise NotImplementedError
+
+    def inspect_image(self, registry_path):
+        """
+        Returns a dict with the details of a downloaded image, or None if it isn't in the system.
+
+        :param registry_path: path to the DockerHub registry
+        """
+        raise NotImplementedError
+
+    def create_container(self, name, image, env=None, cpus=None, memory=None, gpu=False, entrypoint=None,
+                         cpuset_cpus=None, cpuset_mems=None):
+        """
+        Create a container without starting it. Returns the container id.
+
+        :param name: name of the container
+        :param image: image path in the DockerHub registry
+        :param env: dict with the environment variables (Default value = None)
+        :param cpus: number of cpus the container can use (Default value = None)
+        :param memory: megabytes of memory the container can use (Default value = None)
+        :param gpu: does the container require gpu? (Default value = False)
+        :param entrypoint: list overriding the entrypoint of the image (Default value = None)
+        :param cpuset_cpus: cpus where the container is pinned, e.g. "0-3,8" (Default value = None)
+        :param cpuset_mems: NUMA nodes whose memory the container uses, e.g. "0" (Default value = None)
+        """
+        raise NotImplementedError
+
+    def update_container(self, container_id, cpuset_cpus=None, cpuset_mems=None):
+        """
+        Change the cpus and NUMA nodes of a container, even while it runs.
+
+        :param container_id: id or name of the container
+        :param cpuset_cpus: cpus where the container is pinned, e.g. "0-3,8" (Default value = None)
+        :param cpuset_mems: NUMA nodes whose memory the container uses, e.g. "0" (Default value = None)
+        """
+        raise NotImplementedError
+
+    def start_container(self, container_id):
+        raise NotImplementedError
+
+    def container_logs(self, container_id):
+        """
+        Follow the output of a container until it stops. Yields tuples of ("stdout" or "stderr", bytes).
+
+        :param container_id: id or name of the container
+        """
+        raise NotImplementedError
+
+    def wait_container(self, container_id):
+        """
+        Block until the container stops. Returns its exit code.
+
+        :param container_id: id or name of the container
+        """
+        raise NotImplementedError
+
+    def remove_container(self, container_id):
+        raise NotImplementedError
+
+    def exec_container(self, container_id, command, env=None, on_chunk=None):
+        """
+        Execute a command inside a running container until it finishes.
+
+        Returns a tuple with the output (bytes), the error (bytes) and the exit code. If "on_chunk" is provided, the
+        output is passed to it as it arrives instead, and the output and error returned are empty.
+
+        :param container_id: id or name of the container
+        :param command: list with the command and its arguments
+        :param env: dict with the environment variables (Default value = None)
+        :param on_chunk: function called with ("stdout" or "stderr", bytes) for each chunk (Default value = None)
+        """
+        raise NotImplementedError
+
+    def run(self, name, image, env=None, cpus=None, memory=None, gpu=False, on_chunk=None, cpuset_cpus=None,
+            cpuset_mems=None):
+        """
+        Run a container until it stops and remove it afterwards.
+
+        Returns a tuple with the output (bytes), the error (bytes) and the exit code. If "on_chunk" is provided, the
+        output is passed to it as it arrives instead, and the output and error returned are empty.
+        """
+        container_id = self.create_container(name, image, env=env, cpus=cpus, memory=memory, gpu=gpu,
+                                             cpuset_cpus=cpuset_cpus, cpuset_mems=cpuset_mems)
+        try:
+            self.start_container(container_id)
+            output, error = _collect_chunks(self.container_logs(container_id), on_chunk)
+            exit_code = self.wait_container(container_id)
+        finally:
+            self.remove_container(container_id)
+
+        return output, error, exit_code
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a unix socket.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        super(UnixHTTPConnection, self).__init__('localhost')
+        self.socket_path = socket_path
+        self.socket_timeout = timeout
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.socket_timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def _registry_host(address):
+    """
+    Host of a registry address, so "https://index.docker.io/v1/" and "index.docker.io" are the same registry.
+
+    :param address: address of the registry
+    """
+    return address.split('://')[-1].split('/')[0]
+
+
+def _registry_auth(registry_path, config_path=DOCKER_CONFIG_FILENAME):
+    """
+    Returns the "X-Registry-Auth" header with the credentials of the registry of an image, as stored by "docker login".
+    It's empty if there are no credentials, and None if they are kept by a credential helper, which only the "docker"
+    command line tool can use.
+
+    :param registry_path: path to the registry of the image
+    :param config_path: docker config file (Default value = DOCKER_CONFIG_FILENAME)
+    """
+    try:
+        with open(config_path, 'r') as f:
+            config = json.load(f)
+    except (IOError, ValueError):
+        return ''
+
+    first, _, rest = registry_path.partition('/')
+    registry = first if rest and ('.' in first or ':' in first or first == 'localhost') else DOCKER_HUB_REGISTRY
+    host = _registry_host(registry)
+
+    for address, entry in (config.get('auths') or {}).items():
+        if _registry_host(address) == host and entry.get('auth'):
+            username, _, password = base64.b64decode(entry['auth']).decode('utf-8').partition(':')
+            return base64.urlsafe_b64encode(json.dumps({
+                'username': username,
+                'password': password,
+                'serveraddress': registry
+            }).encode('utf-8')).decode('ascii')
+    if config.get('credsStore') or host in set(_registry_host(address) for address in config.get('credHelpers') or {}):
+        return None
+    return ''
+
+
+class DockerEngineRuntime(ContainerRuntime):
+    """
+    Talk to the Docker Engine HTTP API through its unix socket.
+
+    Connections are kept alive and reused between calls, and they are discarded after a fork. Images are pulled with
+    the credentials stored by "docker login", or with the "docker" command line tool if they are kept by a credential
+    helper.
+    """
+
+    IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+    def __init__(self, socket_path=DOCKER_SOCKET_PATH, api_version=DOCKER_API_VERSION,
+                 pool_maxsize=SHAREDCLOUD_CLI_POOL_MAXSIZE, config_path=DOCKER_CONFIG_FILENAME):
+        self.socket_path = socket_path
+        self.api_version = api_version
+        self.pool_maxsize = pool_maxsize
+        self.config_path = config_path
+        self._pool = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        if self._pid != os.getpid():
+            # The lock could have been held by another thread while forking
+            self._lock = threading.Lock()
+            self._pool = []
+            self._pid = os.getpid()
+
+        with self._lock:
+            while self._pool:
+                conn = self._pool.pop()
+                if not self._is_closed(conn):
+                    return conn, True
+                conn.close()
+        return UnixHTTPConnection(self.socket_path), False
+
+    @staticmethod
+    def _is_closed(conn):
+        """
+        Whether the daemon has closed an idle connection. Idle connections have nothing to read, so a readable socket
+        means that it was closed.
+        """
+        if conn.sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([conn.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _release_connection(self, conn, response):
+        # The connection can only be reused once the whole response has been consumed
+        if not response.isclosed():
+            response.read()
+
+        if response.will_close:
+            conn.close()
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and len(self._pool) < self.pool_maxsize:
+                self._pool.append(conn)
+                return
+        conn.close()
+
+    def _open(self, method, path, params=None, body=None, headers=None):
+        """
+        Send a request and return the connection together with the response, which hasn't been read yet.
+        """
+        url = '/{}{}'.format(self.api_version, path)
+        if params:
+            url += '?' + urlencode(params)
+
+        headers = dict(headers or {})
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        conn, reused = self._get_connection()
+        is_sent = False
+        try:
+            conn.request(method, url, body=body, headers=headers)
+            is_sent = True
+            response = conn.getresponse()
+        except (http.client.HTTPException, OSError) as e:
+            conn.close()
+            # Requests that could have reached the daemon are only sent again if they are idempotent, otherwise,
+            # e.g., a container could be created twice
+            if not reused or (is_sent and method not in self.IDEMPOTENT_METHODS):
+                raise ContainerRuntimeError(e)
+
+            # The daemon may have closed an idle connection, so we try once more with a new one
+            conn = UnixHTTPConnection(self.socket_path)
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                raise ContainerRuntimeError(e)
+        return conn, response
+
+    @staticmethod
+    def _error_message(status, data):
+        try:
+            return json.loads(data.decode('utf-8')).get('message')
+        except ValueError:
+            return '{} {}'.format(status, data.decode('utf-8', 'replace'))
+
+    def _call(self, method, path, params=None, body=None):
+        """
+        Send a request and return the decoded JSON response.
+        """
+        conn, response = self._open(method, path, params=params, body=body)
+        data = response.read()
+        self._release_connection(conn, response)
+
+        if response.status >= 400:
+            raise ContainerRuntimeError(self._error_message(response.status, data), status=response.status)
+        return json.loads(data.decode('utf-8')) if data else None
+
+    def _stream(self, method, path, params=None, headers=None):
+        """
+        Send a request and return the connection and the response to be consumed incrementally.
+        """
+        conn, response = self._open(method, path, params=params, headers=headers)
+        if response.status >= 400:
+            data = response.read()
+            self._release_connection(conn, response)
+            raise ContainerRuntimeError(self._error_message(response.status, data))
+        return conn, response
+
+    def ping(self):
+        try:
+            conn, response = self._open('GET', '/_ping')
+            response.read()
+            self._release_connection(conn, response)
+        except ContainerRuntimeError:
+            return False
+        return response.status == 200
+
+    def pull(self, registry_path, on_line=None):
+        auth = _registry_auth(registry_path, self.config_path)
+        if auth is None:
+            return DockerCLIRuntime().pull(registry_path, on_line=on_line)
+
+        name, tag = _split_registry_path(registry_path)
+        params = {'fromImage': name}
+        if tag:
+            params['tag'] = tag
+
+        output, error = [], []
+        try:
+            conn, response = self._stream('POST', '/images/create', params=params,
+                                          headers={'X-Registry-Auth': auth} if auth else None)
+        except ContainerRuntimeError as e:
+            return b'', str(e).encode('utf-8')
+
+        # The progress is sent as a stream of JSON documents, one per line
+        for line in response:
+            line = line.strip()
+            if not line:
+                continue
+            message = json.loads(line.decode('utf-8'))
+            if message.get('error'):
+                error.append(message['error'].encode('utf-8') + b'\n')
+                continue
+
+            text = message.get('status', '')
+            if message.get('id'):
+                text = '{}: {}'.format(message['id'], text)
+            if message.get('progress'):
+                text = '{} {}'.format(text, message['progress'])
+            output.append(text.encode('utf-8') + b'\n')
+            if on_line:
+                on_line(text)
+        self._release_connection(conn, response)
+
+        return b''.join(output), b''.join(error)
+
+    def remove_image(self, registry_path):
+        try:
+            deleted = self._call('DELETE', '/images/{}'.format(quote(registry_path, safe='')), params={'force': 1})
+        except ContainerRuntimeError as e:
+            return b'', 'Error: {}\n'.format(e).encode('utf-8')
+
+        output = []
+        for item in deleted or []:
+            for key, value in item.items():
+                output.append('{}: {}\n'.format(key, value).encode('utf-8'))
+        return b''.join(output), b''
+
+    def inspect_image(self, registry_path):
+        try:
+            return self._call('GET', '/images/{}/json'.format(quote(registry_path, safe='')))
+        except ContainerRuntimeError:
+            return None
+
+    def create_container(self, name, image, env=None, cpus=None, memory=None, gpu=False, entrypoint=None,
+                         cpuset_cpus=None, cpuset_mems=None):
+        host_config = {}
+        if gpu:
+            host_config['Runtime'] = 'nvidia'
+        if cpus:
+            host_config['NanoCpus'] = int(cpus * 10 ** 9)
+        if memory:
+            host_config['Memory'] = int(memory * 1024 * 1024)
+        if cpuset_cpus:
+            host_config['CpusetCpus'] = cpuset_cpus
+        if cpuset_mems:
+            host_config['CpusetMems'] = cpuset_mems
+
+        body = {
+            'Image': image,
+            'Env': ['{}={}'.format(key, value) for key, value in (env or {}).items()],
+            'HostConfig': host_config
+        }
+        if entrypoint:
+            body['Entrypoint'] = entrypoint
+
+        try:
+            container = self._call('POST', '/containers/create', params={'name': name}, body=body)
+        except ContainerRuntimeError as e:
+            # Unlike "docker run", the Engine doesn't pull missing images (e.g., removed from outside the CLI), so we
+            # pull it and try once more
+            if e.status != 404 or 'No such image' not in str(e):
+                raise
+            _, error = self.pull(image)
+            if error:
+                raise ContainerRuntimeError(error.decode('utf-8', 'replace'))
+            container = self._call('POST', '/containers/create', params={'name': name}, body=body)
+        return container['Id']
+
+    def update_container(self, container_id, cpuset_cpus=None, cpuset_mems=None):
+        body = {}
+        if cpuset_cpus:
+            body['CpusetCpus'] = cpuset_cpus
+        if cpuset_mems:
+            body['CpusetMems'] = cpuset_mems
+        if body:
+            self._call('POST', '/containers/{}/update'.format(container_id), body=body)
+
+    def start_container(self, container_id):
+        self._call('POST', '/containers/{}/start'.format(container_id))
+
+    def container_logs(self, container_id):
+        conn, response = self._stream('GET', '/containers/{}/logs'.format(container_id), params={
+            'follow': 1,
+            'stdout': 1,
+            'stderr': 1
+        })
+
+        for stream, chunk in self._iter_frames(response):
+            yield stream, chunk
+        self._release_connection(conn, response)
+
+    @staticmethod
+    def _iter_frames(response):
+        """
+        Without a TTY, the output is multiplexed in frames with an 8 bytes header: stream type and payload size.
+        """
+        while True:
+            header = response.read(8)
+            if len(header) < 8:
+                break
+            stream_type, size = struct.unpack('>BxxxL', header)
+            yield 'stderr' if stream_type == 2 else 'stdout', response.read(size)
+
+    def wait_container(self, container_id):
+        return self._call('POST', '/containers/{}/wait'.format(container_id)).get('StatusCode')
+
+    def remove_container(self, container_id):
+        self._call('DELETE', '/containers/{}'.format(container_id), params={'force': 1})
+
+    def exec_container(self, container_id, command, env=None, on_chunk=None):
+        exec_id = self._call('POST', '/containers/{}/exec'.format(container_id), body={
+            'Cmd': command,
+            'Env': ['{}={}'.format(key, value) for key, value in (env or {}).items()],
+            'AttachStdout': True,
+            'AttachStderr': True
+        })['Id']
+
+        conn, response = self._open('POST', '/exec/{}/start'.format(exec_id), body={'Detach': False, 'Tty': False})
+        if response.status >= 400:
+            data = response.read()
+            self._release_connection(conn, response)
+            raise ContainerRuntimeError(self._error_message(response.status, data))
+
+        output, error = _collect_chunks(self._iter_frames(response), on_chunk)
+        self._release_connection(conn, response)
+
+        exit_code = self._call('GET', '/exec/{}/json'.format(exec_id)).get('ExitCode')
+        return output, error, exit_code
+
+
+class DockerCLIRuntime(ContainerRuntime):
+    """
+    Talk to Docker by executing the "docker" command line tool.
+    """
+
+    @staticmethod
+    def _execute(args):
+        p = subprocess.Popen(['docker'] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = p.communicate()
+        return output, error, p.returncode
+
+    @staticmethod
+    def _container_args(name, image, env=None, cpus=None, memory=None, gpu=False, entrypoint=None, cpuset_cpus=None,
+                        cpuset_mems=None):
+        args = ['--name', name]
+        if entrypoint:
+            args.append('--entrypoint={}'.format(entrypoint[0]))
+        if gpu:
+            args.append('--runtime=nvidia')
+        if cpus:
+            args.append('--cpus={}'.format(cpus))
+        if memory:
+            args.append('--memory={}m'.format(memory))
+        if cpuset_cpus:
+            args.append('--cpuset-cpus={}'.format(cpuset_cpus))
+        if cpuset_mems:
+            args.append('--cpuset-mems={}'.format(cpuset_mems))
+        for key, value in (env or {}).items():
+            args.extend(['-e', '{}={}'.format(key, value)])
+        return args + [image] + (entrypoint[1:] if entrypoint else [])
+
+    def ping(self):
+        output, error, _ = self._execute(['ps'])
+        return not error
+
+    def pull(self, registry_path, on_line=None):
+        if not on_line:
+            output, error, _ = self._execute(['pull', registry_path])
+            return output, error
+
+        # Both pipes are read at the same time, so a chatty stderr can't block the process while we wait for stdout
+        p = subprocess.Popen(['docker', 'pull', registry_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error, partial_line = [], [], b''
+        for stream_name, chunk in self._iter_output(p):
+            if stream_name == 'stderr':
+                error.append(chunk)
+                continue
+            output.append(chunk)
+            lines = (partial_line + chunk).split(b'\n')
+            partial_line = lines.pop()
+            for line in lines:
+                on_line(line.rstrip().decode('utf-8', 'replace'))
+        if partial_line:
+            on_line(partial_line.rstrip().decode('utf-8', 'replace'))
+        return b''.join(output), b''.join(error)
+
+    def remove_image(self, registry_path):
+        output, error, _ = self._execute(['rmi', '-f', registry_path])
+        return output, error
+
+    def inspect_image(self, registry_path):
+        output, error, returncode = self._execute(['image', 'inspect', registry_path])
+        if returncode != 0:
+            return None
+        return json.loads(output.decode('utf-8'))[0]
+
+    def create_container(self, name, image, env=None, cpus=None, memory=None, gpu=False, entrypoint=None,
+                         cpuset_cpus=None, cpuset_mems=None):
+        output, error, returncode = self._execute(['create'] + self._container_args(
+            name, image, env=env, cpus=cpus, memory=memory, gpu=gpu, entrypoint=entrypoint, cpuset_cpus=cpuset_cpus,
+            cpuset_mems=cpuset_mems))
+        if returncode != 0:
+            raise ContainerRuntimeError(error.decode('utf-8', 'replace'))
+        return output.strip().decode('utf-8')
+
+    def update_container(self, container_id, cpuset_cpus=None, cpuset_mems=None):
+        args = ['update']
+        if cpuset_cpus:
+            args.append('--cpuset-cpus={}'.format(cpuset_cpus))
+        if cpuset_mems:
+            args.append('--cpuset-mems={}'.format(cpuset_mems))
+        if len(args) == 1:
+            return
+        output, error, returncode = self._execute(args + [container_id])
+        if returncode != 0:
+            raise ContainerRuntimeError(error.decode('utf-8', 'replace'))
+
+    def start_container(self, container_id):
+        output, error, returncode = self._execute(['start', container_id])
+        if returncode != 0:
+            raise ContainerRuntimeError(error.decode('utf-8', 'replace'))
+
+    @staticmethod
+    def _execute_streaming(args, on_chunk):
+        p = subprocess.Popen(['docker'] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = _collect_chunks(DockerCLIRuntime._iter_output(p), on_chunk)
+        return output, error, p.returncode
+
+    @staticmethod
+    def _iter_output(p):
+        """
+        Yields the chunks of stdout and stderr of a process as they arrive, until it exits.
+
+        The queue is bounded, so the process is slowed down instead of buffering its output when we can't keep up.
+        """
+        chunks = queue.Queue(maxsize=64)
+
+        def _read(stream_name, pipe):
+            for chunk in iter(lambda: pipe.read1(65536), b''):
+                chunks.put((stream_name, chunk))
+            chunks.put((stream_name, None))
+
+        readers = [threading.Thread(target=_read, args=('stdout', p.stdout)),
+                   threading.Thread(target=_read, args=('stderr', p.stderr))]
+        for reader in readers:
+            reader.daemon = True
+            reader.start()
+
+        num_open = len(readers)
+        while num_open:
+            stream_name, chunk = chunks.get()
+            if chunk is None:
+                num_open -= 1
+            else:
+                yield stream_name, chunk
+        p.wait()
+
+    def container_logs(self, container_id):
+        p = subprocess.Popen(['docker', 'logs', '-f', container_id], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for stream_name, chunk in self._iter_output(p):
+            yield stream_name, chunk
+
+    def wait_container(self, container_id):
+        output, error, returncode = self._execute(['wait', container_id])
+        if returncode != 0:
+            raise ContainerRuntimeError(error.decode('utf-8', 'replace'))
+        return int(output.strip())
+
+    def remove_container(self, container_id):
+        self._execute(['rm', '-f', container_id])
+
+    def exec_container(self, container_id, command, env=None, on_chunk=None):
+        args = ['exec']
+        for key, value in (env or {}).items():
+            args.extend(['-e', '{}={}'.format(key, value)])
+        if on_chunk:
+            return self._execute_streaming(args + [container_id] + command, on_chunk)
+        return self._execute(args + [container_id] + command)
+
+    def run(self, name, image, env=None, cpus=None, memory=None, gpu=False, on_chunk=None, cpuset_cpus=None,
+            cpuset_mems=None):
+        args = ['run', '--rm'] + self._container_args(name, image, env=env, cpus=cpus, memory=memory, gpu=gpu,
+                                                      cpuset_cpus=cpuset_cpus, cpuset_mems=cpuset_mems)
+        if on_chunk:
+            return self._execute_streaming(args, on_chunk)
+        return self._execute(args)
+
+
+CONTAINER_RUNTIMES = {
+    'engine': DockerEngineRuntime,
+    'cli': DockerCLIRuntime
+}
+
+
+def _get_container_runtime(name=SHAREDCLOUD_CLI_CONTAINER_RUNTIME):
+    """
+    Build the container runtime registered under "name".
+
+    With "auto", the Docker Engine API is used when its unix socket is available, and the "docker" CLI otherwise.
+
+    :param name: name of the runtime (e.g., auto, engine, cli)
+    """
+    if name == 'auto':
+        name = 'engine' if DOCKER_SOCKET_PATH and os.path.exists(DOCKER_SOCKET_PATH) else 'cli'
+    return CONTAINER_RUNTIMES[name]()
@@ -0,0 +1,188 @@
+import collections
+import heapq
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+from sharedcloud_cli.constants import JOB_DEFAULT_CPUS
+
+
+class JobScheduler(object):
+    """
+    Run jobs in a bounded pool of slots, each one in its own process.
+
+    A slot is refilled as soon as the job running on it finishes, so a slow job never blocks the rest. The deadlines
+    of all the running jobs are tracked in a single heap, so timeouts are detected without joining the processes
+    one by one.
+
+    With an admission controller, a job also waits until the resources that it requests are free. Waiting jobs are
+    started in order, skipping the ones that don't fit yet, so the resources left by a big job are used by the
+    smaller ones behind it. With a cpu placement, a job also waits until it can be pinned to its own cpus, and with a
+    gpu allocator, until its GPUs are free.
+    """
+
+    def __init__(self, max_slots, job_timeout, on_timeout=None, on_finish=None, admission=None, placement=None,
+                 gpus=None):
+        """
+        :param max_slots: max number of jobs running at the same time
+        :param job_timeout: seconds after which a running job is terminated
+        :param on_timeout: function called with the job uuid when a job times out (Default value = None)
+        :param on_finish: function called with the job uuid and exit code when a job finishes (Default value = None)
+        :param admission: admission controller of the resources of the host. None means only slots are counted
+        (Default value = None)
+        :param placement: cpu placement where jobs are pinned. None means jobs aren't pinned (Default value = None)
+        :param gpus: allocator of the GPUs of the host. Each job is then expected to request GPUs. None means GPUs
+        aren't allocated (Default value = None)
+        """
+        self.max_slots = max(1, max_slots)
+        self.job_timeout = job_timeout
+        self.on_timeout = on_timeout
+        self.on_finish = on_finish
+        self.admission = admission
+        self.placement = placement
+        self.gpus = gpus
+        self.pending = collections.deque()
+        self.running = {}
+        self.deadlines = []
+
+    @property
+    def free_slots(self):
+        """
+        Number of slots that can take a new job right now, given the resources that are free.
+        """
+        free_slots = max(0, self.max_slots - len(self.running) - len(self.pending))
+        if self.admission:
+            free_slots = min(free_slots, self.admission.num_fitting(reserved=[
+                resources or self.admission.default_request for _, _, _, resources in self.pending]))
+        if self.gpus:
+            free_slots = min(free_slots, max(0, self.gpus.num_free - sum(
+                (resources or {}).get('gpus', 1) for _, _, _, resources in self.pending)))
+        return free_slots
+
+    @property
+    def is_idle(self):
+        return not self.running and not self.pending
+
+    def is_scheduled(self, job_uuid):
+        """
+        Whether a job is already running or waiting to run.
+
+        :param job_uuid: uuid of the job
+        """
+        return job_uuid in self.running or any(job[0] == job_uuid for job in self.pending)
+
+    def submit(self, job_uuid, target, args, resources=None):
+        """
+        Queue a job. It's started right away if there is a free slot, and its resources are free. Jobs that are
+        already running or waiting are ignored, so a job received twice doesn't run twice. Returns whether the job
+        was queued.
+
+        :param job_uuid: uuid of the job
+        :param target: function executed in the job process
+        :param args: tuple with the arguments for "target"
+        :param resources: resources requested by the job (see AdmissionController), and its number of "gpus". None
+        means the default ones. The cpus where the job is pinned ("cpuset_cpus" and "cpuset_mems") and its GPUs
+        ("gpu_devices") are added to it before the job starts (Default value = None)
+        """
+        if self.is_scheduled(job_uuid):
+            return False
+        self.pending.append((job_uuid, target, args, resources))
+        self._fill_slots()
+        return True
+
+    def _fill_slots(self):
+        waiting = collections.deque()
+        while self.pending and len(self.running) < self.max_slots:
+            job_uuid, target, args, resources = self.pending.popleft()
+            if not self._allocate(job_uuid, resources):
+                waiting.append((job_uuid, target, args, resources))
+                continue
+
+            process = multiprocessing.Process(target=target, name='_job_loop', args=args)
+            process.start()
+
+            deadline = time.time() + self.job_timeout
+            self.running[job_uuid] = (process, deadline)
+            heapq.heappush(self.deadlines, (deadline, job_uuid))
+        # The jobs that didn't fit keep their place in the queue
+        self.pending.extendleft(reversed(waiting))
+
+    def _allocate(self, job_uuid, resources):
+        """
+        Allocate the resources, cpus and GPUs of a job. Returns whether all of them were free. If they weren't, none
+        is kept.
+
+        :param job_uuid: uuid of the job
+        :param resources: resources requested by the job
+        """
+        resources = resources if resources is not None else {}
+        if self.admission and not self.admission.admit(job_uuid, resources or None):
+            return False
+
+        cpuset = self.placement.assign(job_uuid, resources.get('cpus', JOB_DEFAULT_CPUS)) if self.placement else {}
+        num_gpus = resources.get('gpus', 1) if self.gpus and cpuset is not None else 0
+        gpu_devices = self.gpus.assign(job_uuid, num_gpus) if num_gpus else ''
+        if cpuset is None or gpu_devices is None:
+            self._free(job_uuid)
+            return False
+
+        resources.update(cpuset)
+        if gpu_devices:
+            resources['gpu_devices'] = gpu_devices
+        return True
+
+    def _free(self, job_uuid):
+        for allocator in (self.admission, self.placement, self.gpus):
+            if allocator:
+                allocator.release(job_uuid)
+
+    def _release(self, job_uuid):
+        process, _ = self.running.pop(job_uuid)
+        process.join()
+        self._free(job_uuid)
+        return process
+
+    def reap(self):
+        """
+        Collect the finished and timed out jobs, and refill their slots.
+        """
+        for job_uuid, (process, _) in list(self.running.items()):
+            if not process.is_alive():
+                self._release(job_uuid)
+                if self.on_finish:
+                    self.on_finish(job_uuid, process.exitcode)
+
+        now = time.time()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, job_uuid = heapq.heappop(self.deadlines)
+            # Finished jobs leave their deadline behind, so we skip them
+            if job_uuid not in self.running or self.running[job_uuid][1] != deadline:
+                continue
+
+            process = self.running[job_uuid][0]
+            if self.on_timeout:
+                self.on_timeout(job_uuid)
+            process.terminate()
+            self._release(job_uuid)
+            if self.on_finish:
+                self.on_finish(job_uuid, process.exitcode)
+
+        self._fill_slots()
+
+    def wait(self, timeout=None):
+        """
+        Block until a job finishes, a deadline expires or "timeout" seconds have passed.
+
+        :param timeout: max seconds to wait. None means until something happens (Default value = None)
+        """
+        if self.deadlines:
+            until_deadline = max(0, self.deadlines[0][0] - time.time())
+            timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+
+        sentinels = [process.sentinel for process, _ in self.running.values()]
+        if sentinels:
+            wait(sentinels, timeout)
+        elif timeout:
+            time.sleep(timeout)
+
+        self.reap()
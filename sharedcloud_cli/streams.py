@@ -0,0 +1,437 @@
+import codecs
+import json
+import re
+import time
+
+import click
+
+from sharedcloud_cli.constants import FIELD_CHUNK_SIZE, FOLLOW_POLL_INTERVAL, FINISHED_JOB_STATUSES
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRING_CONTENT = re.compile(r'[^"\\]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\]*)*')
+_HIGH_SURROGATE = re.compile(r'(?P<backslashes>\\+)u[dD][89abAB][0-9a-fA-F]{2}$')
+_RAW_SPECIAL = re.compile(r'["{}\[\],]')
+_WHITESPACE = ' \t\n\r'
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-\d+/')
+
+
+class JSONFieldParser(object):
+    """
+    Extract a top-level field of a JSON object while the object arrives, chunk by chunk.
+
+    String values are passed to "on_text" piece by piece as soon as they are decoded, so the field is never held in
+    memory. Other values (numbers, null, objects...) are small, so they are parsed at once and left in "value".
+    The rest of fields are skipped without keeping them.
+    """
+
+    def __init__(self, field_name, on_text):
+        """
+        :param field_name: name of the field
+        :param on_text: function called with each decoded piece of the field, if it's a string
+        """
+        self.field_name = field_name
+        self.on_text = on_text
+        self.value = None
+        self.done = False
+        self._buf = ''
+        self._pos = 0
+        self._state = 'start'
+        self._key = []
+        self._raw = []
+        self._raw_is_target = False
+        self._raw_in_string = False
+        self._depth = 0
+
+    def _skip_whitespace(self):
+        while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+            self._pos += 1
+        return self._pos < len(self._buf)
+
+    def _scan_string(self, emit):
+        """
+        Decode a string from the current position until its closing quote. Returns False if more data is needed.
+
+        The complete part of the string in the buffer is decoded by "json" at once, so escape sequences are cheap.
+
+        :param emit: function called with each decoded piece
+        """
+        buf = self._buf
+        match = _STRING_CONTENT.match(buf, self._pos)
+        end = match.end()
+        if buf[end:end + 1] != '"':
+            # A surrogate pair could be split between this chunk and the next one
+            pending = _HIGH_SURROGATE.search(buf, self._pos, end)
+            if pending and (pending.end('backslashes') - pending.start('backslashes')) % 2:
+                end = pending.start('backslashes') + len(pending.group('backslashes')) - 1
+
+        if end > self._pos:
+            emit(json.loads('"{}"'.format(buf[self._pos:end]), strict=False))
+        self._pos = end
+        if buf[end:end + 1] == '"':
+            self._pos += 1
+            return True
+        return False
+
+    def _scan_raw(self):
+        """
+        Skip (or collect, if it's the field) a value that isn't a string. Returns False if more data is needed.
+        """
+        buf = self._buf
+        start = self._pos
+        while True:
+            if self._raw_in_string:
+                match = _STRING_SPECIAL.search(buf, self._pos)
+                if match and match.group() == '\\':
+                    if match.end() >= len(buf):
+                        self._pos = match.start()
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                if match:
+                    self._raw_in_string = False
+                    self._pos = match.end()
+                    continue
+            else:
+                match = _RAW_SPECIAL.search(buf, self._pos)
+                if match:
+                    char = match.group()
+                    self._pos = match.end()
+                    if char == '"':
+                        self._raw_in_string = True
+                    elif char in '{[':
+                        self._depth += 1
+                    elif self._depth and char in '}]':
+                        self._depth -= 1
+                    elif not self._depth:
+                        # The "," or "}" that ends the value belongs to the object
+                        self._pos = match.start()
+                        if self._raw_is_target:
+                            self._raw.append(buf[start:self._pos])
+                        return True
+                    continue
+            self._pos = len(buf)
+            break
+
+        if self._raw_is_target:
+            self._raw.append(buf[start:self._pos])
+        return False
+
+    def feed(self, text):
+        """
+        Parse the next chunk of the object.
+
+        :param text: decoded chunk
+        """
+        if self.done:
+            return
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+        while not self.done:
+            state = self._state
+            if state in ('start', 'key', 'colon', 'value') and not self._skip_whitespace():
+                return
+
+            char = self._buf[self._pos] if self._pos < len(self._buf) else None
+            if state == 'start':
+                if char != '{':
+                    raise ValueError('The response is not a JSON object')
+                self._pos += 1
+                self._state = 'key'
+            elif state == 'key':
+                self._pos += 1
+                if char == '}':
+                    self.done = True
+                elif char == '"':
+                    self._key = []
+                    self._state = 'in_key'
+            elif state == 'in_key':
+                if not self._scan_string(self._key.append):
+                    return
+                self._state = 'colon'
+            elif state == 'colon':
+                self._pos += 1
+                self._state = 'value'
+            elif state == 'value':
+                is_target = ''.join(self._key) == self.field_name
+                if char == '"':
+                    self._pos += 1
+                    self._state = 'target' if is_target else 'skip'
+                else:
+                    self._raw, self._raw_is_target, self._raw_in_string, self._depth = [], is_target, False, 0
+                    self._state = 'raw'
+            elif state == 'target':
+                if not self._scan_string(self.on_text):
+                    return
+                self.done = True
+            elif state == 'skip':
+                if not self._scan_string(lambda piece: None):
+                    return
+                self._state = 'key'
+            elif state == 'raw':
+                if not self._scan_raw():
+                    return
+                if self._raw_is_target:
+                    self.value = json.loads(''.join(self._raw))
+                    self.done = True
+                self._state = 'key'
+
+
+class FieldWriter(object):
+    """
+    Write a field to a binary stream as it arrives, keeping only its first ("head") or last ("tail") bytes.
+
+    With "tail", only the last bytes are kept in memory until the field is complete.
+    """
+
+    def __init__(self, out, head=None, tail=None):
+        """
+        :param out: binary stream
+        :param head: number of bytes written from the beginning of the field (Default value = None)
+        :param tail: number of bytes written from the end of the field (Default value = None)
+        """
+        self.out = out
+        self.remaining = head
+        self.tail = tail
+        self._tail = bytearray()
+
+    @property
+    def is_full(self):
+        return self.remaining is not None and self.remaining <= 0
+
+    def write(self, chunk):
+        if self.tail is not None:
+            self._tail += chunk
+            del self._tail[:-self.tail]
+            return
+        if self.remaining is not None:
+            chunk = chunk[:self.remaining]
+            self.remaining -= len(chunk)
+        self.out.write(chunk)
+        self.out.flush()
+
+    def close(self):
+        if self.tail is not None:
+            self.out.write(bytes(self._tail))
+        self.out.write(b'\n')
+        self.out.flush()
+
+
+def _range_header(head=None, tail=None):
+    """
+    Range header asking for the first ("head") or last ("tail") bytes.
+
+    :param head: number of bytes from the beginning (Default value = None)
+    :param tail: number of bytes from the end (Default value = None)
+    """
+    if head is not None:
+        return {'Range': 'bytes=0-{}'.format(head - 1)}
+    if tail is not None:
+        return {'Range': 'bytes=-{}'.format(tail)}
+    return {}
+
+
+def _iter_json_field(r, field_name, chunk_size=FIELD_CHUNK_SIZE):
+    """
+    Yields the bytes of a field of the JSON object sent in a response, as they arrive. The response is read until
+    the field is complete.
+
+    :param r: streamed response
+    :param field_name: name of the field
+    :param chunk_size: bytes read at a time (Default value = FIELD_CHUNK_SIZE)
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    pieces = []
+    parser = JSONFieldParser(field_name, lambda piece: pieces.append(piece.encode('utf-8', 'replace')))
+
+    for chunk in r.iter_content(chunk_size):
+        parser.feed(decoder.decode(chunk))
+        for piece in pieces:
+            yield piece
+        del pieces[:]
+        if parser.done:
+            break
+    if parser.value is not None:
+        yield str(parser.value).encode('utf-8')
+
+
+def _iter_field(r, field_name, chunk_size=FIELD_CHUNK_SIZE):
+    """
+    Yields the bytes of a field sent by its own endpoint, either as the raw body of the response or inside a JSON
+    object.
+
+    :param r: streamed response
+    :param field_name: name of the field
+    :param chunk_size: bytes read at a time (Default value = FIELD_CHUNK_SIZE)
+    """
+    if r.headers.get('Content-Type', '').startswith('application/json'):
+        return _iter_json_field(r, field_name, chunk_size)
+    return r.iter_content(chunk_size)
+
+
+def _stream_json_field(r, field_name, writer, chunk_size=FIELD_CHUNK_SIZE):
+    """
+    Write a field of the JSON object sent in a response, without reading more of the response than needed.
+
+    :param r: streamed response
+    :param field_name: name of the field
+    :param writer: FieldWriter
+    :param chunk_size: bytes read at a time (Default value = FIELD_CHUNK_SIZE)
+    """
+    for piece in _iter_json_field(r, field_name, chunk_size):
+        writer.write(piece)
+        if writer.is_full:
+            break
+
+
+def _stream_raw_field(r, writer, chunk_size=FIELD_CHUNK_SIZE):
+    """
+    Write a field sent as the raw body of a response.
+
+    :param r: streamed response
+    :param writer: FieldWriter
+    :param chunk_size: bytes read at a time (Default value = FIELD_CHUNK_SIZE)
+    """
+    for chunk in r.iter_content(chunk_size):
+        writer.write(chunk)
+        if writer.is_full:
+            break
+
+
+def _stream_field_value(url, client, field_name, head=None, tail=None, out=None):
+    """
+    Print an attribute of a resource while it's being downloaded.
+
+    The attribute is asked to its own endpoint (e.g., "/jobs/<uuid>/stdout/") with a Range header, so only the
+    bytes needed are sent. If the Backend doesn't have that endpoint, the whole resource is streamed and the
+    attribute is extracted from it as it arrives.
+
+    :param url: url of the resource
+    :param client: http client
+    :param field_name: field to be printed
+    :param head: only print the first bytes of the field (Default value = None)
+    :param tail: only print the last bytes of the field (Default value = None)
+    :param out: binary stream where the field is written (Default value = stdout)
+    """
+    out = out or click.get_binary_stream('stdout')
+
+    r = client.get('{}{}/'.format(url, field_name), headers=_range_header(head, tail), stream=True)
+    try:
+        if r.status_code == 416:  # The field is empty, so no range can be satisfied
+            FieldWriter(out).close()
+            return r
+        if r.status_code in (200, 206):
+            # Ranges that were honored don't need to be cut again
+            writer = FieldWriter(out, head=None if r.status_code == 206 else head,
+                                 tail=None if r.status_code == 206 else tail)
+            if r.headers.get('Content-Type', '').startswith('application/json'):
+                _stream_json_field(r, field_name, writer)
+            else:
+                _stream_raw_field(r, writer)
+            writer.close()
+            return r
+    finally:
+        r.close()
+
+    r = client.get(url, stream=True)
+    try:
+        if r.status_code == 200:
+            writer = FieldWriter(out, head=head, tail=tail)
+            _stream_json_field(r, field_name, writer)
+            writer.close()
+        elif r.status_code == 404:
+            click.echo('Not found resource with this UUID')
+            exit(1)
+        else:
+            click.echo(r.content)
+            exit(1)
+    finally:
+        r.close()
+    return r
+
+
+def _is_job_finished(url, client):
+    """
+    Returns True if a job has finished, or doesn't exist. The job is only read until its status arrives.
+
+    :param url: url of the job
+    :param client: http client
+    """
+    r = client.get(url, stream=True)
+    try:
+        if r.status_code != 200:
+            return True
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        parser = JSONFieldParser('status', lambda piece: None)
+        for chunk in r.iter_content(FIELD_CHUNK_SIZE):
+            parser.feed(decoder.decode(chunk))
+            if parser.done:
+                break
+        return parser.value in FINISHED_JOB_STATUSES
+    finally:
+        r.close()
+
+
+def _follow_field_value(url, client, field_name, tail=None, interval=FOLLOW_POLL_INTERVAL, out=None):
+    """
+    Print an attribute of a job, and keep printing the bytes appended to it until the job finishes.
+
+    Each poll asks for the bytes after the last offset received with a Range header, so every byte is downloaded
+    once and nothing is kept in memory. If the Backend doesn't have an endpoint for the attribute, it's printed
+    once the job finishes.
+
+    :param url: url of the job
+    :param client: http client
+    :param field_name: field to be printed
+    :param tail: start with the last bytes of the field (Default value = None)
+    :param interval: seconds between polls while there is no new output (Default value = FOLLOW_POLL_INTERVAL)
+    :param out: binary stream where the field is written (Default value = stdout)
+    """
+    out = out or click.get_binary_stream('stdout')
+
+    headers = _range_header(tail=tail)
+    offset = 0
+    is_finished = False
+    while True:
+        r = client.get('{}{}/'.format(url, field_name), headers=headers or {'Range': 'bytes={}-'.format(offset)},
+                       stream=True)
+        headers = None
+        received = 0
+        try:
+            if r.status_code not in (200, 206, 416):
+                break
+
+            skip = 0
+            if r.status_code == 206:
+                match = _CONTENT_RANGE.match(r.headers.get('Content-Range', ''))
+                offset = int(match.group(1)) if match else offset
+            elif r.status_code == 200:
+                # The range wasn't honored, so the field came whole and the bytes already printed are skipped
+                skip, offset = offset, 0
+
+            if r.status_code != 416:
+                # Offsets count the bytes of the field, even if it comes inside a JSON object
+                for chunk in _iter_field(r, field_name):
+                    offset += len(chunk)
+                    if skip:
+                        cut = min(skip, len(chunk))
+                        chunk, skip = chunk[cut:], skip - cut
+                    if chunk:
+                        out.write(chunk)
+                        out.flush()
+                        received += len(chunk)
+        finally:
+            r.close()
+
+        if received:
+            continue
+        if is_finished:
+            # The bytes appended right before the job finished have been printed too
+            return
+        is_finished = _is_job_finished(url, client)
+        if not is_finished:
+            time.sleep(interval)
+
+    while not _is_job_finished(url, client):
+        time.sleep(interval)
+    return _stream_field_value(url, client, field_name, tail=tail, out=out)
@@ -0,0 +1,269 @@
+import codecs
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+import zlib
+
+import click
+
+from sharedcloud_cli.constants import UPLOAD_CHUNK_SIZE, SHAREDCLOUD_CLI_FUNCTION_CODE_INDEX_FILENAME
+from sharedcloud_cli.files import _FileLock, _atomic_write_json
+from sharedcloud_cli.mappers import _map_bytes_to_human_readable
+
+
+class CodeUpload(object):
+    """
+    Upload the code of a function from a file, streaming it as a gzip compressed JSON body.
+
+    The file is memory-mapped, so it's never copied in memory: it's read once to compute its SHA-256 (sent in the
+    "X-Content-SHA256" header, so the Backend can verify it) and once more while the body is compressed into a
+    temporary file, so its Content-Length is known before sending it. If the Backend doesn't accept compressed bodies,
+    the code is sent as a regular form field.
+    """
+
+    def __init__(self, path, field='code', chunk_size=UPLOAD_CHUNK_SIZE):
+        """
+        :param path: path to the file containing the code
+        :param field: name of the field where the code is sent (Default value = 'code')
+        :param chunk_size: bytes read from the file at a time (Default value = UPLOAD_CHUNK_SIZE)
+        """
+        self.path = path
+        self.field = field
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.compressed_size = 0
+        self._sha256 = None
+
+    def _map(self, f):
+        """
+        Memory-map a file. Empty files can't be mapped, so they are returned as empty bytes.
+
+        :param f: file opened in binary mode
+        """
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return b''
+
+    @property
+    def sha256(self):
+        """
+        SHA-256 of the code, computed once.
+        """
+        if self._sha256 is None:
+            with open(self.path, 'rb') as f:
+                content = self._map(f)
+                try:
+                    self._sha256 = hashlib.sha256(content).hexdigest()
+                finally:
+                    if isinstance(content, mmap.mmap):
+                        content.close()
+        return self._sha256
+
+    def _chunks(self, content):
+        for offset in range(0, len(content), self.chunk_size):
+            yield content[offset:offset + self.chunk_size]
+
+    def _body(self, content, data):
+        """
+        Yields the compressed JSON body, escaping the code chunk by chunk.
+
+        :param content: bytes (or mmap) with the code
+        :param data: dict with the rest of fields
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        decoder = codecs.getincrementaldecoder('utf-8')()
+
+        head = json.dumps(data)[:-1] + (', ' if data else '') + json.dumps(self.field) + ': "'
+        pieces = [head.encode('utf-8')]
+        for chunk in self._chunks(content):
+            pieces.append(json.dumps(decoder.decode(chunk))[1:-1].encode('utf-8'))
+            yield self._compress(compressor, pieces)
+            pieces = []
+        pieces.append((json.dumps(decoder.decode(b'', final=True))[1:-1] + '"}').encode('utf-8'))
+
+        compressed = self._compress(compressor, pieces)
+        tail = compressor.flush()
+        self.compressed_size += len(tail)
+        yield compressed + tail
+
+    def _compressed_body(self, content, data):
+        """
+        Returns a temporary file with the whole compressed JSON body. Backends that read the body up to its
+        Content-Length would see an empty one if it was sent chunked.
+
+        :param content: bytes (or mmap) with the code
+        :param data: dict with the rest of fields
+        """
+        body = tempfile.TemporaryFile()
+        for chunk in self._body(content, data):
+            body.write(chunk)
+        body.seek(0)
+        return body
+
+    def _compress(self, compressor, pieces):
+        compressed = compressor.compress(b''.join(pieces))
+        self.compressed_size += len(compressed)
+        return compressed
+
+    def send(self, client, method, url, data):
+        """
+        Send the code together with the rest of fields. Returns the response of the Backend.
+
+        :param client: http client
+        :param method: http method (e.g., POST, PATCH)
+        :param url: url of the resource
+        :param data: dict with the rest of fields
+        """
+        data = {key: str(value) for key, value in data.items() if value is not None}
+        started_at = time.time()
+
+        with open(self.path, 'rb') as f:
+            content = self._map(f)
+            try:
+                self.size = len(content)
+                if self._sha256 is None:
+                    self._sha256 = hashlib.sha256(content).hexdigest()
+                sha256 = self._sha256
+                self.compressed_size = 0
+
+                body = self._compressed_body(content, data)
+                try:
+                    r = client.request(method, url, data=body, headers={
+                        'Content-Type': 'application/json',
+                        'Content-Encoding': 'gzip',
+                        'Content-Length': str(self.compressed_size),
+                        'X-Content-SHA256': sha256
+                    })
+                finally:
+                    body.close()
+                if self._is_not_understood(r):
+                    # The Backend doesn't understand compressed bodies, so we fall back to a regular form
+                    fields = dict(data)
+                    fields[self.field] = bytes(content).decode('utf-8')
+                    self.compressed_size = self.size
+                    r = client.request(method, url, data=fields, headers={'X-Content-SHA256': sha256})
+            finally:
+                if isinstance(content, mmap.mmap):
+                    content.close()
+
+        self._echo_summary(time.time() - started_at)
+        return r
+
+    @staticmethod
+    def _is_not_understood(r):
+        """
+        Whether the Backend couldn't read the compressed body. Backends that try to parse the gzip as JSON answer
+        400 with a parse error instead of 415, while any other 400 is a validation error of the fields.
+
+        :param r: response to the compressed upload
+        """
+        if r.status_code == 415:
+            return True
+        return r.status_code == 400 and 'parse error' in (r.text or '').lower()
+
+    def _echo_summary(self, elapsed):
+        click.echo('[INFO] Uploaded {} ({} sent) in {:.2f}s ({}/s)'.format(
+            _map_bytes_to_human_readable(self.size, None, None),
+            _map_bytes_to_human_readable(self.compressed_size, None, None),
+            elapsed,
+            _map_bytes_to_human_readable(int(self.size / elapsed) if elapsed else self.size, None, None)), err=True)
+
+
+def _code_sha256(code=None, upload=None):
+    """
+    SHA-256 of the code of a function, given either as a string or as a file upload.
+
+    :param code: code of the function (Default value = None)
+    :param upload: CodeUpload with the file containing the code (Default value = None)
+    """
+    if upload:
+        return upload.sha256
+    if code is not None:
+        return hashlib.sha256(code.encode('utf-8')).hexdigest()
+    return None
+
+
+class FunctionCodeIndex(object):
+    """
+    Local index mapping each function UUID to the SHA-256 of the last code uploaded for it, together with its image
+    and name.
+
+    It lets "function update" skip uploads of code that hasn't changed, and "function create" detect functions that
+    already have the same code. Changes are made under a lock, so concurrent commands don't lose each other's entries.
+    """
+
+    def __init__(self, path=SHAREDCLOUD_CLI_FUNCTION_CODE_INDEX_FILENAME):
+        """
+        :param path: file where the index is stored (Default value = SHAREDCLOUD_CLI_FUNCTION_CODE_INDEX_FILENAME)
+        """
+        self.path = path
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                index = json.load(f)
+        except (IOError, ValueError):
+            return {}
+        # Older indexes only had the SHA-256 of each function
+        return {function_uuid: entry if isinstance(entry, dict) else {'sha256': entry}
+                for function_uuid, entry in index.items()}
+
+    def _lock(self):
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        return _FileLock(self.path + '.lock')
+
+    def get(self, function_uuid):
+        """
+        Returns the SHA-256 of the last code uploaded for a function, or None if it's unknown.
+
+        :param function_uuid: uuid of the function
+        """
+        return self._read().get(str(function_uuid), {}).get('sha256')
+
+    def find(self, sha256, image_uuid=None, name=None):
+        """
+        Returns the UUIDs of the functions whose last uploaded code has this SHA-256.
+
+        :param sha256: SHA-256 of the code
+        :param image_uuid: only the functions with this image. None means any image (Default value = None)
+        :param name: only the functions with this name. None means any name (Default value = None)
+        """
+        return [function_uuid for function_uuid, entry in self._read().items()
+                if entry.get('sha256') == sha256 and
+                (image_uuid is None or entry.get('image') == str(image_uuid)) and
+                (name is None or entry.get('name') == name)]
+
+    def set(self, function_uuid, sha256=None, image_uuid=None, name=None):
+        """
+        Remember the SHA-256 of the code just uploaded for a function, and its image and name. The values that
+        aren't given are kept.
+
+        :param function_uuid: uuid of the function
+        :param sha256: SHA-256 of the code (Default value = None)
+        :param image_uuid: uuid of the image of the function (Default value = None)
+        :param name: name of the function (Default value = None)
+        """
+        with self._lock():
+            index = self._read()
+            entry = index.setdefault(str(function_uuid), {})
+            for key, value in (('sha256', sha256), ('image', image_uuid), ('name', name)):
+                if value is not None:
+                    entry[key] = str(value)
+            _atomic_write_json(self.path, index)
+
+    def remove(self, function_uuid):
+        """
+        Forget a function, e.g., after deleting it.
+
+        :param function_uuid: uuid of the function
+        """
+        with self._lock():
+            index = self._read()
+            if index.pop(str(function_uuid), None) is not None:
+                _atomic_write_json(self.path, index)
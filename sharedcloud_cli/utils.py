@@ -1,12 +1,12 @@
+import collections
 import os
-import subprocess
+import time
 
 import click
-import requests
-from tabulate import tabulate
 
 from sharedcloud_cli.constants import SHAREDCLOUD_CLI_CLIENT_CONFIG_FILENAME, SHAREDCLOUD_CLI_INSTANCE_CONFIG_FILENAME, \
-    __VERSION__, SHAREDCLOUD_CLI_URL
+    __VERSION__, SHAREDCLOUD_CLI_URL, IMAGE_CATALOG_CACHE_TTL
+from sharedcloud_cli.formatters import _StreamingTable, RAW_WRITERS, _project_columns
 
 
 def _read_user_token():
@@ -61,21 +61,22 @@ def _get_instance_token_or_exit_if_there_is_none():
 
 
 # Generic methods
-def _create_resource(url, token, data):
+def _create_resource(url, client, data, auth=True, upload=None):
     """
     Create a resource using a POST request.
 
     This function is generic and was designed to unify all the POST requests to the Backend.
 
     :param url: url to create the resource
-    :param token: user token
+    :param client: http client
     :param data: dict with data containing all the resource's attributes
+    :param auth: whether the request is sent on behalf of the user (Default value = True)
+    :param upload: file streamed together with the data, e.g., a CodeUpload (Default value = None)
     """
-    if token:
-        r = requests.post(url, data=data,
-                          headers={'Authorization': 'Token {}'.format(token)})
+    if upload:
+        r = upload.send(client, 'POST', url, data)
     else:
-        r = requests.post(url, data=data)
+        r = client.post(url, data=data, auth=auth)
 
     if r.status_code == 201:
         click.echo(r.json().get('uuid'))
@@ -85,7 +86,90 @@ def _create_resource(url, token, data):
     return r
 
 
-def _list_resource(url, token, headers, keys, mappers=None):
+def _exit_if_response_failed(r):
+    """
+    Exit if the Backend didn't answer a GET request successfully.
+
+    :param r: response sent by the Backend
+    """
+    if r.status_code == 404:
+        click.echo('Not found resource with this UUID')
+        exit(1)
+    elif r.status_code != 200:
+        click.echo(r.content)
+        exit(1)
+
+
+# Filter of a list, applied by the Backend through the query "params", and by us on the "key" of each resource
+# with the "predicate" in case the Backend ignores (or rejects) them
+ResourceFilter = collections.namedtuple('ResourceFilter', ['key', 'params', 'predicate'])
+
+
+def _iter_pages(url, client, page_size=None, limit=None, all_pages=False, filters=None, params=None, cache_ttl=None):
+    """
+    Fetch a list of resources page by page, yielding the resources of each page as soon as it arrives.
+
+    Both paginated responses (a dict with "results" and "next") and plain lists are supported. Unless "all_pages"
+    or "limit" are provided, only the first page is fetched.
+
+    :param url: url to fetch the data
+    :param client: http client
+    :param page_size: number of resources asked per page (Default value = None)
+    :param limit: max number of resources to fetch (Default value = None)
+    :param all_pages: flag to fetch all the pages (Default value = False)
+    :param filters: list of ResourceFilter that the resources need to pass (Default value = None)
+    :param params: extra query params, e.g., the ordering (Default value = None)
+    :param cache_ttl: seconds during which the pages can be served from the response cache (Default value = None)
+    """
+    def _get(page_url, query):
+        if cache_ttl:
+            return client.get_cached(page_url, cache_ttl, params=query or None)
+        return client.get(page_url, params=query or None)
+
+    filters = filters or []
+    query = dict(params or {})
+    for resource_filter in filters:
+        query.update(resource_filter.params)
+    if page_size:
+        query['page_size'] = page_size
+    remaining = limit
+
+    while url:
+        r = _get(url, query)
+        if r.status_code == 400 and (filters or params):
+            click.echo('[WARNING] The filters were rejected by the server, so they are applied locally', err=True)
+            query = {'page_size': page_size} if page_size else {}
+            params = None
+            r = _get(url, query)
+        _exit_if_response_failed(r)
+
+        data = r.json()
+        if isinstance(data, dict):
+            resources, url = data.get('results') or [], data.get('next')
+        else:
+            resources, url = data, None
+        query = None  # The "next" url already contains the query
+
+        # Filters that the server already applied keep every resource, so this is cheap
+        if filters:
+            resources = [resource for resource in resources
+                         if all(f.predicate(resource.get(f.key), resource) for f in filters)]
+
+        if remaining is not None:
+            resources = resources[:remaining]
+            remaining -= len(resources)
+        yield resources
+
+        if remaining is not None and remaining <= 0:
+            break
+        if remaining is None and not all_pages:
+            if url:
+                click.echo('[INFO] There are more results. Use "--all" or "--limit" to see them', err=True)
+            break
+
+
+def _list_resource(url, client, headers, keys, mappers=None, pagination=None, output='table', columns=None,
+                   filters=None, params=None, cache_ttl=None):
     """
     List resources using a GET request.
 
@@ -93,33 +177,72 @@ def _list_resource(url, token, headers, keys, mappers=None):
     Additionally, this function displays the returned values using the "tabulate" library.
     We use "mappers" to change the values that we display to the users.
 
+    If "pagination" is provided, the resources are fetched page by page and each page is displayed as soon as it
+    arrives, so only one page is kept in memory.
+
+    Other outputs than "table" (json, ndjson or csv) print the raw values sent by the Backend, without mappers.
+
+    The "filters" are sent to the Backend as query params, and applied again to each page as it arrives, so they work
+    even if the Backend doesn't support them.
+
+    Listings that rarely change (e.g., the GPU catalog) can opt in to the local response cache with a "cache_ttl".
+
     :param url: url to fetch the data
-    :param token: user token
+    :param client: http client
     :param headers: titles that will be displayed once the data is shown to the user
     :param keys: attributes names from the response sent by the Backend
     :param mappers: list of functions that will transform the data that the user sees (Default value = None)
+    :param pagination: dict with the "limit", "page_size", "all_pages" and "column_widths" (Default value = None)
+    :param output: format of the output. It can be "table", "json", "ndjson" or "csv" (Default value = 'table')
+    :param columns: list of columns displayed, by header or key. None means all of them (Default value = None)
+    :param filters: list of ResourceFilter that the resources need to pass (Default value = None)
+    :param params: extra query params, e.g., the ordering (Default value = None)
+    :param cache_ttl: seconds during which the response can be served from the local cache (Default value = None)
     """
+    # Imported here, as the CLI imports this module on every start, even for commands that don't list anything
+    from tabulate import tabulate
+    from sharedcloud_cli.mappers import _map_rows
+
+    mappers = mappers or {}
+    headers, keys = _project_columns(headers, keys, columns)
+
+    if pagination:
+        pages = _iter_pages(url, client, page_size=pagination.get('page_size'), limit=pagination.get('limit'),
+                            all_pages=pagination.get('all_pages'), filters=filters, params=params,
+                            cache_ttl=cache_ttl)
+    else:
+        pages = _iter_pages(url, client, all_pages=True, filters=filters, params=params, cache_ttl=cache_ttl)
+
+    if output in RAW_WRITERS:
+        writer = RAW_WRITERS[output](keys)
+        for resources in pages:
+            writer.write(resources)
+        writer.close()
+        return
 
-    def _get_data(resource, key, token):
-        """
-        Iterate over the data a transform the values using the mappers.
+    if pagination:
+        table = _StreamingTable(headers, widths=pagination.get('column_widths'))
+        for resources in pages:
+            table.write(_map_rows(resources, keys, mappers, client.token))
+        table.close()
+        return
 
-        :param resource: resource sent by the Backend
-        :param key: attribute that we want to map
-        :param token: user token
-        """
-        value = resource.get(key)
-        if key in mappers.keys():
-            return mappers[key](value, resource, token)
-        return value
+    click.echo(tabulate(
+        [row for resources in pages for row in _map_rows(resources, keys, mappers, client.token)],
+        headers=headers))
 
-    r = requests.get(url, headers={'Authorization': 'Token {}'.format(token)})
+
+def _get_resource(url, client):
+    """
+    Fetch a single resource using a GET request.
+
+    :param url: url to fetch the data
+    :param client: http client
+    """
+    r = client.get(url)
 
     if r.status_code == 200:
-        resources = r.json()
-        click.echo(tabulate(
-            [[_get_data(resource, key, token) for key in keys] for resource in resources],
-            headers=headers))
+        pass
     elif r.status_code == 404:
         click.echo('Not found resource with this UUID')
         exit(1)
@@ -129,44 +252,47 @@ def _list_resource(url, token, headers, keys, mappers=None):
     return r
 
 
-def _show_field_value(url, token, field_name):
+def _show_field_value(url, client, field_name, head=None, tail=None, follow=False):
     """
     Fetch a resource and extract an attribute from it.
 
-    This function also prints the field right away.
+    This function also prints the field right away, chunk by chunk as it arrives, so it's never held in memory.
     We use it to show attributes that are to too long to be displayed in a table.
 
     :param url: url to fetch the data
-    :param token: user token
+    :param client: http client
     :param field_name: field to be printed
+    :param head: only print the first bytes of the field (Default value = None)
+    :param tail: only print the last bytes of the field (Default value = None)
+    :param follow: keep printing the bytes appended to the field until the job finishes (Default value = False)
     """
-    r = requests.get(url, headers={'Authorization': 'Token {}'.format(token)})
+    from sharedcloud_cli.streams import _stream_field_value, _follow_field_value
 
-    if r.status_code == 200:
-        click.echo(r.json().get(field_name))
-    else:
-        click.echo(r.content)
-        exit(1)
-
-    return r
+    if follow:
+        return _follow_field_value(url, client, field_name, tail=tail)
+    return _stream_field_value(url, client, field_name, head=head, tail=tail)
 
 
-def _update_resource(url, token, data):
+def _update_resource(url, client, data, upload=None):
     """
     Update a resource using a PATCH request.
 
     This function is generic and was designed to unify all the PATCH requests to the Backend.
 
     :param url: url to update the resource
-    :param token: user token
+    :param client: http client
     :param data: dict with the updated data to be applied
+    :param upload: file streamed together with the data, e.g., a CodeUpload (Default value = None)
     """
     cleaned_data = {}
     for key, value in data.items():
         if value:
             cleaned_data[key] = value
 
-    r = requests.patch(url, data=cleaned_data, headers={'Authorization': 'Token {}'.format(token)})
+    if upload:
+        r = upload.send(client, 'PATCH', url, cleaned_data)
+    else:
+        r = client.patch(url, data=cleaned_data)
 
     if r.status_code == 200:
         click.echo(r.json().get('uuid'))
@@ -179,17 +305,17 @@ def _update_resource(url, token, data):
     return r
 
 
-def _delete_resource(url, token, data):
+def _delete_resource(url, client, data):
     """
     Delete a resource using a DELETE request.
 
     This function is generic and was designed to unify all the DELETE requests to the Backend.
 
     :param url: url to delete the resource
-    :param token: user token
+    :param client: http client
     :param data: dict containing the uuid required to identify the resource
     """
-    r = requests.delete(url, headers={'Authorization': 'Token {}'.format(token)})
+    r = client.delete(url)
 
     if r.status_code == 204:
         pass
@@ -202,16 +328,18 @@ def _delete_resource(url, token, data):
     return r
 
 
-def _get_jobs(instance_uuid, token):
+def _get_jobs(instance_uuid, client, params=None, timeout=None):
     """
     Get Jobs for the instance.
 
-    :param url: url to fetch the data
-    :param token: user token
+    :param instance_uuid: instance uuid
+    :param client: http client
+    :param params: dict with the query parameters (Default value = None)
+    :param timeout: seconds to wait for the Backend (Default value = None)
     """
 
-    r = requests.get('{}/api/v1/instances/{}/get-jobs/'.format(SHAREDCLOUD_CLI_URL, instance_uuid),
-                     headers={'Authorization': 'Token {}'.format(token)})
+    r = client.get('{}/api/v1/instances/{}/get-jobs/'.format(SHAREDCLOUD_CLI_URL, instance_uuid),
+                   params=params, timeout=timeout)
 
     if r.status_code == 200:
         pass
@@ -224,7 +352,7 @@ def _get_jobs(instance_uuid, token):
     return r
 
 
-def _perform_instance_action(action, instance_uuid, token, data=None):
+def _perform_instance_action(action, instance_uuid, client, data=None):
     """
     Generic method to update instances and to fetch jobs.
     We use it to change the statuses (e.g., START, STOP)
@@ -232,17 +360,18 @@ def _perform_instance_action(action, instance_uuid, token, data=None):
 
     :param action: action to perform
     :param instance_uuid: instance uuid
-    :param token: user token
+    :param client: http client
     :param data: dict containing the data to apply (Default value = None)
     """
     if not data:
         data = {}
 
-    r = requests.patch('{}/api/v1/instances/{}/{}/'.format(SHAREDCLOUD_CLI_URL, instance_uuid, action),
-                       data=data, headers={'Authorization': 'Token {}'.format(token)})
+    r = client.patch('{}/api/v1/instances/{}/{}/'.format(SHAREDCLOUD_CLI_URL, instance_uuid, action), data=data)
 
     if r.status_code == 200:
-        pass
+        if action in ('add-image', 'delete-image'):
+            # The cached lists of downloaded images are outdated now
+            client.invalidate_cache('{}/api/v1/images/'.format(SHAREDCLOUD_CLI_URL))
     elif r.status_code == 404:
         click.echo('Not found resource with this UUID')
         exit(1)
@@ -252,8 +381,8 @@ def _perform_instance_action(action, instance_uuid, token, data=None):
     return r
 
 
-def _login(username, password):
-    r = requests.post('{}/api/v1/api-token-auth/'.format(SHAREDCLOUD_CLI_URL), data={
+def _login(client, username, password):
+    r = client.post('{}/api/v1/api-token-auth/'.format(SHAREDCLOUD_CLI_URL), auth=False, data={
         'username': username,
         'password': password
     })
@@ -277,41 +406,68 @@ def _logout():
         exit(1)
 
 
-def _update_image(registry_path):
+def _update_image(registry_path, runtime, cache=None, on_line=None):
     """
     Update a single image by pulling it from the DockerHub registry.
 
+    If a freshness cache is provided, the image is only pulled if it hasn't been pulled recently.
+
     :param registry_path: path to the DockerHub registry
+    :param runtime: container runtime
+    :param cache: image freshness cache (Default value = None)
+    :param on_line: function called with each line of the logs as soon as it's available (Default value = None)
     """
-    logs = b''
-    p = subprocess.Popen(
-        ['docker', 'pull', registry_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output, error = p.communicate()
+    logs = []
+    if cache:
+        output, error, hit = cache.pull(registry_path, on_line=on_line)
+        entry = cache.get(registry_path) or {}
+        if hit:
+            status = '[CACHE] HIT {} (digest {}, checked {} seconds ago)'.format(
+                registry_path, entry.get('digest'), int(time.time() - entry.get('checked_at', 0)))
+        else:
+            status = '[CACHE] MISS {} (digest {})'.format(registry_path, entry.get('digest'))
+        logs.append(status.encode('utf-8'))
+        if on_line:
+            on_line(status)
+    else:
+        output, error = runtime.pull(registry_path, on_line=on_line)
 
-    for line in (output + b'\n' + error).splitlines():
-        logs += line + b'\n'
+    if on_line:
+        for line in error.splitlines():
+            on_line(line.decode('utf-8', 'replace'))
 
-    return logs
+    logs.extend((output + b'\n' + error).splitlines())
+    return b''.join(line + b'\n' for line in logs)
 
 
-def _update_all_images(config):
+def _update_all_images(config, cache=None, concurrency=1):
     """
     Update all the downloaded images.
 
+    Images are pulled concurrently, and the progress of each one is displayed as soon as it's received.
+
     :param config: context object
+    :param cache: image freshness cache (Default value = None)
+    :param concurrency: max number of images pulled at the same time (Default value = 1)
     """
+    from concurrent.futures import ThreadPoolExecutor
+
     instance_uuid = _get_instance_token_or_exit_if_there_is_none()
 
-    r = requests.get(
-        '{}/api/v1/images/?instance={}'.format(SHAREDCLOUD_CLI_URL, instance_uuid),
-        headers={'Authorization': 'Token {}'.format(config.token)})
+    r = config.client.get_cached('{}/api/v1/images/?instance={}'.format(SHAREDCLOUD_CLI_URL, instance_uuid),
+                                 IMAGE_CATALOG_CACHE_TTL)
 
     if r.status_code == 200:
         images = r.json()
 
-        for image in images:
-            logs = _update_image(image.get('registry_path'))
-            click.echo(logs)
+        def _update(registry_path):
+            _update_image(registry_path, config.runtime, cache=cache,
+                          on_line=lambda line: click.echo('[{}] {}'.format(registry_path, line)))
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            # We consume the results so the errors are raised
+            for _ in executor.map(_update, [image.get('registry_path') for image in images]):
+                pass
     else:
         click.echo(r.content)
         exit(1)
@@ -0,0 +1,167 @@
+import collections
+import uuid
+
+from sharedcloud_cli.constants import JOB_DEFAULT_CPUS, JOB_DEFAULT_MEMORY
+from sharedcloud_cli.runtime import ContainerRuntimeError
+
+# Entrypoint that keeps a warm container alive, doing nothing, until a job is executed inside of it
+IDLE_ENTRYPOINT = ['tail', '-f', '/dev/null']
+
+
+class WarmContainerPool(object):
+    """
+    Keep idle containers already started for the images that are used the most.
+
+    Jobs are executed inside of them instead of starting a brand-new container, so they skip the cold start.
+    The number of idle containers of each image follows the recent job mix, and containers are recycled after
+    "max_jobs_per_container" jobs or as soon as a job fails in them.
+
+    Trust model: a warm container is shared by consecutive jobs, which may belong to different users. Files,
+    environment changes and background processes left by a job are visible to the next ones, as there is no isolation
+    between them other than the recycling. That's why only the "images" given explicitly are kept warm: images whose
+    jobs are stateless or trusted to share a container.
+    """
+
+    def __init__(self, runtime, size, max_jobs_per_container=50, history=100, images=None):
+        """
+        :param runtime: container runtime
+        :param size: total number of idle containers to keep across all the images
+        :param max_jobs_per_container: number of jobs after which a container is recycled (Default value = 50)
+        :param history: number of recent jobs used to compute the job mix (Default value = 100)
+        :param images: image paths that can be kept warm. None means all of them (Default value = None)
+        """
+        self.runtime = runtime
+        self.size = size
+        self.images = set(images) if images is not None else None
+        self.max_jobs_per_container = max_jobs_per_container
+        self.recent = collections.deque(maxlen=history)
+        self.idle = collections.defaultdict(list)
+        self.busy = {}
+        self.commands = {}
+
+    def _limits(self, requires_gpu):
+        # Warm containers only take the jobs that request the default resources. As for any GPU job, the default
+        # cpus and memory aren't limits of GPU containers, as they are far too small for them
+        if requires_gpu:
+            return {'gpu': True}
+        return {'cpus': JOB_DEFAULT_CPUS, 'memory': JOB_DEFAULT_MEMORY}
+
+    def _command(self, image):
+        """
+        Original command of the image, the one that jobs execute inside the warm containers.
+
+        :param image: image path in the DockerHub registry
+        """
+        if not self.commands.get(image):
+            details = self.runtime.inspect_image(image) or {}
+            image_config = details.get('Config') or {}
+            self.commands[image] = (image_config.get('Entrypoint') or []) + (image_config.get('Cmd') or [])
+        return self.commands[image]
+
+    def _start_container(self, key):
+        image, requires_gpu = key
+        name = 'sharedcloud-warm-{}'.format(uuid.uuid4())
+        container_id = self.runtime.create_container(name, image, entrypoint=IDLE_ENTRYPOINT,
+                                                     **self._limits(requires_gpu))
+        self.runtime.start_container(container_id)
+        return {'id': container_id, 'key': key, 'command': self._command(image), 'num_jobs': 0}
+
+    def _remove_container(self, container):
+        try:
+            self.runtime.remove_container(container['id'])
+        except ContainerRuntimeError:
+            pass
+
+    def target_size(self, key):
+        """
+        Number of idle containers that we want for an image, based on its share of the recent jobs.
+
+        :param key: tuple with the image path and whether it requires gpu
+        """
+        if not self.recent:
+            return 0
+        count = self.recent.count(key)
+        if not count:
+            return 0
+        return max(1, int(round(self.size * count / float(len(self.recent)))))
+
+    def acquire(self, job_uuid, image, requires_gpu):
+        """
+        Get a warm container to execute a job. Returns None if the image can't be executed in warm mode.
+
+        :param job_uuid: uuid of the job
+        :param image: image path in the DockerHub registry
+        :param requires_gpu: does the job require gpu?
+        """
+        if self.images is not None and image not in self.images:
+            return None
+
+        key = (image, bool(requires_gpu))
+        self.recent.append(key)
+
+        try:
+            if not self._command(image):
+                return None
+
+            container = self.idle[key].pop() if self.idle[key] else self._start_container(key)
+        except ContainerRuntimeError:
+            return None
+
+        self.busy[job_uuid] = container
+        return container
+
+    def kill(self, job_uuid):
+        """
+        Remove the container of a job right away, e.g. when the job times out, so whatever it executes stops.
+
+        :param job_uuid: uuid of the job
+        """
+        container = self.busy.pop(job_uuid, None)
+        if container:
+            self._remove_container(container)
+
+    def release(self, job_uuid, has_failed=False):
+        """
+        Give back the container of a job, recycling it if needed.
+
+        :param job_uuid: uuid of the job
+        :param has_failed: did the job fail (or time out)? (Default value = False)
+        """
+        container = self.busy.pop(job_uuid, None)
+        if not container:
+            return
+
+        container['num_jobs'] += 1
+        if has_failed or container['num_jobs'] >= self.max_jobs_per_container:
+            self._remove_container(container)
+        else:
+            self.idle[container['key']].append(container)
+
+    def replenish(self):
+        """
+        Start or remove idle containers until each image has as many as the recent job mix asks for.
+        """
+        for key in set(self.recent) | set(self.idle.keys()):
+            target = self.target_size(key)
+            idle = self.idle[key]
+
+            while len(idle) > target:
+                self._remove_container(idle.pop(0))
+
+            while len(idle) < target:
+                try:
+                    idle.append(self._start_container(key))
+                except ContainerRuntimeError:
+                    break
+
+    def close(self):
+        """
+        Remove all the containers of the pool.
+        """
+        for containers in self.idle.values():
+            for container in containers:
+                self._remove_container(container)
+        for container in self.busy.values():
+            self._remove_container(container)
+        self.idle.clear()
+        self.busy.clear()
@@ -0,0 +1,51 @@
+import os
+import time
+
+
+class FakeResponse(object):
+    """
+    Response of the http client, with the fields that the commands read.
+    """
+
+    def __init__(self, status_code=200, data=None, content=b'', text='', headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.content = content
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+
+class FakeClient(object):
+    """
+    Base of the fake http clients. Each test module adds the methods it needs, which record their requests in
+    "requests".
+    """
+    token = 'token'
+
+    def __init__(self):
+        self.requests = []
+
+    @staticmethod
+    def _next_status_code(status_codes):
+        """
+        Pops the next status code of a list (200 once it's empty). None stands for a connection error.
+        """
+        status_code = status_codes.pop(0) if status_codes else 200
+        if status_code is None:
+            raise IOError('Connection refused')
+        return status_code
+
+
+def write_file(root, path, content):
+    path = os.path.join(str(root), path)
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def sleep(seconds):
+    time.sleep(seconds)
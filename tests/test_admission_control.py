@@ -0,0 +1,57 @@
+from sharedcloud_cli.resources import AdmissionController, _host_capacity
+from sharedcloud_cli.scheduler import JobScheduler
+from tests.fakes import sleep, write_file
+
+
+# Workflow
+def test_capacity_is_capped_by_the_cgroup_limits(tmpdir):
+    write_file(tmpdir, 'proc/meminfo', 'MemTotal:       65536000 kB\nMemFree:        1000 kB\n')
+    write_file(tmpdir, 'sys/fs/cgroup/cpu.max', '50000 100000')
+    write_file(tmpdir, 'sys/fs/cgroup/memory.max', str(4096 * 1024 * 1024))
+
+    assert _host_capacity(str(tmpdir), reserved_memory=512) == (0.5, 3584)
+
+
+def test_capacity_without_cgroup_limits(tmpdir):
+    write_file(tmpdir, 'proc/meminfo', 'MemTotal:       8388608 kB\n')
+    write_file(tmpdir, 'sys/fs/cgroup/cpu/cpu.cfs_quota_us', '-1')
+    write_file(tmpdir, 'sys/fs/cgroup/cpu/cpu.cfs_period_us', '100000')
+    write_file(tmpdir, 'sys/fs/cgroup/memory/memory.limit_in_bytes', '9223372036854771712')
+
+    cpus, memory = _host_capacity(str(tmpdir), reserved_memory=512)
+
+    assert cpus >= 1
+    assert memory == 8192 - 512
+
+
+def test_jobs_are_packed_onto_cpus_and_memory():
+    admission = AdmissionController(cpus=4, memory=4096)
+
+    assert admission.num_fitting() == 4
+    assert admission.admit('a', admission.request_for({'cpus': 2}))
+    assert admission.admit('b', admission.request_for({'memory': 2048}))
+    assert admission.num_fitting() == 1
+    assert not admission.admit('c', admission.request_for({'cpus': 2}))
+
+    admission.release('a')
+    assert admission.admit('c', admission.request_for({'cpus': 2}))
+
+
+def test_jobs_bigger_than_the_host_are_clamped():
+    admission = AdmissionController(cpus=2, memory=1024)
+
+    assert admission.request_for({'cpus': 8, 'memory': 4096}) == {'cpus': 2, 'memory': 1024}
+
+
+def test_scheduler_waits_for_the_resources_of_each_job():
+    admission = AdmissionController(cpus=2, memory=None)
+    scheduler = JobScheduler(10, 60, admission=admission)
+
+    scheduler.submit('big', sleep, (0.2,), resources={'cpus': 2, 'memory': 1024})
+    scheduler.submit('bigger', sleep, (0,), resources={'cpus': 2, 'memory': 1024})
+    assert list(scheduler.running) == ['big']
+    assert scheduler.free_slots == 0
+
+    while 'bigger' not in scheduler.running:
+        scheduler.wait(1)
+    assert admission.allocations == {'bigger': {'cpus': 2, 'memory': 1024}}
@@ -0,0 +1,82 @@
+import pickle
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+from sharedcloud_cli.client import Client
+
+
+class FakeAdapter(BaseAdapter):
+    def __init__(self):
+        super(FakeAdapter, self).__init__()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = Response()
+        response.status_code = 200
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def _client_with_fake_adapter(**kwargs):
+    client = Client(**kwargs)
+    adapter = FakeAdapter()
+    client.session.mount('http://', adapter)
+    return client, adapter
+
+
+# Workflow
+def test_authorization_header_is_sent():
+    client, adapter = _client_with_fake_adapter(token='abc')
+
+    client.get('http://sharedcloud/api/v1/jobs/')
+
+    assert adapter.requests[0].headers['Authorization'] == 'Token abc'
+
+
+def test_authorization_header_is_dropped_without_auth():
+    client, adapter = _client_with_fake_adapter(token='abc')
+
+    client.post('http://sharedcloud/api/v1/login/', auth=False, headers={'X-Extra': '1'}, data={'a': 1})
+
+    assert 'Authorization' not in adapter.requests[0].headers
+    assert adapter.requests[0].headers['X-Extra'] == '1'
+
+
+def test_anonymous_clients_send_no_authorization_header():
+    client, adapter = _client_with_fake_adapter()
+
+    client.get('http://sharedcloud/api/v1/gpus/')
+
+    assert 'Authorization' not in adapter.requests[0].headers
+
+
+def test_session_is_reused_within_a_process():
+    client = Client(token='abc')
+
+    assert client.session is client.session
+
+
+def test_session_is_rebuilt_after_a_fork(monkeypatch):
+    client = Client(token='abc')
+    session = client.session
+
+    monkeypatch.setattr('sharedcloud_cli.client.os.getpid', lambda: -1)
+
+    assert client.session is not session
+    assert client.session.headers['Authorization'] == 'Token abc'
+
+
+def test_sessions_are_not_pickled():
+    client = Client(token='abc')
+    client.session
+
+    copy = pickle.loads(pickle.dumps(client))
+
+    assert copy._session is None
+    assert copy.token == 'abc'
+    assert copy.session.headers['Authorization'] == 'Token abc'
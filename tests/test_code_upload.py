@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+from sharedcloud_cli.uploads import CodeUpload, FunctionCodeIndex, _code_sha256
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, accepts_gzip=True, rejection_status_code=415, rejection_text=''):
+        super(FakeClient, self).__init__()
+        self.accepts_gzip = accepts_gzip
+        self.rejection_status_code = rejection_status_code
+        self.rejection_text = rejection_text
+
+    def request(self, method, url, data=None, headers=None):
+        if not isinstance(data, dict):
+            data = data.read()
+        self.requests.append((method, url, data, headers))
+        if headers.get('Content-Encoding') == 'gzip' and not self.accepts_gzip:
+            return FakeResponse(self.rejection_status_code, text=self.rejection_text)
+        return FakeResponse(201)
+
+
+def _write_file(content):
+    path = os.path.join(tempfile.mkdtemp(), 'handler.py')
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+# Workflow
+def test_code_is_uploaded_as_a_compressed_json_stream():
+    code = 'def handler(event): return "ñandú \\"42\\""\n' * 100
+    path = _write_file(code.encode('utf-8'))
+    client = FakeClient()
+
+    upload = CodeUpload(path, chunk_size=7)  # Chunks split the multi-byte characters
+    r = upload.send(client, 'POST', 'http://sharedcloud/api/v1/functions/', {'name': 'helloWorld', 'code': None})
+
+    assert r.status_code == 201
+    method, url, body, headers = client.requests[0]
+    assert json.loads(gzip.decompress(body).decode('utf-8')) == {'name': 'helloWorld', 'code': code}
+    assert headers['X-Content-SHA256'] == hashlib.sha256(code.encode('utf-8')).hexdigest()
+    assert headers['Content-Length'] == str(len(body))
+    assert upload.size == len(code.encode('utf-8'))
+    assert upload.compressed_size == len(body)
+
+
+def test_code_is_uploaded_as_a_form_if_compression_is_not_supported():
+    path = _write_file(b'def handler(event): return 42\n')
+    client = FakeClient(accepts_gzip=False)
+
+    r = CodeUpload(path).send(client, 'PATCH', 'http://sharedcloud/api/v1/functions/1/', {'name': 'helloWorld'})
+
+    assert r.status_code == 201
+    assert client.requests[1][2] == {'name': 'helloWorld', 'code': 'def handler(event): return 42\n'}
+
+
+def test_code_is_uploaded_as_a_form_if_the_compressed_body_cant_be_parsed():
+    path = _write_file(b'def handler(event): return 42\n')
+    client = FakeClient(accepts_gzip=False, rejection_status_code=400,
+                        rejection_text='{"detail": "JSON parse error - Expecting value: line 1 column 1 (char 0)"}')
+
+    r = CodeUpload(path).send(client, 'POST', 'http://sharedcloud/api/v1/functions/', {'name': 'helloWorld'})
+
+    assert r.status_code == 201
+    assert client.requests[1][2] == {'name': 'helloWorld', 'code': 'def handler(event): return 42\n'}
+
+
+def test_validation_errors_of_the_compressed_upload_are_not_sent_again_as_a_form():
+    path = _write_file(b'def handler(event): return 42\n')
+    client = FakeClient(accepts_gzip=False, rejection_status_code=400,
+                        rejection_text='{"name": ["This field may not be blank."]}')
+
+    r = CodeUpload(path).send(client, 'POST', 'http://sharedcloud/api/v1/functions/', {'name': ''})
+
+    assert r.status_code == 400
+    assert len(client.requests) == 1
+
+
+def test_empty_files_are_uploaded():
+    client = FakeClient()
+
+    CodeUpload(_write_file(b'')).send(client, 'POST', 'http://sharedcloud/api/v1/functions/', {})
+
+    assert json.loads(gzip.decompress(client.requests[0][2]).decode('utf-8')) == {'code': ''}
+
+
+def test_identical_code_has_the_same_hash_as_a_string_or_as_a_file():
+    code = 'def handler(event): return 42\n'
+
+    assert _code_sha256(code=code) == _code_sha256(upload=CodeUpload(_write_file(code.encode('utf-8'))))
+    assert _code_sha256() is None
+
+
+def test_function_code_index_remembers_the_last_uploaded_code():
+    index = FunctionCodeIndex(path=os.path.join(tempfile.mkdtemp(), 'function_code_index'))
+    sha256 = _code_sha256(code='def handler(event): return 42')
+
+    index.set('6ea7e5ce-afcc-4027-82a7-e01eeea6b138', sha256)
+    index.set('7fb8f6df-afcc-4027-82a7-e01eeea6b138', sha256)
+    assert index.get('6ea7e5ce-afcc-4027-82a7-e01eeea6b138') == sha256
+    assert sorted(index.find(sha256)) == ['6ea7e5ce-afcc-4027-82a7-e01eeea6b138',
+                                          '7fb8f6df-afcc-4027-82a7-e01eeea6b138']
+
+    index.remove('6ea7e5ce-afcc-4027-82a7-e01eeea6b138')
+    assert index.get('6ea7e5ce-afcc-4027-82a7-e01eeea6b138') is None
+    assert index.find(sha256) == ['7fb8f6df-afcc-4027-82a7-e01eeea6b138']
+
+
+def test_function_code_index_finds_functions_by_code_image_and_name():
+    path = os.path.join(tempfile.mkdtemp(), 'function_code_index')
+    with open(path, 'w') as f:
+        json.dump({'5d96d4bd-afcc-4027-82a7-e01eeea6b138': 'abc'}, f)  # Older indexes only had the SHA-256
+    index = FunctionCodeIndex(path=path)
+
+    index.set('6ea7e5ce-afcc-4027-82a7-e01eeea6b138', 'abc', image_uuid='image1', name='helloWorld')
+    index.set('7fb8f6df-afcc-4027-82a7-e01eeea6b138', 'abc', image_uuid='image2', name='helloWorld')
+    index.set('7fb8f6df-afcc-4027-82a7-e01eeea6b138', name='byeWorld')
+
+    assert index.get('5d96d4bd-afcc-4027-82a7-e01eeea6b138') == 'abc'
+    assert len(index.find('abc')) == 3
+    assert index.find('abc', image_uuid='image1', name='helloWorld') == ['6ea7e5ce-afcc-4027-82a7-e01eeea6b138']
+    assert index.find('abc', image_uuid='image2', name='helloWorld') == []
+    assert index.find('abc', image_uuid='image2', name='byeWorld') == ['7fb8f6df-afcc-4027-82a7-e01eeea6b138']
+
+
+def _set_functions(path, first, count):
+    index = FunctionCodeIndex(path=path)
+    for i in range(first, first + count):
+        index.set('function{}'.format(i), 'abc')
+
+
+def test_function_code_index_keeps_the_functions_set_by_concurrent_processes():
+    path = os.path.join(tempfile.mkdtemp(), 'function_code_index')
+
+    processes = [multiprocessing.Process(target=_set_functions, args=(path, i * 20, 20)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert len(FunctionCodeIndex(path=path).find('abc')) == 80
+    assert sorted(os.listdir(os.path.dirname(path))) == ['function_code_index', 'function_code_index.lock']
@@ -0,0 +1,303 @@
+import base64
+import json
+import os
+import socketserver
+import struct
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+import pytest
+
+from sharedcloud_cli.runtime import DockerEngineRuntime, DockerCLIRuntime, ContainerRuntimeError, \
+    _split_registry_path, _registry_auth
+
+
+class FakeDockerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Minimal Docker Engine API served over a unix socket.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        socketserver.UnixStreamServer.__init__(self, socket_path, FakeDockerHandler)
+        self.num_connections = 0
+        self.containers = {}
+        self.images = {'sharedcloud/standard-node8:latest'}
+        self.missing = set()  # Images in the registry that haven't been pulled
+        self.num_pulls = 0
+        self.registry_auths = []
+        self.num_creates = 0
+        self.num_dropped_creates = 0  # Creates that are done, but the connection is closed before the response
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.num_connections += 1
+
+    def address_string(self):
+        return 'fake-docker'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.split('/')[2:]]  # We skip the API version
+        return parts, {key: values[0] for key, values in parse_qs(url.query).items()}
+
+    def do_GET(self):
+        parts, params = self._route()
+        if parts == ['_ping']:
+            return self._send(200, b'OK', content_type='text/plain')
+        if parts[0] == 'images' and parts[2] == 'json':
+            if parts[1] not in self.server.images:
+                return self._send(404, {'message': 'No such image'})
+            return self._send(200, {'Config': {'Entrypoint': ['node'], 'Cmd': ['/app/run.js']}})
+        if parts[0] == 'exec' and parts[2] == 'json':
+            return self._send(200, {'ExitCode': 3})
+        if parts[0] == 'containers' and parts[2] == 'logs':
+            container = self.server.containers[parts[1]]
+            code = container['env']['CODE'].encode('utf-8')
+            frames = struct.pack('>BxxxL', 1, len(code)) + code
+            frames += struct.pack('>BxxxL', 2, len(b'warning\n')) + b'warning\n'
+            return self._send(200, frames, content_type='application/vnd.docker.raw-stream')
+        self._send(404, {'message': 'page not found'})
+
+    def do_POST(self):
+        parts, params = self._route()
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+        if parts == ['images', 'create']:
+            registry_path = '{}:{}'.format(params['fromImage'], params['tag'])
+            if registry_path not in self.server.images:
+                return self._send(200, json.dumps({'error': 'manifest unknown'}).encode('utf-8'))
+            self.server.registry_auths.append(self.headers.get('X-Registry-Auth'))
+            self.server.missing.discard(registry_path)
+            self.server.num_pulls += 1
+            lines = [{'status': 'Pulling from {}'.format(params['fromImage']), 'id': params['tag']},
+                     {'status': 'Status: Image is up to date for {}'.format(registry_path)}]
+            return self._send(200, b'\r\n'.join(json.dumps(line).encode('utf-8') for line in lines))
+        if parts == ['containers', 'create']:
+            if body['Image'] in self.server.missing or body['Image'] not in self.server.images:
+                return self._send(404, {'message': 'No such image: {}'.format(body['Image'])})
+            env = dict(item.split('=', 1) for item in body['Env'])
+            self.server.containers[params['name']] = {'env': env, 'host_config': body['HostConfig']}
+            self.server.num_creates += 1
+            if self.server.num_dropped_creates:
+                self.server.num_dropped_creates -= 1
+                self.close_connection = True
+                return
+            return self._send(201, {'Id': params['name']})
+        if parts[0] == 'containers' and parts[2] == 'start':
+            return self._send(204)
+        if parts[0] == 'containers' and parts[2] == 'wait':
+            return self._send(200, {'StatusCode': 0})
+        if parts[0] == 'containers' and parts[2] == 'exec':
+            self.server.containers[parts[1]]['exec'] = body
+            return self._send(201, {'Id': parts[1]})
+        if parts[0] == 'exec' and parts[2] == 'start':
+            command = ' '.join(self.server.containers[parts[1]]['exec']['Cmd']).encode('utf-8')
+            return self._send(200, struct.pack('>BxxxL', 1, len(command)) + command,
+                              content_type='application/vnd.docker.raw-stream')
+        self._send(404, {'message': 'page not found'})
+
+    def do_DELETE(self):
+        parts, params = self._route()
+        if parts[0] == 'containers':
+            self.server.containers.pop(parts[1], None)
+            return self._send(204)
+        if parts[0] == 'images':
+            if parts[1] not in self.server.images:
+                return self._send(404, {'message': 'No such image'})
+            return self._send(200, [{'Untagged': parts[1]}])
+        self._send(404, {'message': 'page not found'})
+
+
+def _start_fake_docker_daemon(docker_config=None):
+    folder = tempfile.mkdtemp()
+    socket_path = os.path.join(folder, 'docker.sock')
+    config_path = os.path.join(folder, 'config.json')
+    if docker_config is not None:
+        with open(config_path, 'w') as f:
+            json.dump(docker_config, f)
+
+    daemon = FakeDockerDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return daemon, DockerEngineRuntime(socket_path=socket_path, config_path=config_path)
+
+
+# Workflow
+def test_engine_runtime_pings_pulls_and_runs_containers_over_one_connection():
+    daemon, runtime = _start_fake_docker_daemon()
+
+    assert runtime.ping()
+
+    output, error = runtime.pull('sharedcloud/standard-node8:latest')
+    assert b'latest: Pulling from sharedcloud/standard-node8' in output
+    assert error == b''
+
+    output, error, exit_code = runtime.run(
+        'job1', 'sharedcloud/standard-node8:latest', env={'CODE': 'print(42)'}, cpus=1, memory=1024)
+    assert output == b'print(42)'
+    assert error == b'warning\n'
+    assert exit_code == 0
+    assert daemon.containers == {}
+
+    assert daemon.num_connections == 1
+    daemon.shutdown()
+
+
+def test_engine_runtime_sets_the_container_limits():
+    daemon, runtime = _start_fake_docker_daemon()
+
+    runtime.create_container('job1', 'sharedcloud/standard-node8:latest', cpus=1, memory=1024)
+    runtime.create_container('job2', 'sharedcloud/standard-node8:latest', gpu=True)
+    runtime.create_container('job3', 'sharedcloud/standard-node8:latest', cpuset_cpus='0-3', cpuset_mems='0')
+
+    assert daemon.containers['job1']['host_config'] == {'NanoCpus': 10 ** 9, 'Memory': 1024 * 1024 * 1024}
+    assert daemon.containers['job2']['host_config'] == {'Runtime': 'nvidia'}
+    assert daemon.containers['job3']['host_config'] == {'CpusetCpus': '0-3', 'CpusetMems': '0'}
+    daemon.shutdown()
+
+
+def test_engine_runtime_pulls_missing_images_before_running_them():
+    daemon, runtime = _start_fake_docker_daemon()
+    daemon.missing.add('sharedcloud/standard-node8:latest')
+
+    output, _, exit_code = runtime.run('job1', 'sharedcloud/standard-node8:latest', env={'CODE': 'print(42)'})
+
+    assert output == b'print(42)'
+    assert exit_code == 0
+    assert daemon.num_pulls == 1
+    daemon.shutdown()
+
+
+def test_engine_runtime_pulls_with_the_credentials_of_docker_login():
+    daemon, runtime = _start_fake_docker_daemon({'auths': {
+        'https://index.docker.io/v1/': {'auth': base64.b64encode(b'alice:secret').decode('ascii')}}})
+
+    runtime.pull('sharedcloud/standard-node8:latest')
+
+    auth = json.loads(base64.urlsafe_b64decode(daemon.registry_auths[0]).decode('utf-8'))
+    assert auth == {'username': 'alice', 'password': 'secret', 'serveraddress': 'https://index.docker.io/v1/'}
+    daemon.shutdown()
+
+
+def test_registry_credentials_of_credential_helpers_are_left_to_the_cli():
+    config_path = os.path.join(tempfile.mkdtemp(), 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({'auths': {'registry.example.com': {}}, 'credHelpers': {'registry.example.com': 'ecr-login'}}, f)
+
+    assert _registry_auth('registry.example.com/node8:v1', config_path) is None
+    assert _registry_auth('sharedcloud/standard-node8:latest', config_path) == ''
+    assert _registry_auth('sharedcloud/standard-node8:latest', config_path + '.missing') == ''
+
+
+def test_cli_runtime_pulls_read_stdout_and_a_big_stderr_at_the_same_time(tmpdir, monkeypatch):
+    # A fake "docker" that fills the stderr pipe before writing its progress to stdout
+    docker = tmpdir.join('docker')
+    docker.write('#!/bin/sh\nhead -c 200000 /dev/zero | tr "\\0" e >&2\necho "Pulling fs layer"\necho "Downloaded"\n')
+    docker.chmod(0o755)
+    monkeypatch.setenv('PATH', '{}{}{}'.format(tmpdir, os.pathsep, os.environ['PATH']))
+
+    lines = []
+    output, error = DockerCLIRuntime().pull('sharedcloud/standard-node8:latest', on_line=lines.append)
+
+    assert lines == ['Pulling fs layer', 'Downloaded']
+    assert output == b'Pulling fs layer\nDownloaded\n'
+    assert error == b'e' * 200000
+
+
+def test_engine_runtime_removes_images():
+    daemon, runtime = _start_fake_docker_daemon()
+
+    output, error = runtime.remove_image('sharedcloud/standard-node8:latest')
+    assert b'Untagged: sharedcloud/standard-node8:latest' in output
+    assert error == b''
+    daemon.shutdown()
+
+
+def test_engine_runtime_executes_commands_in_running_containers():
+    daemon, runtime = _start_fake_docker_daemon()
+
+    image = runtime.inspect_image('sharedcloud/standard-node8:latest')
+    container_id = runtime.create_container('warm1', 'sharedcloud/standard-node8:latest',
+                                            entrypoint=['tail', '-f', '/dev/null'])
+    runtime.start_container(container_id)
+
+    output, error, exit_code = runtime.exec_container(
+        container_id, image['Config']['Entrypoint'] + image['Config']['Cmd'], env={'CODE': 'print(42)'})
+    assert output == b'node /app/run.js'
+    assert exit_code == 3
+    assert daemon.containers['warm1']['exec']['Env'] == ['CODE=print(42)']
+    assert daemon.num_connections == 1
+    daemon.shutdown()
+
+
+# Invalid fields
+def test_engine_runtime_does_not_send_again_requests_that_could_have_been_done():
+    daemon, runtime = _start_fake_docker_daemon()
+    daemon.num_dropped_creates = 1
+    assert runtime.ping()
+
+    with pytest.raises(ContainerRuntimeError):
+        runtime.create_container('job1', 'sharedcloud/standard-node8:latest')
+
+    assert daemon.num_creates == 1
+    daemon.shutdown()
+
+
+def test_engine_runtime_reports_errors_of_unknown_images():
+    daemon, runtime = _start_fake_docker_daemon()
+
+    output, error = runtime.pull('sharedcloud/unknown:latest')
+    assert error == b'manifest unknown\n'
+
+    output, error = runtime.remove_image('sharedcloud/unknown:latest')
+    assert b'No such image' in error
+
+    with pytest.raises(ContainerRuntimeError) as e:
+        runtime.run('job1', 'sharedcloud/unknown:latest')
+    assert 'manifest unknown' in str(e.value)
+    daemon.shutdown()
+
+
+def test_engine_runtime_is_not_available_without_daemon():
+    runtime = DockerEngineRuntime(socket_path=os.path.join(tempfile.mkdtemp(), 'docker.sock'))
+
+    assert not runtime.ping()
+
+
+def test_registry_paths_are_split_into_name_and_tag():
+    assert _split_registry_path('sharedcloud/standard-node8:latest') == ('sharedcloud/standard-node8', 'latest')
+    assert _split_registry_path('sharedcloud/standard-node8') == ('sharedcloud/standard-node8', 'latest')
+    assert _split_registry_path('localhost:5000/node8:v1') == ('localhost:5000/node8', 'v1')
+
+
+def test_engine_runtime_passes_the_output_as_it_arrives():
+    daemon, runtime = _start_fake_docker_daemon()
+    chunks = []
+
+    output, error, exit_code = runtime.run('job1', 'sharedcloud/standard-node8:latest', env={'CODE': 'print(42)'},
+                                           on_chunk=lambda stream, chunk: chunks.append((stream, chunk)))
+
+    assert (output, error, exit_code) == (b'', b'', 0)
+    assert sorted(chunks) == [('stderr', b'warning\n'), ('stdout', b'print(42)')]
+    daemon.shutdown()
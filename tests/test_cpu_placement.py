@@ -0,0 +1,47 @@
+from sharedcloud_cli.placement import CpuPlacement, _numa_nodes, _parse_cpu_list, _format_cpu_list
+from sharedcloud_cli.scheduler import JobScheduler
+from tests.fakes import sleep, write_file
+
+
+# Workflow
+def test_cpu_lists_are_parsed_and_formatted():
+    assert _parse_cpu_list('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+    assert _format_cpu_list([11, 0, 1, 2, 3, 8, 10]) == '0-3,8,10-11'
+
+
+def test_numa_nodes_are_read_from_sysfs(tmpdir):
+    write_file(tmpdir, 'sys/devices/system/node/node0/cpulist', '0-3')
+    write_file(tmpdir, 'sys/devices/system/node/node1/cpulist', '4-7')
+    write_file(tmpdir, 'sys/devices/system/node/node2/cpulist', '')
+    write_file(tmpdir, 'sys/devices/system/node/possible', '0-2')
+
+    assert _numa_nodes(str(tmpdir), allowed_cpus=set(range(7))) == {0: [0, 1, 2, 3], 1: [4, 5, 6]}
+    assert _numa_nodes(str(tmpdir.join('missing')), allowed_cpus={2, 3}) == {0: [2, 3]}
+
+
+def test_jobs_are_spread_across_numa_nodes():
+    placement = CpuPlacement({0: [0, 1, 2, 3], 1: [4, 5, 6, 7]})
+
+    assert placement.assign('a', 2) == {'cpuset_cpus': '0-1', 'cpuset_mems': '0'}
+    assert placement.assign('b', 2) == {'cpuset_cpus': '4-5', 'cpuset_mems': '1'}
+    assert placement.assign('c', 0.5) == {'cpuset_cpus': '2', 'cpuset_mems': '0'}
+    assert placement.assign('d', 4) is None
+
+    placement.release('a')
+    assert placement.assign('d', 4) == {'cpuset_cpus': '0-1,3,6', 'cpuset_mems': '0,1'}
+
+
+def test_scheduler_pins_jobs_and_reclaims_their_cpus():
+    placement = CpuPlacement({0: [0, 1]})
+    scheduler = JobScheduler(10, 60, placement=placement)
+    first, second = {'cpus': 2, 'memory': 1024}, {'cpus': 1, 'memory': 1024}
+
+    scheduler.submit('first', sleep, (0.2,), resources=first)
+    scheduler.submit('second', sleep, (0,), resources=second)
+    assert first['cpuset_cpus'] == '0-1'
+    assert 'cpuset_cpus' not in second
+
+    while 'second' not in scheduler.running:
+        scheduler.wait(1)
+    assert second['cpuset_cpus'] == '0'
+    assert list(placement.assignments) == ['second']
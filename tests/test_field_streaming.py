@@ -0,0 +1,183 @@
+import io
+import json
+
+import pytest
+
+from sharedcloud_cli.streams import JSONFieldParser, FieldWriter, _stream_field_value, _follow_field_value
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+JOB = {
+    'uuid': 'a',
+    'cost': 1.5,
+    'build_logs': 'Step 1/2 "quoted" \\ backslash',
+    'params': {'nested': ['}', '"', {'stdout': 'not this one'}]},
+    'stdout': 'line 1\nline 2\té€ \U0001f600 end',
+    'result': None,
+    'stderr': ''
+}
+BODY = json.dumps(JOB).encode('utf-8')
+
+
+def _parse(body, field_name, chunk_size):
+    pieces = []
+    parser = JSONFieldParser(field_name, pieces.append)
+    for offset in range(0, len(body), chunk_size):
+        parser.feed(body[offset:offset + chunk_size])
+    return ''.join(pieces), parser
+
+
+class FakeStreamResponse(FakeResponse):
+    def __init__(self, status_code, body=b'', content_type='text/plain'):
+        super(FakeStreamResponse, self).__init__(status_code, content=body, headers={'Content-Type': content_type})
+        self.body = body
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for offset in range(0, len(self.body), chunk_size):
+            self.read += chunk_size
+            yield self.body[offset:offset + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, responses):
+        super(FakeClient, self).__init__()
+        self.responses = responses
+
+    def get(self, url, headers=None, stream=False):
+        self.requests.append((url, headers))
+        return self.responses[url]
+
+
+# Workflow
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+@pytest.mark.parametrize('field_name', ['build_logs', 'stdout', 'stderr'])
+def test_string_fields_are_extracted_whatever_the_chunks(field_name, chunk_size):
+    text, parser = _parse(BODY.decode('utf-8'), field_name, chunk_size)
+
+    assert text == JOB[field_name]
+    assert parser.done
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1024])
+def test_other_fields_are_parsed_at_once(chunk_size):
+    assert _parse(BODY.decode('utf-8'), 'cost', chunk_size)[1].value == 1.5
+    assert _parse(BODY.decode('utf-8'), 'params', chunk_size)[1].value == JOB['params']
+    assert _parse(BODY.decode('utf-8'), 'result', chunk_size)[1].value is None
+
+
+def test_writer_keeps_only_the_head_or_the_tail():
+    head, tail = io.BytesIO(), io.BytesIO()
+    head_writer, tail_writer = FieldWriter(head, head=5), FieldWriter(tail, tail=5)
+    for chunk in (b'abc', b'defg', b'hij'):
+        head_writer.write(chunk)
+        tail_writer.write(chunk)
+    head_writer.close()
+    tail_writer.close()
+
+    assert head_writer.is_full
+    assert head.getvalue() == b'abcde\n'
+    assert tail.getvalue() == b'fghij\n'
+
+
+def test_field_endpoint_is_used_with_a_range():
+    out = io.BytesIO()
+    client = FakeClient({'http://sharedcloud/jobs/a/stdout/': FakeStreamResponse(206, b'line 1')})
+
+    _stream_field_value('http://sharedcloud/jobs/a/', client, 'stdout', head=6, out=out)
+
+    assert out.getvalue() == b'line 1\n'
+    assert client.requests == [('http://sharedcloud/jobs/a/stdout/', {'Range': 'bytes=0-5'})]
+
+
+def test_whole_resource_is_streamed_if_there_is_no_field_endpoint():
+    out = io.BytesIO()
+    job = FakeStreamResponse(200, BODY, content_type='application/json')
+    client = FakeClient({
+        'http://sharedcloud/jobs/a/stdout/': FakeStreamResponse(404),
+        'http://sharedcloud/jobs/a/': job
+    })
+
+    _stream_field_value('http://sharedcloud/jobs/a/', client, 'stdout', tail=3, out=out)
+
+    assert out.getvalue() == b'end\n'
+    assert client.requests[-1] == ('http://sharedcloud/jobs/a/', None)
+
+
+def test_streaming_stops_once_the_head_is_printed():
+    out = io.BytesIO()
+    body = b'x' * (1024 * 1024)
+    response = FakeStreamResponse(200, body)
+    client = FakeClient({'http://sharedcloud/jobs/a/stdout/': response})
+
+    _stream_field_value('http://sharedcloud/jobs/a/', client, 'stdout', head=10, out=out)
+
+    assert out.getvalue() == b'x' * 10 + b'\n'
+    assert response.read < len(body)
+
+
+class FollowedJob(object):
+    """
+    Job whose stdout grows on each poll, and finishes after a number of polls.
+    """
+
+    def __init__(self, pieces, honors_ranges=True, as_json=False):
+        self.pieces = pieces
+        self.honors_ranges = honors_ranges
+        self.as_json = as_json
+        self.stdout = b''
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False):
+        if url.endswith('/stdout/'):
+            if self.pieces:
+                self.stdout += self.pieces.pop(0)
+            self.ranges.append(headers['Range'])
+            start = int(headers['Range'][len('bytes='):-1])
+            if self.as_json:
+                return FakeStreamResponse(200, json.dumps({'stdout': self.stdout.decode('utf-8')}).encode('utf-8'),
+                                    content_type='application/json')
+            if not self.honors_ranges:
+                return FakeStreamResponse(200, self.stdout)
+            if start >= len(self.stdout):
+                return FakeStreamResponse(416)
+            response = FakeStreamResponse(206, self.stdout[start:])
+            response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, len(self.stdout) - 1, len(self.stdout))
+            return response
+        status = 2 if self.pieces else 3
+        return FakeStreamResponse(200, json.dumps({'status': status, 'stdout': 'x' * 100}).encode('utf-8'),
+                            content_type='application/json')
+
+
+@pytest.mark.parametrize('honors_ranges', [True, False])
+def test_followed_output_is_printed_once(honors_ranges):
+    out = io.BytesIO()
+    job = FollowedJob([b'line 1\n', b'', b'line 2\n', b'line 3\n'], honors_ranges=honors_ranges)
+
+    _follow_field_value('http://sharedcloud/jobs/a/', job, 'stdout', interval=0, out=out)
+
+    assert out.getvalue() == b'line 1\nline 2\nline 3\n'
+    if honors_ranges:
+        assert job.ranges[:3] == ['bytes=0-', 'bytes=7-', 'bytes=7-']
+
+
+def test_followed_output_sent_as_json_is_printed_once():
+    out = io.BytesIO()
+    job = FollowedJob([b'line "1"\n', b'', b'line 2 \xc3\xa9\n'], as_json=True)
+
+    _follow_field_value('http://sharedcloud/jobs/a/', job, 'stdout', interval=0, out=out)
+
+    assert out.getvalue() == b'line "1"\nline 2 \xc3\xa9\n'
+
+
+# Errors
+def test_missing_resource_exits():
+    client = FakeClient({
+        'http://sharedcloud/jobs/a/stdout/': FakeStreamResponse(404),
+        'http://sharedcloud/jobs/a/': FakeStreamResponse(404)
+    })
+
+    with pytest.raises(SystemExit):
+        _stream_field_value('http://sharedcloud/jobs/a/', client, 'stdout', out=io.BytesIO())
@@ -0,0 +1,69 @@
+from sharedcloud_cli.gpus import GpuProbe, GpuAllocator, NvidiaSmiProbe, _get_gpu_probe
+from sharedcloud_cli.scheduler import JobScheduler
+from tests.fakes import sleep
+
+
+class FakeGpuProbe(GpuProbe):
+    def __init__(self, num_gpus):
+        self.num_gpus = num_gpus
+
+    def devices(self):
+        return [{'index': str(index), 'uuid': 'GPU-{}'.format(index), 'name': 'Tesla V100', 'memory': 16160}
+                for index in range(self.num_gpus)]
+
+
+class EchoNvidiaSmiProbe(NvidiaSmiProbe):
+    QUERY = ['echo', '0, GPU-a, Tesla V100-SXM2-16GB, 16160\n1, GPU-b, Tesla V100-SXM2-16GB, [N/A]']
+
+
+class MissingNvidiaSmiProbe(NvidiaSmiProbe):
+    QUERY = ['sharedcloud-missing-nvidia-smi']
+
+
+# Workflow
+def test_devices_are_found_with_nvidia_smi():
+    devices = EchoNvidiaSmiProbe().devices()
+
+    assert [device['index'] for device in devices] == ['0', '1']
+    assert devices[0] == {'index': '0', 'uuid': 'GPU-a', 'name': 'Tesla V100-SXM2-16GB', 'memory': 16160}
+    assert devices[1]['memory'] is None
+
+
+def test_devices_can_be_given_beforehand():
+    assert [device['index'] for device in _get_gpu_probe('1, 3').devices()] == ['1', '3']
+
+
+def test_each_job_gets_its_own_gpus():
+    gpus = GpuAllocator.from_probe(FakeGpuProbe(4))
+
+    assert gpus.assign('a') == '0'
+    assert gpus.assign('b', num_gpus=2) == '1,2'
+    assert gpus.assign('c', num_gpus=2) is None
+    assert list(gpus.occupancy.values()) == ['a', 'b', 'b', None]
+
+    gpus.release('a')
+    assert gpus.assign('c', num_gpus=2) == '0,3'
+    assert gpus.num_free == 0
+
+
+def test_scheduler_queues_jobs_until_a_gpu_is_free():
+    gpus = GpuAllocator.from_probe(FakeGpuProbe(1))
+    scheduler = JobScheduler(10, 60, gpus=gpus)
+    first, second = {'gpus': 1}, {'gpus': 1}
+
+    scheduler.submit('first', sleep, (0.2,), resources=first)
+    scheduler.submit('second', sleep, (0,), resources=second)
+    assert first['gpu_devices'] == '0'
+    assert 'gpu_devices' not in second
+    assert scheduler.free_slots == 0
+
+    while 'second' not in scheduler.running:
+        scheduler.wait(1)
+    assert second['gpu_devices'] == '0'
+    assert gpus.occupancy == {'0': 'second'}
+
+
+# Errors
+def test_hosts_without_nvidia_smi_have_no_gpus():
+    assert MissingNvidiaSmiProbe().devices() == []
+    assert not GpuAllocator.from_probe(MissingNvidiaSmiProbe()).devices
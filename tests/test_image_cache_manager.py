@@ -0,0 +1,58 @@
+import tempfile
+import time
+
+from sharedcloud_cli.images import ImageCacheManager
+from sharedcloud_cli.runtime import ContainerRuntime
+
+
+class FakeRuntime(ContainerRuntime):
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.removed = []
+
+    def inspect_image(self, registry_path):
+        return {'Size': self.sizes[registry_path]}
+
+    def remove_image(self, registry_path):
+        self.removed.append(registry_path)
+        return 'Untagged: {}\n'.format(registry_path).encode('utf-8'), b''
+
+
+def _use(manager, *registry_paths):
+    for registry_path in registry_paths:
+        manager.touch(registry_path)
+        time.sleep(0.01)
+
+
+# Workflow
+def test_least_recently_used_images_are_evicted_until_they_fit_in_the_budget():
+    runtime = FakeRuntime({'node8:latest': 300, 'python36:latest': 500, 'web:latest': 400})
+    manager = ImageCacheManager(runtime, budget=1000, folder=tempfile.mkdtemp())
+    _use(manager, 'node8:latest', 'python36:latest', 'web:latest', 'node8:latest')
+
+    evicted = []
+    assert manager.evict(on_evict=evicted.append) == ['python36:latest']
+    assert evicted == runtime.removed == ['python36:latest']
+
+    entries, total = manager.stats()
+    assert [entry['registry_path'] for entry in entries] == ['node8:latest', 'web:latest']
+    assert total == 700
+
+
+def test_pinned_and_in_use_images_are_never_evicted():
+    runtime = FakeRuntime({'node8:latest': 300, 'python36:latest': 500, 'web:latest': 400})
+    manager = ImageCacheManager(runtime, budget=100, folder=tempfile.mkdtemp())
+    _use(manager, 'node8:latest', 'python36:latest', 'web:latest')
+    manager.pin('node8:latest')
+
+    assert manager.evict(in_use={'web:latest'}) == ['python36:latest']
+    assert manager.stats()[1] == 700
+
+
+def test_images_are_not_evicted_without_budget():
+    runtime = FakeRuntime({'node8:latest': 300})
+    manager = ImageCacheManager(runtime, budget=None, folder=tempfile.mkdtemp())
+    _use(manager, 'node8:latest')
+
+    assert manager.evict() == []
+    assert runtime.removed == []
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sharedcloud_cli.images import ImageFreshnessCache
+from sharedcloud_cli.runtime import ContainerRuntime
+
+
+class FakeRuntime(ContainerRuntime):
+    def __init__(self, pulls_filename):
+        self.pulls_filename = pulls_filename
+
+    def pull(self, registry_path, on_line=None):
+        time.sleep(0.5)
+        with open(self.pulls_filename, 'a') as f:
+            f.write(registry_path + '\n')
+        return b'latest: Pulling from sharedcloud/standard-node8\n', b''
+
+    def inspect_image(self, registry_path):
+        return {'Id': 'sha256:1234', 'RepoDigests': ['sharedcloud/standard-node8@sha256:abcd']}
+
+
+def _pull(cache, hits):
+    output, error, hit = cache.pull('sharedcloud/standard-node8:latest')
+    assert b'Pulling' in output
+    hits.put(hit)
+
+
+def _read_pulls(filename):
+    with open(filename, 'r') as f:
+        return f.read().splitlines()
+
+
+# Workflow
+def test_concurrent_jobs_wait_for_a_single_pull():
+    folder = tempfile.mkdtemp()
+    pulls_filename = os.path.join(folder, 'pulls')
+    cache = ImageFreshnessCache(FakeRuntime(pulls_filename), ttl=0, folder=folder)
+
+    hits = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_pull, args=(cache, hits)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert sorted(hits.get(timeout=10) for _ in processes) == [False, True, True]
+    assert _read_pulls(pulls_filename) == ['sharedcloud/standard-node8:latest']
+
+
+def test_images_are_pulled_again_once_the_ttl_expires():
+    folder = tempfile.mkdtemp()
+    pulls_filename = os.path.join(folder, 'pulls')
+    cache = ImageFreshnessCache(FakeRuntime(pulls_filename), ttl=60, folder=folder)
+
+    assert cache.pull('sharedcloud/standard-node8:latest')[2] is False
+    assert cache.pull('sharedcloud/standard-node8:latest')[2] is True
+    assert cache.get('sharedcloud/standard-node8:latest')['digest'] == 'sha256:abcd'
+
+    cache.ttl = 0
+    assert cache.pull('sharedcloud/standard-node8:latest')[2] is False
+    assert len(_read_pulls(pulls_filename)) == 2
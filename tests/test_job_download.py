@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+from sharedcloud_cli.downloads import JobDownloader
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+JOBS = {
+    'a': {'uuid': 'a', 'status': 3, 'result': '42', 'stdout': 'hello'},
+    'b': {'uuid': 'b', 'status': 4, 'result': None, 'stdout': 'Traceback'},
+    'c': {'uuid': 'c', 'status': 2, 'result': None, 'stdout': ''},
+    'd': {'uuid': 'd', 'status': 5, 'result': None, 'stdout': ''}
+}
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, missing=()):
+        super(FakeClient, self).__init__()
+        self.missing = missing
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        job_uuid = url.rstrip('/').split('/')[-1]
+        with self.lock:
+            self.requests.append(job_uuid)
+        if job_uuid in self.missing:
+            return FakeResponse(404)
+        return FakeResponse(200, JOBS[job_uuid])
+
+
+def _listed(*uuids):
+    # The lists don't include the fields, so each job needs to be fetched
+    return [{'uuid': uuid, 'status': JOBS[uuid]['status']} for uuid in uuids]
+
+
+def _read(tmpdir, job_uuid):
+    with open(os.path.join(str(tmpdir), '{}.json'.format(job_uuid)), 'r') as f:
+        return json.load(f)
+
+
+# Workflow
+def test_finished_jobs_are_written_one_file_per_job(tmpdir):
+    client = FakeClient()
+
+    counts = JobDownloader(client, str(tmpdir), ['result', 'stdout'], concurrency=4).download(
+        [_listed('a', 'b'), _listed('c', 'd')])
+
+    assert counts == {'downloaded': 3, 'skipped': 0, 'unfinished': 1, 'failed': 0}
+    assert sorted(client.requests) == ['a', 'b', 'd']
+    assert _read(tmpdir, 'a') == {'uuid': 'a', 'status': 3, 'result': '42', 'stdout': 'hello'}
+    assert not os.path.exists(os.path.join(str(tmpdir), 'c.json'))
+
+
+def test_downloads_are_resumed(tmpdir):
+    JobDownloader(FakeClient(missing=['b']), str(tmpdir), ['result']).download([_listed('a', 'b')])
+
+    client = FakeClient()
+    counts = JobDownloader(client, str(tmpdir), ['result']).download([_listed('a', 'b')])
+
+    assert counts == {'downloaded': 1, 'skipped': 1, 'unfinished': 0, 'failed': 0}
+    assert client.requests == ['b']
+
+
+def test_jobs_are_downloaded_again_if_new_fields_are_asked(tmpdir):
+    JobDownloader(FakeClient(), str(tmpdir), ['result']).download([_listed('a')])
+
+    JobDownloader(FakeClient(), str(tmpdir), ['result', 'stdout']).download([_listed('a')])
+
+    assert _read(tmpdir, 'a')['stdout'] == 'hello'
+
+
+def test_listed_jobs_with_all_the_fields_are_not_fetched(tmpdir):
+    client = FakeClient()
+
+    JobDownloader(client, str(tmpdir), ['result']).download([[JOBS['a']]])
+
+    assert client.requests == []
+    assert _read(tmpdir, 'a')['result'] == '42'
+
+
+# Errors
+def test_failed_jobs_are_counted(tmpdir):
+    counts = JobDownloader(FakeClient(missing=['a']), str(tmpdir), ['result']).download([_listed('a')])
+
+    assert counts['failed'] == 1
+    assert os.listdir(str(tmpdir)) == []
+
@@ -0,0 +1,173 @@
+import threading
+import time
+
+import requests
+
+from sharedcloud_cli.job_output import JobOutputShipper, CapturedOutput, _multipart_body
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, status_codes=()):
+        super(FakeClient, self).__init__()
+        self.status_codes = list(status_codes)
+
+    def post(self, url, data=None):
+        status_code = self._next_status_code(self.status_codes)
+        self.requests.append((url, data, status_code))
+        return FakeResponse(status_code)
+
+
+# Workflow
+def test_output_is_appended_in_batches_with_their_offsets():
+    client = FakeClient()
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=10)
+
+    shipper.write('stdout', b'hello ')
+    assert client.requests == []
+    shipper.write('stdout', b'world\n')
+    shipper.write('stderr', b'oops')
+
+    assert shipper.close() == {}
+    assert [data for _, data, _ in client.requests] == [
+        {'output': b'hello world\n', 'output_offset': 0, 'error': b'', 'error_offset': 0},
+        {'output': b'', 'output_offset': 12, 'error': b'oops', 'error_offset': 0}
+    ]
+    assert client.requests[0][0].endswith('/api/v1/jobs/a/append-output/')
+
+
+def test_output_is_appended_periodically():
+    client = FakeClient()
+    shipper = JobOutputShipper(client, 'a', interval=0.01, max_size=1024).start()
+
+    shipper.write('stdout', b'hello')
+    deadline = time.time() + 5
+    while not client.requests and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert client.requests[0][1]['output'] == b'hello'
+    shipper.close()
+
+
+def test_failed_batches_are_sent_again():
+    client = FakeClient(status_codes=[None, 503])
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=1)
+
+    shipper.write('stdout', b'a')
+    shipper.write('stdout', b'b')
+    shipper.write('stdout', b'c')
+
+    assert [data['output'] for _, data, _ in client.requests] == [b'ab', b'abc']
+    assert shipper.offsets['stdout'] == 3
+
+
+def test_output_can_be_written_while_a_batch_is_being_sent():
+    class SlowClient(FakeClient):
+        def __init__(self):
+            super(SlowClient, self).__init__()
+            self.sending = threading.Event()
+            self.release = threading.Event()
+
+        def post(self, url, data=None):
+            self.sending.set()
+            self.release.wait(5)
+            return super(SlowClient, self).post(url, data=data)
+
+    client = SlowClient()
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=1024)
+    shipper.write('stdout', b'hello ')
+    sender = threading.Thread(target=shipper.flush)
+    sender.start()
+    client.sending.wait(5)
+
+    shipper.write('stdout', b'world')
+    client.release.set()
+    sender.join()
+    shipper.flush()
+
+    assert [data['output'] for _, data, _ in client.requests] == [b'hello ', b'world']
+    assert shipper.offsets['stdout'] == 11
+
+
+def test_output_under_the_cap_is_kept_whole():
+    captured = CapturedOutput(cap=10, memory_size=4)
+
+    assert captured.write(b'abc') == b'abc'
+    assert captured.write(b'defghij') == b'de'
+
+    assert not captured.truncated
+    assert captured.getvalue() == b'abcdefghij'
+
+
+def test_output_over_the_cap_keeps_the_head_and_the_tail():
+    captured = CapturedOutput(cap=10, memory_size=4)
+
+    for i in range(100):
+        captured.write('{:03d}'.format(i).encode('utf-8'))
+
+    assert captured.truncated
+    assert captured.getvalue() == b'00000\n[... 290 bytes truncated ...]\n98099'
+
+
+def test_output_over_the_cap_is_appended_with_the_marker_at_the_end():
+    client = FakeClient()
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=4, cap=8)
+
+    shipper.write('stdout', b'0123456789abcdef')
+    assert [data['output'] for _, data, _ in client.requests] == [b'0123']
+
+    shipper.close()
+    assert b''.join(data['output'] for _, data, _ in client.requests) == b'0123\n[... 8 bytes truncated ...]\ncdef'
+
+
+def test_captured_output_is_streamed_in_a_multipart_body():
+    captured = CapturedOutput(cap=1024)
+    captured.write(b'hello')
+
+    body, content_type = _multipart_body({'status': 3, 'output': captured})
+    boundary = content_type.split('boundary=')[1]
+
+    assert b''.join(body) == (
+        '--{0}\r\nContent-Disposition: form-data; name="status"\r\n\r\n3\r\n'
+        '--{0}\r\nContent-Disposition: form-data; name="output"\r\n\r\nhello\r\n'
+        '--{0}--\r\n'.format(boundary)).encode('utf-8')
+
+
+def test_multipart_bodies_know_their_length_beforehand():
+    captured = CapturedOutput(cap=8, memory_size=4)
+    for i in range(100):
+        captured.write('{:03d}'.format(i).encode('utf-8'))
+
+    body, content_type = _multipart_body({'status': 3, 'output': captured, 'error': 'ñandú'})
+    request = requests.Request('PATCH', 'http://sharedcloud/api/v1/jobs/a/', data=body,
+                               headers={'Content-Type': content_type}).prepare()
+
+    assert len(body) == len(b''.join(body))
+    assert request.headers['Content-Length'] == str(len(body))
+    assert 'Transfer-Encoding' not in request.headers
+
+
+# Errors
+def test_output_is_kept_for_the_final_update_if_the_backend_cant_append_it():
+    client = FakeClient(status_codes=[404])
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=1)
+
+    shipper.write('stdout', b'hello')
+    shipper.write('stderr', b'oops')
+
+    remaining = shipper.close()
+    assert remaining['output'].getvalue() == b'hello'
+    assert remaining['error'].getvalue() == b'oops'
+    assert len(client.requests) == 1
+
+
+def test_output_is_kept_for_the_final_update_if_the_last_batch_cant_be_appended():
+    client = FakeClient(status_codes=[200, 503, None, None])
+    shipper = JobOutputShipper(client, 'a', interval=60, max_size=1)
+
+    shipper.write('stdout', b'hello')
+    shipper.write('stdout', b' world')
+
+    remaining = shipper.close()
+    assert list(remaining.keys()) == ['output']
+    assert remaining['output'].getvalue() == b'hello world'
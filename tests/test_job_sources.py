@@ -0,0 +1,100 @@
+import pytest
+import requests
+
+from sharedcloud_cli.constants import JOB_SOURCE_POLL_INTERVAL
+from sharedcloud_cli.job_sources import JobSource, FixedIntervalJobSource, AdaptiveJobSource, LongPollJobSource, \
+    _get_job_source
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeClient(BaseFakeClient):
+    """
+    Answers each fetch with the next batch of jobs, after "delay" seconds of the fake clock.
+    """
+
+    def __init__(self, clock, batches, delay=0, timeout=False):
+        super(FakeClient, self).__init__()
+        self.clock = clock
+        self.batches = list(batches)
+        self.delay = delay
+        self.timeout = timeout
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append((params, timeout))
+        self.clock.now += self.delay
+        if self.timeout:
+            raise requests.exceptions.Timeout()
+        return FakeResponse(200, self.batches.pop(0) if self.batches else [])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('sharedcloud_cli.job_sources.time.time', clock.time)
+    return clock
+
+
+# Workflow
+def test_base_source_polls_at_the_default_interval(clock):
+    source = JobSource('instance', FakeClient(clock, [[{'job_uuid': 'a'}]]))
+
+    assert source.get_jobs(limit=3) == [{'job_uuid': 'a'}]
+    assert source.client.requests == [({'limit': 3}, None)]
+    assert source.next_interval(1) == JOB_SOURCE_POLL_INTERVAL
+
+
+def test_fixed_source_always_waits_the_same(clock):
+    source = FixedIntervalJobSource('instance', FakeClient(clock, []), interval=7)
+
+    assert [source.next_interval(num_jobs) for num_jobs in (0, 3, 0)] == [7, 7, 7]
+
+
+def test_adaptive_source_backs_off_while_idle_and_resets_on_jobs(clock):
+    source = AdaptiveJobSource('instance', FakeClient(clock, []), min_interval=1, max_interval=6)
+
+    assert [source.next_interval(0) for _ in range(4)] == [2, 4, 6, 6]
+    assert source.next_interval(2) == 1
+    assert source.next_interval(0) == 2
+
+
+def test_long_poll_source_asks_again_right_away_after_waiting(clock):
+    client = FakeClient(clock, [[], [{'job_uuid': 'a'}]], delay=30)
+    source = LongPollJobSource('instance', client, wait=30, min_interval=1, max_interval=8)
+
+    assert source.get_jobs() == []
+    assert source.next_interval(0) == 0
+    assert source.get_jobs(limit=2) == [{'job_uuid': 'a'}]
+    assert source.next_interval(1) == 0
+    assert client.requests == [({'wait': 30}, 40), ({'wait': 30, 'limit': 2}, 40)]
+
+
+def test_long_poll_source_waits_again_after_a_client_timeout(clock):
+    source = LongPollJobSource('instance', FakeClient(clock, [], timeout=True), wait=30)
+
+    assert source.get_jobs() == []
+    assert source.next_interval(0) == 0
+
+
+def test_long_poll_source_falls_back_to_adaptive_if_the_backend_ignores_wait(clock):
+    source = LongPollJobSource('instance', FakeClient(clock, [], delay=0.1), wait=30, min_interval=1, max_interval=8)
+
+    intervals = []
+    for _ in range(4):
+        source.get_jobs()
+        intervals.append(source.next_interval(0))
+
+    assert intervals == [2, 4, 8, 8]
+
+
+def test_sources_are_built_by_name(clock):
+    assert isinstance(_get_job_source('fixed', 'instance', None), FixedIntervalJobSource)
+    assert isinstance(_get_job_source('adaptive', 'instance', None), AdaptiveJobSource)
+    assert isinstance(_get_job_source('long-poll', 'instance', None), LongPollJobSource)
@@ -0,0 +1,196 @@
+import os
+
+from sharedcloud_cli.job_output import CapturedOutput
+from sharedcloud_cli.job_updates import JobUpdateCoalescer
+from sharedcloud_cli.outbox import JobOutbox
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, bulk_status_codes=(), patch_status_codes=()):
+        super(FakeClient, self).__init__()
+        self.bulk_status_codes = list(bulk_status_codes)
+        self.patch_status_codes = list(patch_status_codes)
+        self.bulk = []
+        self.patches = []
+        self.patch_headers = []
+
+    def post(self, url, json=None):
+        r = FakeResponse(self._next_status_code(self.bulk_status_codes))
+        self.bulk.append(json)
+        return r
+
+    def patch(self, url, data=None, headers=None):
+        r = FakeResponse(self._next_status_code(self.patch_status_codes))
+        self.patches.append((url.rstrip('/').split('/')[-1], data if headers is None else b''.join(data)))
+        self.patch_headers.append(headers)
+        return r
+
+
+def _coalescer(client, tmpdir, **kwargs):
+    return JobUpdateCoalescer(client, interval=0.01, outbox=JobOutbox(str(tmpdir.join('outbox'))),
+                              folder=str(tmpdir.join('outputs')), **kwargs)
+
+
+# Workflow
+def test_updates_of_many_jobs_are_sent_in_one_request(tmpdir):
+    client = FakeClient()
+    updates = _coalescer(client, tmpdir)
+
+    updates.put('a', {'status': 2})
+    updates.put('b', {'status': 2})
+    updates.put('a', {'status': 3, 'build_logs': b'pulled'})
+    updates.flush()
+
+    assert client.bulk == [[{'uuid': 'a', 'status': 3, 'build_logs': 'pulled'}, {'uuid': 'b', 'status': 2}]]
+    assert not len(updates.outbox)
+
+
+def test_big_batches_are_split(tmpdir):
+    client = FakeClient()
+    updates = _coalescer(client, tmpdir, batch_size=2)
+
+    for job_uuid in 'abcde':
+        updates.put(job_uuid, {'status': 2})
+    updates.flush()
+
+    assert [len(batch) for batch in client.bulk] == [2, 2, 1]
+
+
+def test_jobs_are_updated_one_by_one_without_bulk_endpoint(tmpdir):
+    client = FakeClient(bulk_status_codes=[404])
+    updates = _coalescer(client, tmpdir)
+
+    updates.put('a', {'status': 2})
+    updates.put('b', {'status': 4})
+    updates.flush()
+    updates.put('c', {'status': 3})
+    updates.flush()
+
+    assert len(client.bulk) == 1
+    assert client.patches == [('a', {'status': 2}), ('b', {'status': 4}), ('c', {'status': 3})]
+
+
+def test_failed_updates_are_retried_with_the_newest_fields(tmpdir):
+    client = FakeClient(bulk_status_codes=[None, 503])
+    updates = _coalescer(client, tmpdir)
+
+    updates.put('a', {'status': 2})
+    updates.flush()
+    updates.put('a', {'status': 3})
+    updates.flush()
+    assert client.bulk_status_codes == [503]  # The job waits for its backoff
+
+    updates.flush(force=True)
+    assert len(updates.outbox) == 2
+
+    updates.flush(force=True)
+    assert client.bulk == [[{'uuid': 'a', 'status': 3}]] * 2
+    assert not len(updates.outbox)
+
+
+def test_other_jobs_are_sent_while_a_job_waits_to_be_retried(tmpdir):
+    client = FakeClient(bulk_status_codes=[503])
+    updates = _coalescer(client, tmpdir)
+
+    updates.put('a', {'status': 2})
+    updates.flush()
+    updates.put('b', {'status': 2})
+    updates.flush()
+
+    assert client.bulk[-1] == [{'uuid': 'b', 'status': 2}]
+    assert len(updates.outbox) == 1
+
+
+def test_urgent_updates_are_sent_together_right_away(tmpdir):
+    client = FakeClient()
+    updates = _coalescer(client, tmpdir)
+
+    outcomes = updates.send_now([('a', {'status': 2}), ('b', {'status': 2})])
+
+    assert outcomes == {'a': updates.ACCEPTED, 'b': updates.ACCEPTED}
+    assert client.bulk == [[{'uuid': 'a', 'status': 2}, {'uuid': 'b', 'status': 2}]]
+    assert not len(updates.outbox)
+
+
+def test_urgent_updates_report_the_jobs_rejected_or_not_delivered(tmpdir):
+    client = FakeClient(bulk_status_codes=[400], patch_status_codes=[200, 409, None])
+    updates = _coalescer(client, tmpdir)
+
+    outcomes = updates.send_now([('a', {'status': 2}), ('b', {'status': 2}), ('c', {'status': 2})])
+
+    assert outcomes == {'a': updates.ACCEPTED, 'b': updates.REJECTED, 'c': updates.NOT_DELIVERED}
+    assert not len(updates.outbox)  # Updates not delivered are left to the caller
+
+    client.bulk_status_codes = [None]
+    assert updates.send_now([('c', {'status': 2})]) == {'c': updates.NOT_DELIVERED}
+
+
+def test_updates_left_behind_are_replayed_on_the_next_start(tmpdir):
+    updates = _coalescer(FakeClient(patch_status_codes=[None]), tmpdir)
+    updates.put('a', {'status': 2})
+    updates.put('a', {'status': 3, 'output': b'result'})
+    updates.flush()
+
+    client = FakeClient()
+    updates = _coalescer(client, tmpdir).start()
+    updates.close(timeout=1)
+
+    assert client.bulk == []
+    assert len(client.patches) == 1
+    assert b'name="output"\r\n\r\nresult' in client.patches[0][1]
+    assert not len(updates.outbox)
+
+
+def test_outputs_are_kept_in_files_until_they_are_delivered(tmpdir):
+    client = FakeClient(patch_status_codes=[503])
+    updates = _coalescer(client, tmpdir)
+    captured = CapturedOutput(cap=1024)
+    captured.write(b'\xff\xfe not utf-8')
+
+    updates.put_outputs('a', {'output': captured})
+    updates.put('a', {'status': 3})
+    [(_, _, data, _)] = updates.outbox.take(1)
+    path = data['output']['path']
+    assert os.path.exists(path)
+
+    updates.flush()
+    assert os.path.exists(path)
+    updates.flush(force=True)
+
+    assert b'name="output"\r\n\r\n\xff\xfe not utf-8\r\n' in client.patches[1][1]
+    assert client.patch_headers[1]['Content-Length'] == str(len(client.patches[1][1]))
+    assert not os.path.exists(path)
+    assert not len(updates.outbox)
+
+
+def test_outputs_are_sent_with_their_content_length(tmpdir):
+    client = FakeClient(bulk_status_codes=[404])
+    updates = _coalescer(client, tmpdir)
+    updates.put('a', {'status': 3, 'output': 'ñandú', 'error': b''})
+    updates.flush()
+
+    assert client.patch_headers[0]['Content-Length'] == str(len(client.patches[0][1]))
+
+
+def test_pending_updates_are_sent_on_close(tmpdir):
+    client = FakeClient()
+    updates = _coalescer(client, tmpdir).start()
+
+    updates.put('a', {'status': 5})
+    updates.close(timeout=1)
+
+    assert client.bulk == [[{'uuid': 'a', 'status': 5}]]
+
+
+# Errors
+def test_rejected_updates_are_dropped(tmpdir):
+    client = FakeClient(bulk_status_codes=[400], patch_status_codes=[400, 200])
+    updates = _coalescer(client, tmpdir)
+
+    updates.put('a', {'status': 'unknown'})
+    updates.put('b', {'status': 3})
+    updates.flush()
+
+    assert [job_uuid for job_uuid, _ in client.patches] == ['a', 'b']
+    assert not len(updates.outbox)
@@ -0,0 +1,77 @@
+import json
+
+from click.testing import CliRunner
+
+from sharedcloud_cli.cli.job import job
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+from tests.test_utils import Config
+
+JOBS = [
+    {'uuid': 'a', 'status': 4, 'run': 'r1', 'function_name': 'f', 'cost': 0.5,
+     'created_at': '20-05-2018 10:00:00', 'current_server_time': '21-05-2018 10:00:00'},
+    {'uuid': 'b', 'status': 3, 'run': 'r1', 'function_name': 'f', 'cost': 0.1,
+     'created_at': '21-05-2018 09:00:00', 'current_server_time': '21-05-2018 10:00:00'},
+    {'uuid': 'c', 'status': 4, 'run': 'r2', 'function_name': 'g', 'cost': 2.0,
+     'created_at': '21-05-2018 09:30:00', 'current_server_time': '21-05-2018 10:00:00'},
+]
+
+
+class FakeClient(BaseFakeClient):
+    """
+    Backend that ignores the filters, or rejects them.
+    """
+
+    def __init__(self, rejects_filters=False):
+        super(FakeClient, self).__init__()
+        self.rejects_filters = rejects_filters
+
+    def get(self, url, params=None):
+        self.requests.append(params)
+        if self.rejects_filters and set(params or {}) - {'page_size'}:
+            return FakeResponse(400, content=b'Bad request')
+        return FakeResponse(200, {'results': JOBS, 'next': None})
+
+
+def _list_jobs(client, *args):
+    config = Config(token='token')
+    config._client = client
+    config.output = 'ndjson'
+    r = CliRunner().invoke(job, ['list'] + list(args), obj=config)
+    return r, [json.loads(line)['uuid'] for line in r.output.splitlines() if line.startswith('{')]
+
+
+# Workflow
+def test_job_filters_are_sent_as_query_params():
+    client = FakeClient()
+
+    r, uuids = _list_jobs(client, '--status', 'FAILED', '--run', '8b8b6cc2-ebde-418a-88ba-84e0d6f76647',
+                          '--since', '2018-05-20', '--max-cost', '1', '--sort', '-cost')
+
+    assert r.exit_code == 0
+    assert client.requests[0] == {
+        'status': [4], 'run': '8b8b6cc2-ebde-418a-88ba-84e0d6f76647', 'created_at__gte': '20-05-2018 00:00:00',
+        'cost__lte': 1.0, 'ordering': '-cost', 'page_size': 100}
+
+
+def test_job_filters_are_applied_locally_if_the_server_ignores_them():
+    assert _list_jobs(FakeClient(), '--status', 'failed')[1] == ['a', 'c']
+    assert _list_jobs(FakeClient(), '--function', 'f', '--min-cost', '0.2')[1] == ['a']
+    assert _list_jobs(FakeClient(), '--since', '2h', '--until', '21-05-2018 09:15:00')[1] == ['b']
+
+
+def test_job_filters_are_applied_locally_if_the_server_rejects_them():
+    client = FakeClient(rejects_filters=True)
+
+    r, uuids = _list_jobs(client, '--status', 'FAILED', '--limit', '1')
+
+    assert '[WARNING] The filters were rejected' in r.output
+    assert uuids == ['a']
+    assert client.requests[1] == {'page_size': 100}
+
+
+# Invalid fields
+def test_job_filters_need_valid_times():
+    r, uuids = _list_jobs(FakeClient(), '--since', 'yesterday')
+
+    assert r.exit_code == 2
+    assert 'Invalid value for "--since"' in r.output
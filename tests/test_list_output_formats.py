@@ -0,0 +1,37 @@
+import json
+
+from sharedcloud_cli.mappers import _map_non_formatted_money_to_version_with_currency
+from sharedcloud_cli.utils import _list_resource
+from tests.test_list_pagination import FakeClient, PAGES
+
+
+def _list(capsys, output, columns=None):
+    _list_resource('http://sharedcloud/api/v1/jobs/', FakeClient(PAGES), ['UUID', 'ID'], ['uuid', 'incremental_id'],
+                   mappers={'incremental_id': _map_non_formatted_money_to_version_with_currency},
+                   pagination={'page_size': 2, 'all_pages': True}, output=output, columns=columns)
+    return capsys.readouterr().out
+
+
+# Workflow
+def test_json_output_streams_the_raw_values_of_all_the_pages(capsys):
+    assert json.loads(_list(capsys, 'json')) == [
+        {'uuid': 'a', 'incremental_id': 1},
+        {'uuid': 'b', 'incremental_id': 2},
+        {'uuid': 'c-with-a-long-uuid', 'incremental_id': 300}
+    ]
+
+
+def test_ndjson_output_prints_one_resource_per_line(capsys):
+    lines = _list(capsys, 'ndjson', columns=['id']).splitlines()
+
+    assert [json.loads(line) for line in lines] == [{'incremental_id': 1}, {'incremental_id': 2},
+                                                     {'incremental_id': 300}]
+
+
+def test_csv_output_has_a_single_header_row(capsys):
+    assert _list(capsys, 'csv', columns=['ID', 'uuid']).splitlines() == [
+        'incremental_id,uuid', '1,a', '2,b', '300,c-with-a-long-uuid']
+
+
+def test_table_output_only_shows_the_projected_columns(capsys):
+    assert _list(capsys, 'table', columns=['id']).splitlines() == ['ID', '------', '$1.000', '$2.000', '$300.000']
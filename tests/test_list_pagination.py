@@ -0,0 +1,74 @@
+from sharedcloud_cli.utils import _list_resource
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+
+class FakeClient(BaseFakeClient):
+    token = None
+
+    def __init__(self, pages):
+        super(FakeClient, self).__init__()
+        self.pages = pages
+
+    def get(self, url, params=None):
+        self.requests.append((url, params))
+        return FakeResponse(200, self.pages[url])
+
+
+PAGES = {
+    'http://sharedcloud/api/v1/jobs/': {
+        'results': [{'uuid': 'a', 'incremental_id': 1}, {'uuid': 'b', 'incremental_id': 2}],
+        'next': 'http://sharedcloud/api/v1/jobs/?page=2'
+    },
+    'http://sharedcloud/api/v1/jobs/?page=2': {
+        'results': [{'uuid': 'c-with-a-long-uuid', 'incremental_id': 300}],
+        'next': None
+    }
+}
+
+
+def _list(client, capsys, **pagination):
+    _list_resource('http://sharedcloud/api/v1/jobs/', client, ['UUID', 'ID'], ['uuid', 'incremental_id'],
+                   pagination=dict({'page_size': 2}, **pagination))
+    return capsys.readouterr()
+
+
+# Workflow
+def test_all_pages_are_streamed_with_the_widths_of_the_first_page_unless_later_rows_are_wider(capsys):
+    client = FakeClient(PAGES)
+
+    out = _list(client, capsys, all_pages=True).out
+
+    assert out.split('\n') == ['UUID      ID', '------  ----', 'a          1', 'b          2',
+                               'c-with-a-long-uuid   300', '']
+    assert client.requests == [('http://sharedcloud/api/v1/jobs/', {'page_size': 2}),
+                               ('http://sharedcloud/api/v1/jobs/?page=2', None)]
+
+
+def test_only_the_first_page_is_fetched_by_default(capsys):
+    client = FakeClient(PAGES)
+
+    captured = _list(client, capsys)
+
+    assert captured.out.split('\n')[2:-1] == ['a          1', 'b          2']
+    assert '--all' in captured.err
+    assert len(client.requests) == 1
+
+
+def test_pages_are_fetched_until_the_limit(capsys):
+    client = FakeClient(PAGES)
+
+    out = _list(client, capsys, limit=3, column_widths=[20]).out
+
+    assert [row.split()[0] for row in out.split('\n')[2:-1]] == ['a', 'b', 'c-with-a-long-uuid']
+
+
+def test_plain_lists_are_displayed_in_one_page(capsys):
+    client = FakeClient({'http://sharedcloud/api/v1/jobs/': [{'uuid': 'a', 'incremental_id': 1}]})
+
+    assert _list(client, capsys).out.split('\n') == ['UUID      ID', '------  ----', 'a          1', '']
+
+
+def test_empty_lists_only_display_the_headers(capsys):
+    client = FakeClient({'http://sharedcloud/api/v1/jobs/': []})
+
+    assert _list(client, capsys).out.split('\n')[2:-1] == []
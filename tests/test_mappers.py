@@ -0,0 +1,34 @@
+import datetime
+
+from sharedcloud_cli.constants import DATETIME_FORMAT
+from sharedcloud_cli.mappers import _parse_datetime, _map_rows, _map_datetime_obj_to_human_representation, \
+    _map_job_status_to_human_representation, _map_instance_type_to_human_readable
+
+
+# Workflow
+def test_datetimes_are_parsed_like_strptime():
+    for value in ['20-05-2018 16:30:05', '01-01-2000 00:00:00', '31-12-2099 23:59:59']:
+        assert _parse_datetime(value) == datetime.datetime.strptime(value, DATETIME_FORMAT)
+    assert _parse_datetime(None) is None
+
+
+def test_rows_are_mapped_column_by_column_like_cell_by_cell():
+    resources = [
+        {'uuid': 'a', 'status': 4, 'type': 2, 'created_at': '20-05-2018 10:00:00',
+         'current_server_time': '21-05-2018 10:00:00'},
+        {'uuid': 'b', 'status': 3, 'type': 1, 'created_at': '21-05-2018 09:59:30',
+         'current_server_time': '21-05-2018 10:00:00'},
+        {'uuid': 'c', 'status': 99, 'type': None, 'created_at': None, 'current_server_time': '21-05-2018 10:00:00'},
+    ]
+    keys = ['uuid', 'status', 'type', 'created_at']
+    mappers = {
+        'status': _map_job_status_to_human_representation,
+        'type': _map_instance_type_to_human_readable,
+        'created_at': _map_datetime_obj_to_human_representation
+    }
+
+    assert _map_rows(resources, keys, mappers, None) == [
+        [resource.get(key) if key not in mappers else mappers[key](resource.get(key), resource, None)
+         for key in keys] for resource in resources]
+    assert _map_rows(resources, keys, mappers, None)[:2] == [['a', 'FAILED', 'GPU', '1 day ago'],
+                                                             ['b', 'SUCCEEDED', 'CPU', '30 seconds ago']]
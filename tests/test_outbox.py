@@ -0,0 +1,47 @@
+import multiprocessing
+
+from sharedcloud_cli.outbox import JobOutbox
+
+
+def _add_updates(path, job_uuid, num_updates):
+    outbox = JobOutbox(path)
+    for status in range(num_updates):
+        outbox.add(job_uuid, {'status': status})
+
+
+# Workflow
+def test_updates_of_a_job_are_merged_oldest_first(tmpdir):
+    outbox = JobOutbox(str(tmpdir.join('outbox')))
+    outbox.add('a', {'status': 2})
+    outbox.add('b', {'status': 2})
+    outbox.add('a', {'status': 3, 'build_logs': 'pulled'})
+
+    batch = outbox.take(10)
+
+    assert [(job_uuid, data) for job_uuid, _, data, _ in batch] == [
+        ('a', {'status': 3, 'build_logs': 'pulled'}), ('b', {'status': 2})]
+    outbox.remove(batch[0][1])
+    assert len(outbox) == 1
+
+
+def test_postponed_jobs_are_not_due(tmpdir):
+    outbox = JobOutbox(str(tmpdir.join('outbox')))
+    outbox.add('a', {'status': 2})
+    outbox.retry_later(outbox.take(10)[0][1], 60)
+    outbox.add('a', {'status': 3})
+
+    assert outbox.take(10) == []
+    assert outbox.take(10, now=float('inf'))[0][3] == 1
+
+
+def test_updates_can_be_added_from_many_processes(tmpdir):
+    path = str(tmpdir.join('outbox'))
+    processes = [multiprocessing.Process(target=_add_updates, args=(path, job_uuid, 500)) for job_uuid in 'abcd']
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    outbox = JobOutbox(path)
+    assert len(outbox) == 2000
+    assert [data for _, _, data, _ in outbox.take(10)] == [{'status': 499}] * 4
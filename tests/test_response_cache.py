@@ -0,0 +1,113 @@
+import time
+
+from sharedcloud_cli.client import Client
+from sharedcloud_cli.response_cache import ResponseCache
+from tests.fakes import FakeResponse, FakeClient as BaseFakeClient
+
+URL = 'http://sharedcloud/api/v1/gpus/'
+GPUS = [{'uuid': 'a', 'name': 'GTX 1080'}]
+
+
+class FakeClient(BaseFakeClient):
+    def __init__(self, token='token', etag='"v1"'):
+        super(FakeClient, self).__init__()
+        self.token = token
+        self.etag = etag
+
+    def get(self, url, params=None, headers=None):
+        self.requests.append(headers or {})
+        if (headers or {}).get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, GPUS, headers={'ETag': self.etag, 'Last-Modified': 'Sun, 20 May 2018 16:30:00 GMT'})
+
+
+def _expire(cache):
+    for path in cache._entries():
+        entry = cache._read(path)
+        entry['stored_at'] = time.time() - 3600
+        cache._write(path, entry)
+
+
+# Workflow
+def test_fresh_responses_are_served_without_requests(tmpdir):
+    cache = ResponseCache(folder=str(tmpdir))
+    client = FakeClient()
+
+    assert cache.get(client, URL, 60).json() == GPUS
+    assert cache.get(client, URL, 60).json() == GPUS
+    assert len(client.requests) == 1
+
+
+def test_stale_responses_are_revalidated_with_their_etag(tmpdir):
+    cache = ResponseCache(folder=str(tmpdir))
+    client = FakeClient()
+    cache.get(client, URL, 60)
+    _expire(cache)
+
+    r = cache.get(client, URL, 60)
+
+    assert r.status_code == 200
+    assert r.json() == GPUS
+    assert client.requests[-1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Sun, 20 May 2018 16:30:00 GMT'}
+
+    # The 304 refreshed the entry, so there are no more requests for a while
+    cache.get(client, URL, 60)
+    assert len(client.requests) == 2
+
+
+def test_changed_responses_are_stored_again(tmpdir):
+    cache = ResponseCache(folder=str(tmpdir))
+    client = FakeClient()
+    cache.get(client, URL, 60)
+    _expire(cache)
+    client.etag = '"v2"'
+
+    cache.get(client, URL, 60)
+
+    assert cache._read(cache._entries()[0])['etag'] == '"v2"'
+
+
+def test_responses_are_not_shared_between_users(tmpdir):
+    cache = ResponseCache(folder=str(tmpdir))
+    cache.get(FakeClient(token='alice'), URL, 60)
+
+    other = FakeClient(token='bob')
+    cache.get(other, URL, 60)
+
+    assert len(other.requests) == 1
+    assert len(cache._entries()) == 2
+
+
+def test_invalidate_only_removes_the_matching_urls(tmpdir):
+    cache = ResponseCache(folder=str(tmpdir))
+    client = FakeClient()
+    cache.get(client, URL, 60)
+    cache.get(client, 'http://sharedcloud/api/v1/images/?instance=a', 60)
+
+    cache.invalidate('http://sharedcloud/api/v1/images/')
+
+    assert [cache._read(path)['url'] for path in cache._entries()] == [URL]
+    assert cache.clear() == 1
+    assert cache._entries() == []
+
+
+def test_responses_are_served_even_if_they_cant_be_cached(tmpdir):
+    folder = tmpdir.join('not_a_folder')
+    folder.write('')
+    cache = ResponseCache(folder=str(folder))
+    client = FakeClient()
+
+    assert cache.get(client, URL, 60).json() == GPUS
+    assert cache.get(client, URL, 60).json() == GPUS
+    assert len(client.requests) == 2
+
+
+def test_client_without_cache_always_requests(monkeypatch):
+    client = Client(token='token')
+    requests = []
+    monkeypatch.setattr(client, 'get', lambda url, params=None: requests.append(url))
+
+    client.get_cached(URL, 60)
+    client.get_cached(URL, 60)
+
+    assert requests == [URL, URL]
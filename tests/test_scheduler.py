@@ -0,0 +1,133 @@
+import time
+
+from sharedcloud_cli.scheduler import JobScheduler
+from tests.fakes import sleep
+
+
+def _fail():
+    exit(3)
+
+
+def _wait_until_idle(scheduler, timeout=10):
+    deadline = time.time() + timeout
+    while not scheduler.is_idle and time.time() < deadline:
+        scheduler.wait(0.5)
+    assert scheduler.is_idle
+
+
+class Events(object):
+    def __init__(self):
+        self.finished = []
+        self.timed_out = []
+
+    def on_finish(self, job_uuid, exit_code):
+        self.finished.append((job_uuid, exit_code))
+
+    def on_timeout(self, job_uuid):
+        self.timed_out.append(job_uuid)
+
+
+# Workflow
+def test_jobs_wait_for_a_free_slot_and_slots_are_refilled():
+    events = Events()
+    scheduler = JobScheduler(2, 60, on_finish=events.on_finish)
+
+    scheduler.submit('a', sleep, (0.3,))
+    scheduler.submit('b', sleep, (0,))
+    scheduler.submit('c', sleep, (0,))
+    assert sorted(scheduler.running) == ['a', 'b']
+    assert [job[0] for job in scheduler.pending] == ['c']
+
+    while 'c' not in scheduler.running and 'c' not in dict(events.finished):
+        scheduler.wait(1)
+    assert 'a' in scheduler.running  # "c" took the slot of "b" without waiting for the slow "a"
+
+    _wait_until_idle(scheduler)
+    assert sorted(events.finished) == [('a', 0), ('b', 0), ('c', 0)]
+
+
+def test_jobs_received_twice_only_run_once():
+    events = Events()
+    scheduler = JobScheduler(1, 60, on_finish=events.on_finish)
+
+    assert scheduler.submit('a', sleep, (0.2,))
+    assert scheduler.submit('b', sleep, (0,))
+    assert not scheduler.submit('a', sleep, (0,))
+    assert not scheduler.submit('b', sleep, (0,))
+    assert scheduler.is_scheduled('a') and scheduler.is_scheduled('b')
+
+    _wait_until_idle(scheduler)
+    assert sorted(events.finished) == [('a', 0), ('b', 0)]
+    assert not scheduler.is_scheduled('a')
+
+
+def test_free_slots_count_running_and_pending_jobs():
+    scheduler = JobScheduler(2, 60)
+    assert scheduler.free_slots == 2
+
+    scheduler.submit('a', sleep, (0.2,))
+    assert scheduler.free_slots == 1
+    scheduler.submit('b', sleep, (0.2,))
+    scheduler.submit('c', sleep, (0,))
+    assert scheduler.free_slots == 0
+    assert len(scheduler.pending) == 1
+
+    _wait_until_idle(scheduler)
+    assert scheduler.free_slots == 2
+
+
+def test_exit_codes_are_reported():
+    events = Events()
+    scheduler = JobScheduler(1, 60, on_finish=events.on_finish)
+
+    scheduler.submit('a', _fail, ())
+    _wait_until_idle(scheduler)
+
+    assert events.finished == [('a', 3)]
+
+
+def test_jobs_past_their_deadline_are_terminated():
+    events = Events()
+    scheduler = JobScheduler(2, 0.2, on_timeout=events.on_timeout, on_finish=events.on_finish)
+
+    started_at = time.time()
+    scheduler.submit('slow', sleep, (30,))
+    scheduler.submit('fast', sleep, (0,))
+    _wait_until_idle(scheduler)
+
+    assert time.time() - started_at < 10
+    assert events.timed_out == ['slow']
+    assert ('fast', 0) in events.finished
+    assert [job_uuid for job_uuid, exit_code in events.finished if exit_code != 0] == ['slow']
+
+
+def test_wait_returns_at_the_earliest_deadline():
+    scheduler = JobScheduler(1, 0.2)
+
+    scheduler.submit('slow', sleep, (30,))
+    started_at = time.time()
+    scheduler.wait()
+
+    assert time.time() - started_at < 5
+    assert scheduler.is_idle
+
+
+def test_stale_deadlines_of_finished_jobs_are_skipped():
+    events = Events()
+    scheduler = JobScheduler(1, 1, on_timeout=events.on_timeout, on_finish=events.on_finish)
+
+    scheduler.submit('a', sleep, (0,))
+    _wait_until_idle(scheduler)
+    assert len(scheduler.deadlines) == 1  # The deadline of "a" is left behind in the heap
+
+    # The same job runs again: the deadline of its first run must not time it out
+    time.sleep(0.6)
+    scheduler.submit('a', sleep, (0.7,))
+    time.sleep(0.5)
+    scheduler.reap()
+
+    assert events.timed_out == []
+    assert 'a' in scheduler.running
+    _wait_until_idle(scheduler)
+    assert events.timed_out == []
+    assert events.finished == [('a', 0), ('a', 0)]
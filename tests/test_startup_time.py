@@ -0,0 +1,62 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+HEAVY_MODULES = ['requests', 'tabulate', 'timeago', 'multiprocessing', 'subprocess', 'concurrent.futures']
+
+
+def _python(code, *options):
+    env = dict(os.environ, HOME=tempfile.mkdtemp())
+    return subprocess.run([sys.executable] + list(options) + ['-c', code], env=env, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+def _imported_modules(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        match = re.match(r'^import time:\s+\d+ \|\s+\d+ \|\s+(\S+)$', line)
+        if match:
+            modules.append(match.group(1))
+    return modules
+
+
+# Workflow
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='"-X importtime" needs Python 3.7')
+def test_cli_imports_neither_the_commands_nor_heavy_dependencies():
+    modules = _imported_modules(_python('import sharedcloud_cli.main', '-X', 'importtime').stderr)
+
+    assert 'sharedcloud_cli.main' in modules
+    assert [module for module in modules if module.startswith('sharedcloud_cli.cli.')] == []
+    assert [module for module in modules if module in HEAVY_MODULES] == []
+
+
+def test_version_does_not_import_heavy_dependencies():
+    r = _python('''
+import sys
+from sharedcloud_cli.main import cli
+try:
+    cli(['version'])
+except SystemExit:
+    pass
+print(','.join(module for module in {} if module in sys.modules))
+'''.format(HEAVY_MODULES))
+
+    assert r.stdout.splitlines()[-1] == ''
+
+
+def test_commands_are_imported_when_invoked():
+    r = _python('''
+import sys
+from sharedcloud_cli.main import cli
+try:
+    cli(['job', '--help'])
+except SystemExit:
+    pass
+print('sharedcloud_cli.cli.job' in sys.modules, 'sharedcloud_cli.cli.instance' in sys.modules)
+''')
+
+    assert r.stdout.splitlines()[-1] == 'True False'
@@ -4,12 +4,23 @@ import re
 import uuid
 from click.testing import CliRunner
 
-from sharedcloud_cli.main import cli, _read_user_token, function, run, instance, job, account, image, gpu, offer
+from sharedcloud_cli.config import Config as BaseConfig
+from sharedcloud_cli.cli.account import account
+from sharedcloud_cli.cli.function import function
+from sharedcloud_cli.cli.gpu import gpu
+from sharedcloud_cli.cli.image import image
+from sharedcloud_cli.cli.instance import instance
+from sharedcloud_cli.cli.job import job
+from sharedcloud_cli.cli.offer import offer
+from sharedcloud_cli.cli.run import run
+from sharedcloud_cli.main import cli
+from sharedcloud_cli.utils import _read_user_token
 from tests.constants import Message
 
 
-class Config():
+class Config(BaseConfig):
     def __init__(self, token):
+        super(Config, self).__init__()
         self.token = token
 
 
@@ -0,0 +1,99 @@
+from sharedcloud_cli.runtime import ContainerRuntime
+from sharedcloud_cli.warm_pool import WarmContainerPool
+
+
+class FakeRuntime(ContainerRuntime):
+    def __init__(self):
+        self.running = set()
+        self.num_created = 0
+        self.limits = {}
+
+    def inspect_image(self, registry_path):
+        return {'Config': {'Entrypoint': ['python'], 'Cmd': ['/app/run.py']}}
+
+    def create_container(self, name, image, env=None, cpus=None, memory=None, gpu=False, entrypoint=None):
+        self.num_created += 1
+        self.limits[name] = {'cpus': cpus, 'memory': memory, 'gpu': gpu}
+        return name
+
+    def start_container(self, container_id):
+        self.running.add(container_id)
+
+    def remove_container(self, container_id):
+        self.running.discard(container_id)
+
+
+# Workflow
+def test_warm_containers_are_reused_between_jobs():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=2)
+
+    container = pool.acquire('job1', 'sharedcloud/standard-node8:latest', False)
+    assert container['command'] == ['python', '/app/run.py']
+    pool.release('job1')
+
+    assert pool.acquire('job2', 'sharedcloud/standard-node8:latest', False)['id'] == container['id']
+    assert runtime.num_created == 1
+
+
+def test_warm_containers_are_recycled_after_failures_and_max_jobs():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=2, max_jobs_per_container=2)
+
+    container = pool.acquire('job1', 'sharedcloud/standard-node8:latest', False)
+    pool.release('job1', has_failed=True)
+    assert container['id'] not in runtime.running
+
+    container = pool.acquire('job2', 'sharedcloud/standard-node8:latest', False)
+    pool.release('job2')
+    pool.acquire('job3', 'sharedcloud/standard-node8:latest', False)
+    pool.release('job3')
+    assert container['id'] not in runtime.running
+
+
+def test_warm_pool_size_follows_the_recent_job_mix():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=4)
+
+    for idx in range(3):
+        pool.acquire('node{}'.format(idx), 'sharedcloud/standard-node8:latest', False)
+    pool.acquire('python', 'sharedcloud/web-crawling-python36:latest', False)
+    pool.replenish()
+
+    assert pool.target_size(('sharedcloud/standard-node8:latest', False)) == 3
+    assert pool.target_size(('sharedcloud/web-crawling-python36:latest', False)) == 1
+    assert len(pool.idle[('sharedcloud/standard-node8:latest', False)]) == 3
+
+    pool.close()
+    assert not runtime.running
+
+
+def test_only_the_given_images_are_kept_warm():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=2, images=['sharedcloud/standard-node8:latest'])
+
+    assert pool.acquire('job1', 'sharedcloud/web-crawling-python36:latest', False) is None
+    assert pool.acquire('job2', 'sharedcloud/standard-node8:latest', False)
+    assert runtime.num_created == 1
+
+
+def test_warm_containers_of_timed_out_jobs_are_removed_by_their_id():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=2)
+
+    container = pool.acquire('job1', 'sharedcloud/standard-node8:latest', False)
+    pool.kill('job1')
+
+    assert container['id'] not in runtime.running
+    assert 'job1' not in pool.busy
+
+
+def test_gpu_warm_containers_are_not_limited_to_the_default_cpus_and_memory():
+    runtime = FakeRuntime()
+    pool = WarmContainerPool(runtime, size=2)
+
+    gpu_container = pool.acquire('job1', 'sharedcloud/standard-node8:latest', True)
+    cpu_container = pool.acquire('job2', 'sharedcloud/standard-node8:latest', False)
+
+    assert runtime.limits[gpu_container['id']] == {'cpus': None, 'memory': None, 'gpu': True}
+    assert runtime.limits[cpu_container['id']]['cpus'] and runtime.limits[cpu_container['id']]['memory']